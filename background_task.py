@@ -0,0 +1,84 @@
+import subprocess
+import threading
+
+
+class BackgroundRun:
+    def __init__(self):
+        """
+        Cancellation state of one background run. Every run gets its own, so
+        cancelling an old run that outlived its join timeout can't stop the
+        process of the run that replaced it.
+        """
+        self.cancel_event = threading.Event()
+        self.processes = set()
+        self.children = []
+        self.lock = threading.Lock()
+
+    def child(self):
+        """A run that is cancelled along with this one, but can also be cancelled on its own."""
+        child = BackgroundRun()
+        with self.lock:
+            if not self.cancel_event.is_set():
+                self.children.append(child)
+                return child
+        child.cancel()
+        return child
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def popen(self, command, **kwargs):
+        """Starts command as one of this run's processes, or returns None if the run was already cancelled."""
+        with self.lock:
+            if self.cancel_event.is_set():
+                return None
+            process = subprocess.Popen(command, **kwargs)
+            self.processes.add(process)
+            return process
+
+    def run_process(self, command, **kwargs):
+        """subprocess.run() that cancel() can stop. Returns None if the run was already cancelled."""
+        process = self.popen(command, **kwargs)
+        if process is None:
+            return None
+        try:
+            stdout, stderr = process.communicate()
+        finally:
+            with self.lock:
+                self.processes.discard(process)
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+    def cancel(self):
+        with self.lock:
+            self.cancel_event.set()
+            processes = list(self.processes)
+            children, self.children = self.children, []
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for child in children:
+            child.cancel()
+
+
+class BackgroundTask:
+    def __init__(self, join_timeout=2):
+        """One background thread at a time; starting a new run cancels the previous one."""
+        self.join_timeout = join_timeout
+        self.run = None
+        self.thread = None
+
+    def start(self, target, *args):
+        """Calls target(run, *args) in a daemon thread, where run is a new BackgroundRun. Returns the run."""
+        self.cancel()
+        run = BackgroundRun()
+        thread = threading.Thread(target=target, args=(run,) + args, daemon=True)
+        self.run, self.thread = run, thread
+        thread.start()
+        return run
+
+    def cancel(self):
+        run, thread = self.run, self.thread
+        self.run = self.thread = None
+        if run is not None:
+            run.cancel()
+            thread.join(timeout=self.join_timeout)
@@ -0,0 +1,332 @@
+"""
+Micro-benchmarks for FFmpegExecutor and the command builder. Encodes are
+replaced by benchmarks/fake_ffmpeg.py replaying stderr transcripts, and the Tk
+app by a headless stand-in that counts the UI callbacks the executor queues,
+so no real encode or display is needed.
+
+    python benchmarks/bench_executor.py                  # every section
+    python benchmarks/bench_executor.py parse command    # selected sections
+    python benchmarks/bench_executor.py replay --huge-noise 50
+
+Sections: parse (progress line parsing throughput), command (command
+construction time), replay (executor throughput and UI callbacks per
+transcript), cancel (cancellation latency on stalled, paused and busy
+processes) and failures (crashing processes).
+
+Every section also checks its results against LIMITS, which are loose enough
+for a slow machine but catch real regressions (e.g. a sleep in the executor's
+read loop). Failed checks are listed at the end and the exit status is 1.
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ffmpeg_executor
+from ffmpeg_executor import FFmpegExecutor, parse_progress_time
+from ffmpeg_utils import FFmpegUtils
+from fake_ffmpeg import synthesize
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FAKE_FFMPEG = os.path.join(BENCH_DIR, "fake_ffmpeg.py")
+RECORDED_TRANSCRIPT = os.path.join(BENCH_DIR, "transcripts", "x264_crf.txt")
+SECTIONS = ("parse", "command", "replay", "cancel", "failures")
+
+LIMITS = {
+    "parse_min_lines_per_sec": 200000,
+    "command_max_us": 200,
+    "replay_min_lines_per_sec": 5000, # Unthrottled synthetic transcripts only
+    "replay_max_wall_sec": 5, # Unthrottled transcripts, including process start-up
+    "cancel_max_ms": 500,
+    "failure_max_ms": 2000,
+}
+failed_checks = []
+
+
+def check(ok, message):
+    """Records a failed limit; the row is also marked with a "!" where it's printed."""
+    if not ok:
+        failed_checks.append(message)
+    return "" if ok else "  !"
+
+
+class RecordingWidget:
+    def __init__(self):
+        self.updates = 0
+        self.text = ""
+
+    def config(self, **kwargs):
+        self.updates += 1
+        self.text = kwargs.get("text", self.text)
+
+    def cget(self, key):
+        return self.text
+
+
+class RecordingMaster:
+    def __init__(self):
+        self.callbacks = [] # Queued like Tk's after(); run by drain()
+
+    def after(self, delay_ms, callback):
+        self.callbacks.append(callback)
+
+    def drain(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+        return len(callbacks)
+
+
+class RecordingMessagebox:
+    shown = 0
+
+    @classmethod
+    def showerror(cls, title, message):
+        cls.shown += 1
+
+
+class HeadlessApp:
+    """The attributes of VideoEditorApp that FFmpegExecutor touches."""
+    def __init__(self):
+        self.master = RecordingMaster()
+        self.status_label = RecordingWidget()
+        self.progress_bar = RecordingWidget()
+        self.process_button = RecordingWidget()
+        self.cancel_button = RecordingWidget()
+
+
+# Error dialogs are counted instead of shown
+ffmpeg_executor.messagebox = RecordingMessagebox
+
+
+class Flag:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def fake_command(command):
+    """Runs command through fake_ffmpeg.py instead of the ffmpeg it names."""
+    return [sys.executable, FAKE_FFMPEG] + command[1:]
+
+
+@contextlib.contextmanager
+def fake_environment(**settings):
+    """Sets FAKE_FFMPEG_* variables, which the fake process inherits."""
+    saved = {key: os.environ.get(key) for key in list(os.environ) if key.startswith("FAKE_FFMPEG_")}
+    for key in saved:
+        del os.environ[key]
+    os.environ.update({f"FAKE_FFMPEG_{key.upper()}": str(value) for key, value in settings.items()})
+    try:
+        yield
+    finally:
+        for key in [key for key in os.environ if key.startswith("FAKE_FFMPEG_")]:
+            del os.environ[key]
+        os.environ.update({key: value for key, value in saved.items() if value is not None})
+
+
+def pass_command(duration):
+    return fake_command(["ffmpeg", "-y", "-ss", "0", "-i", "input.mp4", "-t", str(duration),
+                         "-c:v", "libx264", "-preset", "medium", "-crf", "23", "-an", "-f", "mp4", os.devnull])
+
+
+def run_pass(duration, **settings):
+    """Runs one executor pass against the fake. Returns (success, seconds, app)."""
+    app = HeadlessApp()
+    executor = FFmpegExecutor(app)
+    with fake_environment(**settings):
+        started = time.perf_counter()
+        success = executor.execute_ffmpeg_command(pass_command(duration), duration, 1, 1)
+        elapsed = time.perf_counter() - started
+    return success, elapsed, app
+
+
+def bench_parse(line_count=200000):
+    sample = synthesize(3600, 2, 1) # Half progress lines, half warnings
+    lines = (sample * (line_count // len(sample) + 1))[:line_count]
+    started = time.perf_counter()
+    matched = sum(1 for line in lines if parse_progress_time(line) is not None)
+    elapsed = time.perf_counter() - started
+    rate = line_count / elapsed
+    mark = check(rate >= LIMITS["parse_min_lines_per_sec"],
+                 f"parse: {rate:.0f} lines/s < {LIMITS['parse_min_lines_per_sec']}")
+    print(f"parse_progress_time: {rate / 1e6:.2f}M lines/s "
+          f"({elapsed / line_count * 1e9:.0f} ns/line, {matched} progress lines){mark}")
+
+
+def bench_command(iterations=2000):
+    ffmpeg_utils = FFmpegUtils()
+    ffmpeg_utils.ffmpeg_path = ffmpeg_utils.ffmpeg_path or "ffmpeg" # Only the command is built
+    base = dict(input_filepath="input.mp4", output_filepath="out.mp4", start_time_sec=5, end_time_sec=65,
+                resolution_choice="Full", use_crf=True, video_crf="23", target_size_mb="",
+                remove_audio_var=Flag(False), audio_bitrate_choice="128k", target_framerate="Original",
+                ffmpeg_preset="medium", use_hevc=False, gpu_accel_choice="None", original_video_width=1920,
+                original_video_height=1080, original_video_fps=30, crop_params=None)
+    scenarios = [
+        ("CRF, full frame", {}),
+        ("CRF, crop + half + 24 fps", dict(crop_params="crop=1280:720:320:180", resolution_choice="Half",
+                                           target_framerate="24")),
+        ("Two-pass, pass 1", dict(use_crf=False, total_passes=2, pass_number=1, video_bitrate_kbps=1500,
+                                  audio_bitrate_kbps=128, pass_log_file="/tmp/shorty_pass")),
+        ("Two-pass, pass 2, HEVC NVENC", dict(use_crf=False, total_passes=2, pass_number=2, use_hevc=True,
+                                              gpu_accel_choice="NVIDIA (NVENC)", video_bitrate_kbps=1500,
+                                              audio_bitrate_kbps=128, pass_log_file="/tmp/shorty_pass")),
+        ("Concat list, fragmented", dict(input_format="concat", output_mode="fragmented")),
+    ]
+    print(f"{'Command':<32} {'us/call':>8}  Arguments")
+    for label, overrides in scenarios:
+        kwargs = dict(base, **overrides)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            command = ffmpeg_utils.build_ffmpeg_command(**kwargs)
+        elapsed = time.perf_counter() - started
+        per_call_us = elapsed / iterations * 1e6
+        mark = check(per_call_us <= LIMITS["command_max_us"],
+                     f"command: {label} took {per_call_us:.1f} us > {LIMITS['command_max_us']}")
+        print(f"{label:<32} {per_call_us:>8.1f}  {len(command)}{mark}")
+
+
+def bench_replay(huge_noise):
+    scenarios = [
+        ("Recorded x264, unthrottled", 12, dict(transcript=RECORDED_TRANSCRIPT)),
+        ("Recorded x264, 100 lines/s", 12, dict(transcript=RECORDED_TRANSCRIPT, rate=100)),
+        ("10 min, 2 updates/s", 600, dict(updates=2)),
+        (f"Huge: 60 s, {huge_noise} warnings/update", 60, dict(updates=2, noise=huge_noise)),
+    ]
+    print(f"{'Transcript':<36} {'Wall s':>7} {'Lines/s':>8} {'UI calls':>9} {'Progress':>9} {'Status':>7}")
+    for label, duration, settings in scenarios:
+        if "transcript" in settings:
+            with open(settings["transcript"], "r", encoding="utf-8") as f:
+                line_count = len(f.read().splitlines())
+        else:
+            line_count = len(synthesize(duration, settings.get("updates", 2), settings.get("noise", 0)))
+        success, elapsed, app = run_pass(duration, **settings)
+        calls = app.master.drain()
+        # Progress redraws are throttled: two calls per interval, plus the start message and the last update
+        max_calls = 2 * (elapsed / ffmpeg_executor.UI_UPDATE_INTERVAL_SEC + 1) + 1
+        mark = check(success, f"replay: {label} failed")
+        mark = mark or check(calls <= max_calls, f"replay: {label} queued {calls} UI calls > {max_calls:.0f}")
+        if "rate" not in settings:
+            mark = mark or check(elapsed <= LIMITS["replay_max_wall_sec"],
+                                 f"replay: {label} took {elapsed:.2f} s > {LIMITS['replay_max_wall_sec']}")
+            if "transcript" not in settings: # The recorded one is too short to measure a rate
+                mark = mark or check(line_count / elapsed >= LIMITS["replay_min_lines_per_sec"],
+                                     f"replay: {label} ran {line_count / elapsed:.0f} lines/s "
+                                     f"< {LIMITS['replay_min_lines_per_sec']}")
+        print(f"{label:<36} {elapsed:>7.2f} {line_count / elapsed:>8.0f} {calls:>9} "
+              f"{app.progress_bar.updates:>9} {app.status_label.updates:>7}{'' if success else '  FAILED'}{mark}")
+
+
+def measure_cancel(settings, duration=600, wait_sec=0.3, pause_first=False):
+    """
+    Seconds from cancel_compression() until the executor returns, or None with
+    the reason if the measurement is invalid: the pass had already finished
+    when the cancel came, succeeded anyway, or never returned.
+    """
+    app = HeadlessApp()
+    executor = FFmpegExecutor(app)
+    result = {}
+
+    def run():
+        result["success"] = executor.execute_ffmpeg_command(pass_command(duration), duration, 1, 1)
+        result["returned"] = time.perf_counter()
+
+    with fake_environment(**settings):
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        time.sleep(wait_sec)
+        if pause_first:
+            executor.pause_compression()
+            time.sleep(0.05)
+        process = executor.ffmpeg_process
+        running = process is not None and process.poll() is None
+        cancelled = time.perf_counter()
+        executor.cancel_compression()
+        thread.join(timeout=30)
+    if thread.is_alive():
+        return None, "did not return within 30 s"
+    if not running or "returned" in result and result["returned"] < cancelled:
+        return None, "finished before the cancel"
+    if result["success"]:
+        return None, "succeeded despite the cancel"
+    return result["returned"] - cancelled, None
+
+
+def bench_cancel(repeats=5):
+    # Every scenario ends in a stall, so no pass can finish on its own before the cancel. The busy one is
+    # still writing at full speed when cancelled: 10 hours of media at 10 updates/s, 20 warnings each.
+    scenarios = [
+        ("Stalled after 20 lines", dict(fail="stall:20"), 600, False),
+        ("Paused, then cancelled", dict(fail="stall:20"), 600, True),
+        ("Busy: unthrottled output", dict(updates=10, noise=20, fail=f"stall:{10 ** 9}"), 36000, False),
+    ]
+    print(f"{'Cancel while':<28} {'Median ms':>10} {'Max ms':>8}")
+    for label, settings, duration, pause_first in scenarios:
+        measurements = [measure_cancel(settings, duration, pause_first=pause_first) for _ in range(repeats)]
+        problems = [problem for _, problem in measurements if problem]
+        if problems:
+            check(False, f"cancel: {label}: {len(problems)}/{repeats} runs invalid ({problems[0]})")
+            print(f"{label:<28} {problems[0]:>19}  !")
+            continue
+        latencies = [latency for latency, _ in measurements]
+        worst_ms = max(latencies) * 1000
+        mark = check(worst_ms <= LIMITS["cancel_max_ms"],
+                     f"cancel: {label} took {worst_ms:.1f} ms > {LIMITS['cancel_max_ms']}")
+        print(f"{label:<28} {statistics.median(latencies) * 1000:>10.1f} {worst_ms:>8.1f}{mark}")
+
+
+def bench_failures():
+    scenarios = [("Exit code 1 after 20 lines", dict(fail="crash:20"))]
+    if sys.platform != "win32":
+        scenarios.append(("SIGSEGV after 20 lines", dict(fail="signal:20")))
+    print(f"{'Process':<28} {'Detected ms':>12} {'Result':>8} {'Dialogs':>8}")
+    for label, settings in scenarios:
+        RecordingMessagebox.shown = 0
+        success, elapsed, app = run_pass(60, **settings)
+        app.master.drain()
+        mark = check(not success and RecordingMessagebox.shown == 1,
+                     f"failures: {label} gave {'ok' if success else 'failed'} with {RecordingMessagebox.shown} dialogs")
+        mark = mark or check(elapsed * 1000 <= LIMITS["failure_max_ms"],
+                             f"failures: {label} detected after {elapsed * 1000:.0f} ms > {LIMITS['failure_max_ms']}")
+        print(f"{label:<28} {elapsed * 1000:>12.1f} {'ok' if success else 'failed':>8} "
+              f"{RecordingMessagebox.shown:>8}{mark}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FFmpeg executor and command builder benchmarks")
+    parser.add_argument("sections", nargs="*", help=f"Sections to run: {', '.join(SECTIONS)} (default: all)")
+    parser.add_argument("--huge-noise", type=int, default=20, help="Warning lines per progress update in the huge replay")
+    parser.add_argument("--repeats", type=int, default=5, help="Cancellations measured per scenario")
+    args = parser.parse_args()
+
+    sections = args.sections or SECTIONS
+    unknown = [section for section in sections if section not in SECTIONS]
+    if unknown:
+        parser.error(f"unknown section(s): {', '.join(unknown)}")
+    for section in sections:
+        print(f"== {section}")
+        if section == "parse":
+            bench_parse()
+        elif section == "command":
+            bench_command()
+        elif section == "replay":
+            bench_replay(args.huge_noise)
+        elif section == "cancel":
+            bench_cancel(args.repeats)
+        elif section == "failures":
+            bench_failures()
+        print()
+
+    if failed_checks:
+        print(f"{len(failed_checks)} check(s) over their limits:")
+        for message in failed_checks:
+            print(f"  {message}")
+        sys.exit(1)
+    print("All checks within limits.")
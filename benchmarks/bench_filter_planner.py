@@ -0,0 +1,96 @@
+"""
+Compares the filter planner with the old fixed crop -> scale -> fps chain.
+
+Without arguments it prints the estimated decode + filter pixel operations per
+second of input for a set of typical jobs. With --input it also times both
+filter graphs on a real file (encoding to the null muxer, so only decode and
+filtering are measured).
+
+    python benchmarks/bench_filter_planner.py
+    python benchmarks/bench_filter_planner.py --input clip.mp4 --seconds 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filter_planner import FilterPlanner
+from ffmpeg_utils import FFmpegUtils
+
+# (label, width, height, fps, crop_params, resolution_choice, target_framerate, input codec)
+SCENARIOS = [
+    ("1080p60 -> half, 30 fps", 1920, 1080, 60, None, "Half", "30", "h264"),
+    ("1080p30 -> quarter", 1920, 1080, 30, None, "Quarter", "Original", "h264"),
+    ("4K60 crop -> half, 24 fps", 3840, 2160, 60, "crop=1920:1080:960:540", "Half", "24", "hevc"),
+    ("1080p30 full-frame crop", 1920, 1080, 30, "crop=1920:1080:0:0", "Full", "30", "h264"),
+    ("720p30 MJPEG -> quarter", 1280, 720, 30, None, "Quarter", "Original", "mjpeg"),
+    ("1080p25 MPEG-2 -> half, 15 fps", 1920, 1080, 25, None, "Half", "15", "mpeg2video"),
+]
+
+
+def naive_filters(width, height, crop_params, resolution_choice, target_framerate):
+    filters = [crop_params] if crop_params else []
+    if resolution_choice != "Full":
+        filters.append("scale={}:{}".format(*FilterPlanner.target_dimensions(width, height, resolution_choice)))
+    if target_framerate != "Original":
+        filters.append(f"fps={target_framerate}")
+    return filters
+
+
+def estimate():
+    planner = FilterPlanner()
+    print(f"{'Job':<32} {'Old Mpx/s':>10} {'New Mpx/s':>10} {'Saved':>7}  Plan")
+    for label, width, height, fps, crop, resolution, target_fps, codec in SCENARIOS:
+        plan = planner.plan(width, height, fps, crop, resolution, target_fps, input_codec=codec)
+        old = FilterPlanner.naive_pixel_ops(width, height, fps, crop, resolution)
+        saved = 100 * (1 - plan.pixel_ops / old)
+        args = " ".join(plan.global_args + plan.input_args + plan.output_args()) or "(no filters)"
+        print(f"{label:<32} {old / 1e6:>10.1f} {plan.pixel_ops / 1e6:>10.1f} {saved:>6.1f}%  {args}")
+
+
+def time_command(command):
+    started = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - started
+
+
+def run_on_file(input_filepath, seconds, resolution, target_fps, crop):
+    ffmpeg_utils = FFmpegUtils()
+    if not ffmpeg_utils.ffmpeg_path:
+        sys.exit("FFmpeg executable not found.")
+    stream = next(s for s in ffmpeg_utils.probe_media(input_filepath)["streams"] if s.get("codec_type") == "video")
+    numerator, _, denominator = stream.get("r_frame_rate", "30/1").partition("/")
+    fps = float(numerator) / float(denominator or 1)
+    width, height = int(stream["width"]), int(stream["height"])
+
+    plan = FilterPlanner().plan(width, height, fps, crop, resolution, target_fps, input_codec=stream.get("codec_name"))
+    base = [ffmpeg_utils.ffmpeg_path, "-v", "error", "-y"]
+    naive = naive_filters(width, height, crop, resolution, target_fps)
+    old_command = base + ["-t", str(seconds), "-i", input_filepath, "-an"] + \
+        (["-vf", ",".join(naive)] if naive else []) + ["-f", "null", os.devnull]
+    new_command = base + plan.global_args + ["-t", str(seconds)] + plan.input_args + ["-i", input_filepath, "-an"] + \
+        plan.output_args() + ["-f", "null", os.devnull]
+
+    old_time = min(time_command(old_command) for _ in range(3))
+    new_time = min(time_command(new_command) for _ in range(3))
+    print(f"Old: {old_time:.2f}s  {' '.join(old_command)}")
+    print(f"New: {new_time:.2f}s  {' '.join(new_command)}")
+    print(f"Speedup: {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter planner benchmark")
+    parser.add_argument("--input", default=None, help="Also time both filter graphs on this file")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--resolution", choices=["Full", "Half", "Quarter"], default="Half")
+    parser.add_argument("--fps", default="30", help="Target frame rate or Original")
+    parser.add_argument("--crop", default=None, help="crop=w:h:x:y")
+    args = parser.parse_args()
+
+    estimate()
+    if args.input:
+        print()
+        run_on_file(args.input, args.seconds, args.resolution, args.fps, args.crop)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the ffmpeg executable that replays stderr transcripts instead of
+encoding, so FFmpegExecutor can be exercised and timed without real encodes.
+It accepts any ffmpeg command line and is configured through the environment,
+since callers pass the command through unchanged:
+
+    FAKE_FFMPEG_TRANSCRIPT  Transcript to replay. Without it one is synthesized
+                            from the -t duration (60 s if absent).
+    FAKE_FFMPEG_UPDATES     Synthesized progress lines per second of media (2).
+    FAKE_FFMPEG_NOISE       Extra warning lines after each progress line (0),
+                            for huge outputs.
+    FAKE_FFMPEG_RATE        Lines written per second of wall time; 0 writes as
+                            fast as the reader takes them (0).
+    FAKE_FFMPEG_FAIL        stall:N hangs after N lines until killed,
+                            crash:N exits with FAKE_FFMPEG_EXIT_CODE (1) after
+                            N lines, signal:N dies from SIGSEGV after N lines.
+
+Progress lines (starting with "frame=") end in \\r like real ffmpeg output.
+On success an empty file is written to the output path.
+"""
+import os
+import signal
+import sys
+import time
+
+SYNTHETIC_HEADER = [
+    "ffmpeg version 6.1 Copyright (c) 2000-2023 the FFmpeg developers",
+    "Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'input.mp4':",
+    "  Duration: {duration}, start: 0.000000, bitrate: 8000 kb/s",
+    "  Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p, 1920x1080, 7800 kb/s, 30 fps",
+    "Stream mapping:",
+    "  Stream #0:0 -> #0:0 (h264 (native) -> h264 (libx264))",
+    "Press [q] to stop, [?] for help",
+]
+NOISE_LINE = "[h264 @ 0x55d0c0a1b2c0] mmco: unref short failure"
+
+
+def timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:05.2f}"
+
+
+def synthesize(duration, updates_per_sec, noise):
+    lines = [line.format(duration=timestamp(duration)) for line in SYNTHETIC_HEADER]
+    steps = max(1, int(duration * updates_per_sec))
+    for step in range(1, steps + 1):
+        media_time = duration * step / steps
+        frame = int(media_time * 30)
+        lines.append(f"frame={frame:5d} fps= 60 q=28.0 size={frame * 4:8d}kB time={timestamp(media_time)} "
+                     f"bitrate=1000.0kbits/s speed=2.00x")
+        lines.extend([NOISE_LINE] * noise)
+    lines.append(f"[libx264 @ 0x55d0c0a1b2c0] frame I:{steps // 10 + 1} Avg QP:24.00 size: 40000")
+    return lines
+
+
+def output_path(argv):
+    last = argv[-1] if len(argv) > 1 else None
+    if not last or last.startswith("-") or last in (os.devnull, "pipe:1") or "://" in last:
+        return None
+    return last
+
+
+def main(argv):
+    transcript = os.environ.get("FAKE_FFMPEG_TRANSCRIPT")
+    if transcript:
+        with open(transcript, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    else:
+        duration = float(argv[argv.index("-t") + 1]) if "-t" in argv else 60.0
+        lines = synthesize(duration, float(os.environ.get("FAKE_FFMPEG_UPDATES", "2")),
+                           int(os.environ.get("FAKE_FFMPEG_NOISE", "0")))
+
+    rate = float(os.environ.get("FAKE_FFMPEG_RATE", "0"))
+    failure, _, fail_after = os.environ.get("FAKE_FFMPEG_FAIL", "").partition(":")
+    fail_after = int(fail_after or 0)
+
+    started = time.perf_counter()
+    for count, line in enumerate(lines):
+        if failure and count == fail_after:
+            break
+        sys.stderr.write(line + ("\r" if line.startswith("frame=") else "\n"))
+        sys.stderr.flush()
+        if rate > 0:
+            delay = started + (count + 1) / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    if failure == "stall":
+        while True: # Like an encoder stuck on a network input; only a signal ends it
+            time.sleep(3600)
+    if failure == "crash":
+        sys.stderr.write("Conversion failed!\n")
+        return int(os.environ.get("FAKE_FFMPEG_EXIT_CODE", "1"))
+    if failure == "signal":
+        os.kill(os.getpid(), getattr(signal, "SIGSEGV", signal.SIGTERM))
+        time.sleep(1)
+
+    path = output_path(argv)
+    if path:
+        open(path, "wb").close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
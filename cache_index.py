@@ -0,0 +1,104 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import fcntl
+
+INDEX_NAME = "index.json"
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Exclusive lock on path (created if missing) shared by every process on the
+    machine, e.g. the GUI and the job server using the same cache directory.
+    """
+    with open(path, "a+b") as f:
+        if sys.platform == "win32":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue # LK_LOCK gives up after 10 s; keep waiting like flock does
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def evict_lru(entries, max_size_bytes, keep=None):
+    """
+    Pops entries ({"size", "last_used", ...} dicts) least recently used first
+    until their sizes fit in max_size_bytes, never popping keep. Returns the
+    popped entries so the caller can delete their files.
+    """
+    total = sum(entry["size"] for entry in entries.values())
+    evicted = []
+    for key, entry in sorted(entries.items(), key=lambda item: item[1]["last_used"]):
+        if total <= max_size_bytes:
+            break
+        if key == keep:
+            continue
+        total -= entry["size"]
+        evicted.append(entries.pop(key))
+    return evicted
+
+
+class CacheIndex:
+    def __init__(self, cache_dir, version=None, name=INDEX_NAME):
+        """
+        The JSON index of a cache directory: {"entries": {...}} plus whatever
+        counters the cache keeps. Changes go through transaction(), which
+        rereads the file under a lock, so several processes sharing the
+        directory merge their changes instead of overwriting each other's.
+        An index written with another version reads as empty.
+        """
+        self.path = os.path.join(cache_dir, name)
+        self.lock_path = self.path + ".lock"
+        self.version = version
+        self.lock = threading.Lock() # The file lock alone doesn't order threads sharing one process on every OS
+
+    def load(self):
+        """The saved index, or an empty one if it's missing, unreadable or another version."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if not isinstance(data, dict) or data.get("version") != self.version:
+            data = {}
+        data.setdefault("entries", {})
+        return data
+
+    def _save(self, data):
+        if self.version is not None:
+            data["version"] = self.version
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Yields the current index, locked against other threads and processes,
+        and saves it when the block exits normally. Keep the block short: other
+        processes wait on it.
+        """
+        with self.lock, file_lock(self.lock_path):
+            data = self.load()
+            yield data
+            self._save(data)
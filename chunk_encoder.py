@@ -0,0 +1,171 @@
+import collections
+import os
+import subprocess
+
+from utils import ConstantVar
+
+
+class ChunkEncoder:
+    def __init__(self, ffmpeg_utils):
+        """
+        Splits a trim range into keyframe-aligned chunks, encodes single chunks with
+        the normal command builder and losslessly concatenates the results. Used by
+        distributed and segmented encoding.
+        """
+        self.ffmpeg_utils = ffmpeg_utils
+
+    def find_keyframes(self, input_filepath, start_time_sec, end_time_sec, input_format=None):
+        """
+        Keyframe timestamps of the first video stream inside the range, read from
+        packet flags so nothing has to be decoded. Returns [] if ffprobe is missing.
+        """
+        if not self.ffmpeg_utils.ffprobe_path:
+            return []
+        command = [self.ffmpeg_utils.ffprobe_path, "-v", "error", "-select_streams", "v:0",
+                   "-read_intervals", f"{start_time_sec}%{end_time_sec}",
+                   "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0"]
+        if input_format == "concat":
+            command.extend(["-f", "concat", "-safe", "0"])
+        command.append(input_filepath)
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                encoding='utf-8', errors='replace')
+        if result.returncode != 0:
+            print(f"Warning: Could not read keyframes, using fixed chunk boundaries: {result.stderr.strip()}")
+            return []
+
+        keyframes = []
+        for line in result.stdout.splitlines():
+            fields = line.split(",")
+            if len(fields) >= 2 and "K" in fields[1]:
+                try:
+                    keyframes.append(float(fields[0]))
+                except ValueError:
+                    pass # pts_time can be N/A
+        return sorted(keyframes)
+
+    @staticmethod
+    def plan_chunks(start_time_sec, end_time_sec, chunk_duration_sec, keyframes=None):
+        """
+        Returns [(start, end)] covering the range. Each boundary is the first keyframe
+        at least chunk_duration_sec after the previous one, or a fixed step without
+        keyframes. A short tail is merged into the last chunk.
+        """
+        keyframes = [k for k in (keyframes or []) if start_time_sec < k < end_time_sec]
+        boundaries = [start_time_sec]
+        if keyframes:
+            for keyframe in keyframes:
+                if keyframe - boundaries[-1] >= chunk_duration_sec:
+                    boundaries.append(keyframe)
+        else:
+            position = start_time_sec + chunk_duration_sec
+            while position < end_time_sec:
+                boundaries.append(position)
+                position += chunk_duration_sec
+
+        if len(boundaries) > 1 and end_time_sec - boundaries[-1] < chunk_duration_sec / 2:
+            boundaries.pop()
+        boundaries.append(end_time_sec)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    @staticmethod
+    def run_command(command, run=None):
+        """Runs command with stderr captured, through run (a BackgroundRun) if given. None if run was cancelled."""
+        kwargs = dict(stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                      encoding='utf-8', errors='replace')
+        if run is None:
+            return subprocess.run(command, **kwargs)
+        result = run.run_process(command, **kwargs)
+        return None if run.is_cancelled() else result
+
+    def encode_chunk(self, spec, chunk_start_sec, chunk_end_sec, output_filepath, threads=None, extra_output_args=None,
+                     single_pass=False, run=None):
+        """
+        Encodes one chunk of a job spec (build_ffmpeg_command parameters plus the
+        job-wide video_bitrate_kbps for target size jobs). Chunks are video only;
+        audio is encoded once for the whole range. Target size chunks use two-pass
+        unless single_pass is set. Cancelling run stops the encode. Returns
+        (success, error text).
+        """
+        total_passes = 1 if spec["use_crf"] or single_pass else 2
+        pass_log_file = output_filepath + ".passlog" if total_passes == 2 else None
+
+        try:
+            for pass_number in range(1, total_passes + 1):
+                command = self.ffmpeg_utils.build_ffmpeg_command(
+                    spec["input_filepath"], output_filepath, chunk_start_sec, chunk_end_sec,
+                    spec["resolution_choice"], spec["use_crf"], spec["video_crf"], spec["target_size_mb"],
+                    ConstantVar(True), spec["audio_bitrate_choice"], spec["target_framerate"],
+                    spec["ffmpeg_preset"], spec["use_hevc"], spec["gpu_accel_choice"],
+                    spec["original_video_width"], spec["original_video_height"], spec["original_video_fps"],
+                    spec["crop_params"], pass_number, total_passes, spec.get("video_bitrate_kbps"), None,
+                    pass_log_file=pass_log_file, input_format=spec.get("input_format")
+                )
+                if not command:
+                    return False, "Could not build FFmpeg command."
+
+                output_args = []
+                if threads:
+                    output_args.extend(["-threads", str(threads)])
+                if extra_output_args and pass_number == total_passes:
+                    output_args.extend(extra_output_args)
+                if output_args:
+                    # Output options go right after the codec choice, ahead of any pass 1 null output
+                    codec_index = command.index("-c:v") + 2
+                    command[codec_index:codec_index] = output_args
+
+                result = self.run_command(command, run)
+                if result is None:
+                    return False, "Cancelled."
+                if result.returncode != 0:
+                    tail = "\n".join(collections.deque(result.stderr.splitlines(), maxlen=10))
+                    return False, f"Pass {pass_number}/{total_passes} failed:\n{tail}"
+            return True, ""
+        finally:
+            if pass_log_file:
+                for suffix in ("-0.log", "-0.log.mbtree"):
+                    if os.path.exists(pass_log_file + suffix):
+                        os.remove(pass_log_file + suffix)
+
+    @staticmethod
+    def write_concat_list(list_path, filepaths):
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.write("ffconcat version 1.0\n")
+            for filepath in filepaths:
+                escaped = os.path.abspath(filepath).replace("\\", "/").replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+    def concat_chunks(self, chunk_filepaths, output_filepath, audio_filepath=None, list_path=None):
+        """Stream copies the chunks (and optional audio track) into output_filepath."""
+        list_path = list_path or output_filepath + ".ffconcat"
+        self.write_concat_list(list_path, chunk_filepaths)
+        command = [self.ffmpeg_utils.ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_filepath:
+            command.extend(["-i", audio_filepath, "-map", "0:v:0", "-map", "1:a:0"])
+        command.extend(["-c", "copy", output_filepath])
+
+        print("FFmpeg Command (Chunk concat):", " ".join(command))
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                encoding='utf-8', errors='replace')
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+        if result.returncode != 0:
+            return False, result.stderr[-2000:]
+        return True, ""
+
+    def encode_audio(self, spec, output_filepath, audio_bitrate_kbps=None, run=None):
+        """Encodes the job's audio for the whole trim range in one go (no chunk seams)."""
+        command = [self.ffmpeg_utils.ffmpeg_path, "-y", "-ss", str(spec["start_time_sec"])]
+        if spec.get("input_format") == "concat":
+            command.extend(["-f", "concat", "-safe", "0"])
+        command.extend(["-i", spec["input_filepath"], "-t", str(spec["end_time_sec"] - spec["start_time_sec"]),
+                        "-vn", "-c:a", "aac", "-b:a", f"{audio_bitrate_kbps}k" if audio_bitrate_kbps else spec["audio_bitrate_choice"],
+                        output_filepath])
+        print("FFmpeg Command (Audio):", " ".join(command))
+        result = self.run_command(command, run)
+        if result is None:
+            return False, "Cancelled."
+        if result.returncode != 0:
+            return False, result.stderr[-2000:]
+        return True, ""
@@ -0,0 +1,107 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from output_cache import fingerprint_file
+from utils import get_cache_dir
+
+CROP_DETECT_VERSION = 1
+CROPDETECT_RE = re.compile(r"crop=(-?\d+):(-?\d+):(-?\d+):(-?\d+)")
+FRAMES_PER_SAMPLE = 6 # cropdetect ignores the first couple of frames after a seek
+MIN_BAR_FRACTION = 0.01 # Bars thinner than this (per axis) aren't worth cropping
+
+
+class CropDetector:
+    def __init__(self, ffmpeg_utils, cache_dir=None, samples=12, max_workers=None, limit=24):
+        """
+        Finds letterbox/pillarbox bars with FFmpeg's cropdetect. Short runs at
+        samples points across the range are decoded in parallel, and the result
+        is the per-edge median of their rectangles, so a dark scene or a bright
+        title over the bars doesn't decide it. limit is cropdetect's black
+        threshold (0-255). Results are cached per file content and range.
+        """
+        self.ffmpeg_utils = ffmpeg_utils
+        self.cache_dir = cache_dir or get_cache_dir("crops")
+        self.samples = samples
+        self.max_workers = max_workers or max(1, min(samples, (os.cpu_count() or 2)))
+        self.limit = limit
+
+    def _cache_path(self, filepath, start_time_sec, end_time_sec):
+        fingerprint = fingerprint_file(filepath)
+        params = f"{start_time_sec:.1f}_{end_time_sec:.1f}_{self.samples}_{self.limit}"
+        return os.path.join(self.cache_dir, f"{fingerprint}_{params}.json")
+
+    def _sample(self, filepath, time_sec, input_format):
+        """Last rectangle cropdetect reported around time_sec as (x1, y1, x2, y2), or None."""
+        command = [self.ffmpeg_utils.ffmpeg_path, "-hide_banner", "-nostdin", "-ss", f"{time_sec:.3f}"]
+        if input_format == "concat":
+            command.extend(["-f", "concat", "-safe", "0"])
+        command.extend(["-i", filepath, "-frames:v", str(FRAMES_PER_SAMPLE), "-an", "-sn",
+                        "-vf", f"cropdetect=limit={self.limit}:round=2:reset=0", "-f", "null", "-"])
+        try:
+            result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace', timeout=60)
+        except subprocess.SubprocessError:
+            return None
+        matches = CROPDETECT_RE.findall(result.stderr)
+        if not matches:
+            return None
+        width, height, x, y = (int(value) for value in matches[-1])
+        if width <= 0 or height <= 0:
+            return None # All-black frame: cropdetect reports an inverted box
+        return x, y, x + width, y + height
+
+    def detect(self, filepath, start_time_sec, end_time_sec, video_width, video_height, input_format=None):
+        """
+        Crop for the content area of start_time_sec..end_time_sec as an FFmpeg
+        "crop=w:h:x:y" string, or None if the frame has no bars worth removing
+        or too few samples could be read.
+        """
+        if not self.ffmpeg_utils.ffmpeg_path or video_width <= 0 or video_height <= 0:
+            return None
+        cache_path = None
+        if input_format is None:
+            cache_path = self._cache_path(filepath, start_time_sec, end_time_sec)
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == CROP_DETECT_VERSION:
+                    return data["crop"]
+            except (OSError, ValueError):
+                pass
+
+        # Sample the middle of evenly sized slices so the very first and last frames (fades) are skipped
+        span = max(0.0, end_time_sec - start_time_sec)
+        times = [start_time_sec + span * (i + 0.5) / self.samples for i in range(self.samples)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            boxes = [box for box in pool.map(lambda t: self._sample(filepath, t, input_format), times) if box]
+        if len(boxes) < max(1, self.samples // 3):
+            print(f"Auto crop: only {len(boxes)} of {self.samples} samples were usable.")
+            return None
+
+        crop = self._consensus(boxes, video_width, video_height)
+        print(f"Auto crop: {crop or 'no bars'} from {len(boxes)} samples")
+        if cache_path:
+            try:
+                with open(cache_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": CROP_DETECT_VERSION, "crop": crop, "samples": len(boxes)}, f)
+            except OSError as e:
+                print(f"Warning: Could not cache crop detection: {e}")
+        return crop
+
+    @staticmethod
+    def _consensus(boxes, video_width, video_height):
+        # Per-edge median, rounded outwards to even values so no content is cut
+        x1 = int(statistics.median(box[0] for box in boxes)) // 2 * 2
+        y1 = int(statistics.median(box[1] for box in boxes)) // 2 * 2
+        x2 = min(video_width, -(-int(statistics.median(box[2] for box in boxes)) // 2) * 2)
+        y2 = min(video_height, -(-int(statistics.median(box[3] for box in boxes)) // 2) * 2)
+        width, height = x2 - x1, y2 - y1
+        if width < video_width * 0.25 or height < video_height * 0.25:
+            return None # Implausible: mostly dark footage rather than bars
+        if width >= video_width * (1 - 2 * MIN_BAR_FRACTION) and height >= video_height * (1 - 2 * MIN_BAR_FRACTION):
+            return None
+        return f"crop={width}:{height}:{x1}:{y1}"
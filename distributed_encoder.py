@@ -0,0 +1,436 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ffmpeg_utils import FFmpegUtils
+from bitrate_calculator import BitrateCalculator
+from chunk_encoder import ChunkEncoder
+from job_spec import validate_spec
+
+# Wire protocol: one JSON object per line over TCP.
+#   worker -> coordinator: {"type": "hello", "worker": name}
+#                          {"type": "request"}
+#                          {"type": "heartbeat", "chunk_index": i, "attempt": n}
+#                          {"type": "result", "chunk_index": i, "attempt": n, "ok": bool, "error": str, "elapsed": sec}
+#   coordinator -> worker: {"type": "chunk", "chunk_index": i, "attempt": n, "lease_sec": sec, "spec": {...},
+#                           "start": s, "end": e, "output": path}
+#                          {"type": "done"}
+# Chunk outputs are written straight to the shared work directory, so only small messages cross the socket.
+# A chunk is leased to its worker for lease_sec and the worker renews the lease with heartbeats while it
+# encodes; a lease that runs out (dead worker or network), or a chunk still running after chunk_timeout_sec
+# (e.g. a stalled FFmpeg on a live worker), puts the chunk back in the queue.
+# Every attempt writes its own output file, so a late result can't collide with the retry.
+
+DEFAULT_PORT = 9100
+
+
+def _send_message(stream, message):
+    stream.write((json.dumps(message) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+class _CoordinatorRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker_name = f"{self.client_address[0]}:{self.client_address[1]}"
+        current = None # (chunk_index, attempt) being encoded by this worker
+        try:
+            for line in self.rfile:
+                message = json.loads(line)
+                if message.get("type") == "hello":
+                    worker_name = message.get("worker", worker_name)
+                    print(f"Worker connected: {worker_name}")
+                elif message.get("type") == "request":
+                    assignment = coordinator.next_assignment()
+                    if assignment["type"] == "chunk":
+                        current = (assignment["chunk_index"], assignment["attempt"])
+                    _send_message(self.wfile, assignment)
+                    if assignment["type"] == "done":
+                        break
+                elif message.get("type") == "heartbeat":
+                    coordinator.renew_lease(message["chunk_index"], message.get("attempt"))
+                elif message.get("type") == "result":
+                    coordinator.report_result(message["chunk_index"], message.get("ok", False),
+                                              message.get("error", ""), worker_name, message.get("elapsed"),
+                                              message.get("attempt"))
+                    current = None
+        except (ConnectionError, ValueError) as e:
+            print(f"Worker {worker_name} connection error: {e}")
+        finally:
+            if current is not None:
+                coordinator.report_result(current[0], False, "Worker disconnected", worker_name, attempt=current[1])
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address, coordinator):
+        super().__init__(server_address, _CoordinatorRequestHandler)
+        self.coordinator = coordinator
+
+
+class DistributedCoordinator:
+    def __init__(self, ffmpeg_utils=None, host="127.0.0.1", port=DEFAULT_PORT, work_dir=None,
+                 chunk_duration_sec=10, max_retries=2, lease_sec=60, chunk_timeout_sec=1800):
+        """
+        Splits a job into keyframe-aligned chunks and hands them to workers over TCP.
+        work_dir must be on a filesystem every worker can reach at the same path
+        (as must the input). Failed chunks, chunks whose worker stops sending
+        heartbeats for lease_sec and chunks running longer than chunk_timeout_sec
+        are retried up to max_retries times.
+        """
+        self.ffmpeg_utils = ffmpeg_utils or FFmpegUtils()
+        self.chunk_encoder = ChunkEncoder(self.ffmpeg_utils)
+        self.bitrate_calculator = BitrateCalculator()
+        self.host = host
+        self.port = port
+        self.work_dir = work_dir
+        self.chunk_duration_sec = chunk_duration_sec
+        self.max_retries = max_retries
+        self.lease_sec = lease_sec
+        self.chunk_timeout_sec = chunk_timeout_sec
+
+        self.condition = threading.Condition()
+        self.server = None
+        self._reset([], None, None)
+
+    def _reset(self, chunks, spec, job_dir):
+        self.chunks = chunks
+        self.spec = spec
+        self.job_dir = job_dir
+        self.pending = list(range(len(chunks)))
+        self.states = ["pending"] * len(chunks)
+        self.attempts = [0] * len(chunks)
+        self.leases = {} # chunk_index -> (attempt, deadline, timeout deadline) while a worker has it
+        self.outputs = [None] * len(chunks) # File of the attempt that succeeded
+        self.failure = None
+
+    @property
+    def address(self):
+        return self.server.server_address if self.server else (self.host, self.port)
+
+    def chunk_path(self, chunk_index, attempt):
+        return os.path.join(self.job_dir, f"chunk_{chunk_index:05d}_{attempt}.mp4")
+
+    def next_assignment(self):
+        """
+        Blocks until a chunk is available for a worker, or the job is over.
+        Workers that connect before run() has loaded a job wait for it.
+        """
+        with self.condition:
+            while True:
+                self._expire_leases()
+                if self.failure or (self.spec is not None and all(state == "done" for state in self.states)):
+                    return {"type": "done"}
+                if self.pending:
+                    chunk_index = self.pending.pop(0)
+                    self.states[chunk_index] = "running"
+                    self.attempts[chunk_index] += 1
+                    attempt = self.attempts[chunk_index]
+                    now = time.monotonic()
+                    self.leases[chunk_index] = (attempt, now + self.lease_sec, now + self.chunk_timeout_sec)
+                    start, end = self.chunks[chunk_index]
+                    return {"type": "chunk", "chunk_index": chunk_index, "attempt": attempt, "lease_sec": self.lease_sec,
+                            "spec": self.spec, "start": start, "end": end,
+                            "output": self.chunk_path(chunk_index, attempt)}
+                self.condition.wait(1.0) # No job yet, or everything is in flight and a retry may come back
+
+    def renew_lease(self, chunk_index, attempt=None):
+        with self.condition:
+            lease = self.leases.get(chunk_index)
+            if lease is not None and attempt in (None, lease[0]):
+                # Heartbeats keep a chunk alive, but never past its timeout
+                self.leases[chunk_index] = (lease[0], min(time.monotonic() + self.lease_sec, lease[2]), lease[2])
+
+    def _expire_leases(self):
+        """Requeues (or fails) chunks whose worker stopped renewing its lease. Call with the condition held."""
+        now = time.monotonic()
+        for chunk_index, (attempt, deadline, timeout_deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[chunk_index]
+                reason = f"timed out after {self.chunk_timeout_sec}s" if deadline >= timeout_deadline \
+                    else f"no heartbeat for {self.lease_sec}s"
+                self._retry_or_fail(chunk_index, f"{reason} (attempt {attempt})")
+
+    def _retry_or_fail(self, chunk_index, error):
+        if self.attempts[chunk_index] <= self.max_retries:
+            print(f"Chunk {chunk_index} retrying: {error}")
+            self.states[chunk_index] = "pending"
+            self.pending.insert(0, chunk_index) # Retry ahead of fresh chunks
+        else:
+            self.states[chunk_index] = "failed"
+            self.failure = f"Chunk {chunk_index} failed after {self.attempts[chunk_index]} attempts: {error}"
+        self.condition.notify_all()
+
+    def report_result(self, chunk_index, ok, error, worker_name, elapsed=None, attempt=None):
+        with self.condition:
+            if self.states[chunk_index] in ("done", "failed"):
+                return
+            lease = self.leases.get(chunk_index)
+            attempt = attempt or (lease[0] if lease else self.attempts[chunk_index])
+            if ok:
+                # Even a result for an expired lease is a finished chunk; the retry's result will be ignored
+                self.states[chunk_index] = "done"
+                self.outputs[chunk_index] = self.chunk_path(chunk_index, attempt)
+                self.leases.pop(chunk_index, None)
+                if chunk_index in self.pending:
+                    self.pending.remove(chunk_index)
+                elapsed_text = f" in {elapsed:.1f}s" if elapsed is not None else ""
+                print(f"Chunk {chunk_index} done by {worker_name}{elapsed_text}")
+                self.condition.notify_all()
+            elif lease is not None and lease[0] == attempt:
+                del self.leases[chunk_index]
+                self._retry_or_fail(chunk_index, f"failed on {worker_name}: {error}")
+            # Otherwise the failure belongs to an attempt that already timed out and was requeued
+
+    def start(self):
+        """Starts listening for workers (call before spawning local workers with port=0)."""
+        if self.server is None:
+            self.server = _CoordinatorServer((self.host, self.port), self)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.address
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def _fail_before_start(self, message):
+        """Ends a job that never got to load its chunks, releasing workers already waiting for it."""
+        with self.condition:
+            self._reset([], None, None)
+            self.failure = message
+            self.condition.notify_all()
+        return False, message
+
+    def run(self, spec, output_filepath, status_callback=None):
+        """
+        Encodes spec (build_ffmpeg_command parameters, as in the job server) to
+        output_filepath using whichever workers connect. Returns (success, message).
+        """
+        def report(text):
+            print(text)
+            if status_callback:
+                status_callback(text)
+
+        try:
+            spec = validate_spec(spec) # Before any chunk goes out, so a bad spec doesn't fail on every worker
+        except ValueError as e:
+            return self._fail_before_start(str(e))
+        start_time_sec = spec["start_time_sec"]
+        end_time_sec = spec["end_time_sec"]
+        duration = end_time_sec - start_time_sec
+        if not self.ffmpeg_utils.ffmpeg_path:
+            return self._fail_before_start("FFmpeg executable not found.")
+
+        audio_bitrate_kbps = None
+        if not spec["use_crf"]:
+            # One job-wide bitrate keeps every chunk on the same budget
+            spec["video_bitrate_kbps"], audio_bitrate_kbps = self.bitrate_calculator.calculate_bitrate(
+                float(spec["target_size_mb"]), duration, spec["audio_bitrate_choice"], bool(spec["remove_audio_var"])
+            )
+
+        keyframes = self.chunk_encoder.find_keyframes(spec["input_filepath"], start_time_sec, end_time_sec,
+                                                      spec.get("input_format"))
+        chunks = self.chunk_encoder.plan_chunks(start_time_sec, end_time_sec, self.chunk_duration_sec, keyframes)
+        job_dir = tempfile.mkdtemp(prefix="shorty_dist_", dir=self.work_dir)
+
+        with self.condition:
+            self._reset(chunks, spec, job_dir)
+            self.condition.notify_all()
+
+        host, port = self.start()
+        report(f"Split into {len(chunks)} chunks; waiting for workers on {host}:{port}...")
+        started = time.time()
+
+        audio_result = {}
+        audio_filepath = None
+        audio_thread = None
+        if not spec["remove_audio_var"]:
+            audio_filepath = os.path.join(job_dir, "audio.m4a")
+            audio_thread = threading.Thread(
+                target=lambda: audio_result.update(
+                    result=self.chunk_encoder.encode_audio(spec, audio_filepath, audio_bitrate_kbps)),
+                daemon=True)
+            audio_thread.start()
+
+        try:
+            with self.condition:
+                while not self.failure and not all(state == "done" for state in self.states):
+                    self.condition.wait(1.0)
+                    self._expire_leases()
+                    done = self.states.count("done")
+                    if status_callback:
+                        status_callback(f"Distributed encode: {done}/{len(chunks)} chunks done")
+                failure = self.failure
+
+            if audio_thread:
+                audio_thread.join()
+            if failure:
+                return False, failure
+
+            if audio_thread and not audio_result.get("result", (False, ""))[0]:
+                print(f"Warning: Audio encode failed, output will have no audio: {audio_result.get('result')}")
+                audio_filepath = None
+
+            report("Concatenating chunks...")
+            ok, error = self.chunk_encoder.concat_chunks(
+                self.outputs, output_filepath, audio_filepath,
+                list_path=os.path.join(job_dir, "chunks.ffconcat"))
+            if not ok:
+                return False, f"Concat failed: {error}"
+            elapsed = time.time() - started
+            report(f"Distributed encode complete in {elapsed:.1f}s ({duration / elapsed:.2f}x realtime).")
+            return True, output_filepath
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+
+class DistributedWorker:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, threads=None, name=None):
+        """
+        Connects to a coordinator and encodes the chunks it hands out with the
+        regular command builder until the coordinator says the job is done.
+        """
+        self.host = host
+        self.port = port
+        self.threads = threads
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.chunk_encoder = ChunkEncoder(FFmpegUtils())
+
+    def run_session(self):
+        """Serves one coordinator session. Returns the number of chunks encoded."""
+        encoded = 0
+        with socket.create_connection((self.host, self.port)) as connection:
+            reader = connection.makefile("rb")
+            writer = connection.makefile("wb")
+            _send_message(writer, {"type": "hello", "worker": self.name})
+            while True:
+                _send_message(writer, {"type": "request"})
+                line = reader.readline()
+                if not line:
+                    break # Coordinator went away
+                assignment = json.loads(line)
+                if assignment["type"] == "done":
+                    break
+
+                started = time.time()
+                stop_heartbeats = threading.Event()
+                heartbeats = threading.Thread(target=self._send_heartbeats, args=(writer, assignment, stop_heartbeats),
+                                              daemon=True)
+                heartbeats.start()
+                try:
+                    ok, error = self.chunk_encoder.encode_chunk(assignment["spec"], assignment["start"],
+                                                                assignment["end"], assignment["output"],
+                                                                threads=self.threads)
+                finally:
+                    stop_heartbeats.set()
+                    heartbeats.join() # The socket writer isn't shared while the result goes out
+                _send_message(writer, {"type": "result", "chunk_index": assignment["chunk_index"],
+                                       "attempt": assignment.get("attempt"), "ok": ok, "error": error,
+                                       "elapsed": time.time() - started})
+                if ok:
+                    encoded += 1
+        return encoded
+
+    @staticmethod
+    def _send_heartbeats(writer, assignment, stop_event):
+        """Renews the chunk's lease a few times per lease period until stop_event is set."""
+        interval = max(1.0, assignment.get("lease_sec", 60) / 3)
+        message = {"type": "heartbeat", "chunk_index": assignment["chunk_index"], "attempt": assignment.get("attempt")}
+        while not stop_event.wait(interval):
+            try:
+                _send_message(writer, message)
+            except OSError:
+                return # Connection gone; the main loop finds out when it sends the result
+
+    def serve_forever(self, once=False, retry_interval_sec=2.0, max_connect_attempts=15):
+        """
+        Keeps reconnecting so one worker can serve coordinators one after another.
+        With once=True it exits after a single session, or after max_connect_attempts
+        refused connections if the coordinator never shows up.
+        """
+        refused = 0
+        while True:
+            try:
+                encoded = self.run_session()
+                print(f"Worker {self.name}: session finished, {encoded} chunks encoded.")
+                if once:
+                    return
+                refused = 0
+            except ConnectionRefusedError:
+                refused += 1
+                if once and refused >= max_connect_attempts:
+                    return
+            except OSError as e:
+                print(f"Worker {self.name}: connection lost: {e}")
+                if once:
+                    return
+            time.sleep(retry_interval_sec)
+
+
+def spawn_local_workers(count, host, port, threads=None):
+    """Starts count worker processes on this machine (handy for testing and single-box scaling)."""
+    command = [sys.executable, os.path.abspath(__file__), "worker", "--host", host, "--port", str(port), "--once"]
+    if threads:
+        command.extend(["--threads", str(threads)])
+    return [subprocess.Popen(command) for _ in range(count)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shorty distributed chunk encoding")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help="Encode chunks for a coordinator")
+    worker_parser.add_argument("--host", default="127.0.0.1")
+    worker_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    worker_parser.add_argument("--threads", type=int, default=None, help="FFmpeg threads per chunk")
+    worker_parser.add_argument("--once", action="store_true", help="Exit after one coordinator session")
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="Split a job and collect the result")
+    coordinator_parser.add_argument("--spec", required=True,
+                                    help="Job spec JSON (build_ffmpeg_command parameters, as for the job server)")
+    coordinator_parser.add_argument("--host", default="127.0.0.1", help="Interface workers connect to")
+    coordinator_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coordinator_parser.add_argument("--work-dir", default=None, help="Shared directory for chunk files")
+    coordinator_parser.add_argument("--chunk-sec", type=float, default=10)
+    coordinator_parser.add_argument("--retries", type=int, default=2)
+    coordinator_parser.add_argument("--lease-sec", type=float, default=60,
+                                    help="Requeue a chunk when its worker sends no heartbeat for this long")
+    coordinator_parser.add_argument("--chunk-timeout", type=float, default=1800,
+                                    help="Requeue a chunk still encoding after this many seconds")
+    coordinator_parser.add_argument("--local-workers", type=int, default=0, help="Also start this many local workers")
+    args = parser.parse_args()
+
+    if args.role == "worker":
+        DistributedWorker(args.host, args.port, args.threads).serve_forever(once=args.once)
+    else:
+        if os.path.exists(args.spec):
+            with open(args.spec, "r", encoding="utf-8") as f:
+                job_spec = json.load(f)
+        else:
+            job_spec = json.loads(args.spec)
+        coordinator = DistributedCoordinator(host=args.host, port=args.port, work_dir=args.work_dir,
+                                             chunk_duration_sec=args.chunk_sec, max_retries=args.retries,
+                                             lease_sec=args.lease_sec, chunk_timeout_sec=args.chunk_timeout)
+        bound_host, bound_port = coordinator.start()
+        local_workers = spawn_local_workers(args.local_workers, bound_host, bound_port)
+        success, message = coordinator.run(job_spec, job_spec["output_filepath"])
+        coordinator.stop()
+        for worker in local_workers:
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.terminate() # Never got a chunk before the job finished
+        print(message)
+        sys.exit(0 if success else 1)
@@ -6,11 +6,46 @@ import tempfile
 import threading
 from tkinter import messagebox
 
+from job_history import format_duration
+from process_control import suspend_process, resume_process, terminate_process
+
+TIME_RE = re.compile(r"time=(\d{2}):(\d{2}):(\d{2})\.\d+")
+UI_UPDATE_INTERVAL_SEC = 0.1 # Progress redraws are throttled to this; FFmpeg can print far faster
+
+def parse_progress_time(line):
+    """
+    Returns the whole seconds encoded so far from an FFmpeg stderr progress
+    line, or None if the line carries no time= field.
+    """
+    match = TIME_RE.search(line)
+    if not match:
+        return None
+    hours = int(match.group(1))
+    minutes = int(match.group(2))
+    seconds = int(match.group(3))
+    return hours * 3600 + minutes * 60 + seconds
+
 class FFmpegExecutor:
     def __init__(self, app_instance):
         self.app = app_instance
         self.ffmpeg_process = None
         self.current_pass = 0 # 0: idle, 1: pass1, 2: pass2
+        self.eta_deadline = None # Predicted wall clock finish of the whole job, set by the caller
+        self.cancel_requested = False # Set by cancel_compression, cleared by begin_job
+        self.paused = False
+        self.paused_at = None
+        self.paused_total_sec = 0.0 # Time spent paused this job
+
+    def begin_job(self, eta_deadline=None):
+        """
+        Clears the per-job state (cancel and pause flags, paused time) before a new
+        job's first pass, so nothing carries over from one that ended while paused.
+        """
+        self.cancel_requested = False
+        self.paused = False
+        self.paused_at = None
+        self.paused_total_sec = 0.0
+        self.eta_deadline = eta_deadline
 
     def execute_ffmpeg_command(self, command, duration_in_seconds, pass_number, total_passes):
         self.current_pass = pass_number
@@ -21,6 +56,8 @@ class FFmpegExecutor:
         
         try:
             self.ffmpeg_process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1, encoding='utf-8', errors='replace')
+            if self.paused: # Paused between passes: the next pass starts frozen too
+                suspend_process(self.ffmpeg_process)
         except FileNotFoundError:
             self.app.master.after(0, lambda: messagebox.showerror("Error", "FFmpeg executable not found. Please ensure it's in your PATH or in the same directory as the script."))
             return False
@@ -28,23 +65,18 @@ class FFmpegExecutor:
             self.app.master.after(0, lambda: messagebox.showerror("Error", f"Failed to start FFmpeg process: {e}"))
             return False
 
-        time_re = re.compile(r"time=(\d{2}):(\d{2}):(\d{2})\.\d+")
-        
         start_progress_offset = (pass_number - 1) * (100 / total_passes)
         progress_scale_factor = (100 / total_passes) / duration_in_seconds if duration_in_seconds > 0 else 0
 
+        last_ui_update = 0.0
         try:
-            for line in iter(self.ffmpeg_process.stderr.readline, ''):
+            for line in iter(self.ffmpeg_process.stderr.readline, ''): # Blocks until FFmpeg writes, so no polling delay is needed
                 if self.ffmpeg_process.poll() is not None and not line: # Process terminated and no more lines to read
                     break
 
-                match = time_re.search(line)
-                if match:
-                    hours = int(match.group(1))
-                    minutes = int(match.group(2))
-                    seconds = int(match.group(3))
-                    current_time = hours * 3600 + minutes * 60 + seconds
-
+                current_time = parse_progress_time(line)
+                if current_time is not None and time.monotonic() - last_ui_update >= UI_UPDATE_INTERVAL_SEC:
+                    last_ui_update = time.monotonic() # Parse every line, but only redraw a few times a second
                     if duration_in_seconds > 0:
                         current_pass_progress = (current_time * progress_scale_factor)
                         # Cap progress within the current pass's segment (e.g., 0-50% for pass 1)
@@ -52,9 +84,8 @@ class FFmpegExecutor:
                         total_progress_percentage = min(total_progress_percentage, start_progress_offset + (100 / total_passes) - 0.1) # Keep it slightly below 100% of the pass
 
                         self.app.master.after(0, lambda p=total_progress_percentage: self.app.progress_bar.config(value=p))
-                        self.app.master.after(0, lambda ct=current_time: self.app.status_label.config(text=f"{pass_prefix}Processing: {ct} / {int(duration_in_seconds)} seconds"))
-                
-                time.sleep(0.005) # Small delay to prevent UI freeze and excessive CPU usage from parsing
+                        self.app.master.after(0, lambda ct=current_time: self.app.status_label.config(text=f"{pass_prefix}Processing: {ct} / {int(duration_in_seconds)} seconds{self._eta_text()}"))
+
 
             # Ensure all remaining output is read if process exited
             self.ffmpeg_process.stderr.read() 
@@ -72,8 +103,7 @@ class FFmpegExecutor:
         except Exception as e:
             print(f"An error occurred during FFmpeg execution: {e}")
             self.app.master.after(0, lambda: messagebox.showerror("Error", f"An unexpected error occurred during compression: {e}"))
-            if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
-                self.ffmpeg_process.terminate()
+            terminate_process(self.ffmpeg_process)
             return False
         finally:
             if self.ffmpeg_process:
@@ -82,9 +112,39 @@ class FFmpegExecutor:
                 self.ffmpeg_process = None # Clear the process handle
             self.current_pass = 0 # Reset pass state
 
+    def _eta_text(self):
+        if self.eta_deadline is None:
+            return ""
+        remaining = self.eta_deadline - time.time()
+        return f" (ETA {format_duration(remaining)})" if remaining > 0 else ""
+
+    def pause_compression(self):
+        """Freezes the running FFmpeg process, keeping its work, until resume_compression."""
+        if self.paused or not self.ffmpeg_process or self.ffmpeg_process.poll() is not None:
+            return False
+        self.paused = True
+        self.paused_at = time.time()
+        suspend_process(self.ffmpeg_process)
+        self.app.master.after(0, lambda: self.app.status_label.config(text="Compression paused."))
+        return True
+
+    def resume_compression(self):
+        if not self.paused:
+            return False
+        self.paused = False
+        paused_sec = time.time() - self.paused_at
+        self.paused_total_sec += paused_sec
+        if self.eta_deadline is not None:
+            self.eta_deadline += paused_sec # Time spent paused doesn't count towards the ETA
+        resume_process(self.ffmpeg_process)
+        self.app.master.after(0, lambda: self.app.status_label.config(text="Compression resumed."))
+        return True
+
     def cancel_compression(self):
         if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
-            self.ffmpeg_process.terminate()
+            self.cancel_requested = True
+            self.paused = False
+            terminate_process(self.ffmpeg_process) # Also continues a paused process so it can exit
             self.app.master.after(0, lambda: self.app.status_label.config(text="Compression cancelled by user."))
             self.app.master.after(0, lambda: self.app.progress_bar.config(value=0))
             # Enable the process button and disable the cancel button
@@ -1,42 +1,123 @@
 import subprocess
 import os
+import json
 import sys
 from tkinter import messagebox # Still needed for showing FFmpeg path error
 
+from filter_planner import FilterPlanner
+
+STREAM_PROTOCOLS = ("pipe:", "tcp://", "udp://", "unix:", "srt://", "rtmp://", "http://", "https://")
+
+# -movflags for each MP4 output layout. Fragmented files can be consumed while they are still
+# being written and are the only MP4 layout that works on a non-seekable pipe or socket.
+MP4_OUTPUT_MODES = {
+    "standard": None,
+    "faststart": "+faststart", # moov moved to the front in place when the encode finishes
+    "fragmented": "frag_keyframe+empty_moov+default_base_moof",
+}
+
+def is_stream_path(path):
+    """True for stdin/stdout ("-") and pipe or network URLs rather than regular files."""
+    return path == "-" or str(path).startswith(STREAM_PROTOCOLS)
+
 class FFmpegUtils:
     def __init__(self, app_instance=None): # Added app_instance for potential future use or consistency
         self.ffmpeg_path = self._get_ffmpeg_path()
+        self.ffprobe_path = self._get_ffprobe_path()
         self.app = app_instance # Store app_instance if needed for UI updates from here
+        self.filter_planner = FilterPlanner()
+        self._video_codec_cache = {} # (path, size, mtime) -> codec name or None
 
     def _get_ffmpeg_path(self):
         """
         Determines the correct path to the FFmpeg executable, whether running
         as a PyInstaller bundled app or a regular Python script.
         """
+        return self._get_executable_path("ffmpeg")
+
+    def _get_ffprobe_path(self):
+        """
+        Same lookup as _get_ffmpeg_path for ffprobe, which is bundled alongside
+        ffmpeg in the PyInstaller build.
+        """
+        return self._get_executable_path("ffprobe")
+
+    def _get_executable_path(self, name):
         if getattr(sys, 'frozen', False):
             base_path = sys._MEIPASS # sys._MEIPASS is directly available on sys
         else:
             base_path = os.path.dirname(os.path.abspath(__file__))
         
-        ffmpeg_exe_name = "ffmpeg.exe" if os.sys.platform == "win32" else "ffmpeg"
-        ffmpeg_path = os.path.join(base_path, ffmpeg_exe_name)
+        exe_name = f"{name}.exe" if os.sys.platform == "win32" else name
+        exe_path = os.path.join(base_path, exe_name)
         
-        if not os.path.exists(ffmpeg_path):
+        if not os.path.exists(exe_path):
             try:
                 # Try running without a full path, assuming it's in system PATH
-                subprocess.run([ffmpeg_exe_name, "-version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                return ffmpeg_exe_name
+                subprocess.run([exe_name, "-version"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                return exe_name
             except (subprocess.CalledProcessError, FileNotFoundError):
                 return None
             
-        return ffmpeg_path
+        return exe_path
+
+    def probe_media(self, filepath):
+        """
+        Returns ffprobe's JSON description (format and streams) of filepath.
+        Raises RuntimeError if ffprobe is missing or can't read the file.
+        """
+        if not self.ffprobe_path:
+            raise RuntimeError("FFprobe executable not found. Please ensure it's in your PATH or in the same directory as the script.")
+        result = subprocess.run(
+            [self.ffprobe_path, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", filepath],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace'
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"FFprobe could not read {filepath}: {result.stderr.strip()}")
+        return json.loads(result.stdout)
+
+    def probe_video_codec(self, filepath):
+        """
+        Codec name of the first video stream, or None if it can't be probed
+        (no ffprobe, pipes and URLs). Cached per file version, since the command
+        builder asks for every pass.
+        """
+        if not self.ffprobe_path or is_stream_path(filepath) or not os.path.isfile(filepath):
+            return None
+        stat = os.stat(filepath)
+        key = (filepath, stat.st_size, stat.st_mtime)
+        if key not in self._video_codec_cache:
+            try:
+                streams = self.probe_media(filepath).get("streams", [])
+                codec = next((s.get("codec_name") for s in streams if s.get("codec_type") == "video"), None)
+            except (RuntimeError, ValueError):
+                codec = None
+            self._video_codec_cache[key] = codec
+        return self._video_codec_cache[key]
+
+    def plan_filters(self, input_filepath, original_video_width, original_video_height, original_video_fps,
+                     crop_params, resolution_choice, target_framerate, gpu_accel_choice="None", input_format=None):
+        """
+        FilterPlan for the crop / resolution / frame rate choices, as used by
+        build_ffmpeg_command. Anything decoding the source to compare against
+        the output must apply the whole plan (input_args too, for -lowres).
+        """
+        downscaling = resolution_choice in ("Half", "Quarter")
+        # QSV decodes on the GPU, where -lowres doesn't apply; concat lists can mix codecs
+        allow_decoder_scaling = downscaling and gpu_accel_choice != "Intel (QSV)" and input_format != "concat"
+        return self.filter_planner.plan(
+            original_video_width, original_video_height, original_video_fps, crop_params, resolution_choice,
+            target_framerate, input_codec=self.probe_video_codec(input_filepath) if allow_decoder_scaling else None,
+            allow_decoder_scaling=allow_decoder_scaling
+        )
 
     def build_ffmpeg_command(self, input_filepath, output_filepath, start_time_sec, end_time_sec, 
                              resolution_choice, use_crf, video_crf, target_size_mb, # Changed half_res_enabled to resolution_choice
                              remove_audio_var, audio_bitrate_choice, target_framerate, 
                              ffmpeg_preset, use_hevc, gpu_accel_choice, original_video_width, 
                              original_video_height, original_video_fps, crop_params, 
-                             pass_number=1, total_passes=1, video_bitrate_kbps=None, audio_bitrate_kbps=None):
+                             pass_number=1, total_passes=1, video_bitrate_kbps=None, audio_bitrate_kbps=None,
+                             pass_log_file=None, input_format=None, output_mode="standard"):
         
         if not self.ffmpeg_path:
             messagebox.showerror("FFmpeg Error", "FFmpeg executable not found. Please ensure it's in your PATH or in the same directory as the script.")
@@ -44,8 +125,19 @@ class FFmpegUtils:
 
         command = [self.ffmpeg_path, "-y"] # -y to overwrite output file without asking
 
+        # Crop, scale and frame rate as the cheapest equivalent filter graph
+        filter_plan = self.plan_filters(input_filepath, original_video_width, original_video_height,
+                                        original_video_fps, crop_params, resolution_choice, target_framerate,
+                                        gpu_accel_choice, input_format)
+        command.extend(filter_plan.global_args)
+
         # Input file and trimming
-        command.extend(["-ss", str(start_time_sec), "-i", input_filepath])
+        command.extend(["-ss", str(start_time_sec)])
+        if input_format == "concat":
+            # input_filepath is an ffconcat list; -safe 0 allows the absolute paths it contains
+            command.extend(["-f", "concat", "-safe", "0"])
+        command.extend(filter_plan.input_args)
+        command.extend(["-i", "pipe:0" if input_filepath == "-" else input_filepath])
         if end_time_sec > start_time_sec:
             command.extend(["-t", str(end_time_sec - start_time_sec)])
 
@@ -85,44 +177,16 @@ class FFmpegUtils:
             if video_bitrate_kbps is not None:
                 command.extend(["-b:v", f"{video_bitrate_kbps}k"])
             
-            # Two-pass encoding for target size
-            if pass_number == 1:
-                command.extend(["-pass", "1", "-f", "mp4", os.devnull]) # Output to null for pass 1
-            else: # pass_number == 2
-                command.extend(["-pass", "2"])
+            # Two-pass encoding for target size. total_passes=1 is plain single-pass ABR,
+            # needed when the input is a pipe that can only be read once.
+            if total_passes > 1:
+                command.extend(["-pass", str(pass_number)])
+                if pass_log_file:
+                    # Both passes must agree on the stats file; a per-job path keeps concurrent encodes apart
+                    command.extend(["-passlogfile", pass_log_file.replace("\\", "/")])
         
-        # Scaling and Cropping
-        filters = []
-        if crop_params:
-            filters.append(crop_params)
-
-        # Handle resolution choice
-        target_width = original_video_width
-        target_height = original_video_height
-
-        if resolution_choice == "Half":
-            target_width = original_video_width // 2
-            target_height = original_video_height // 2
-        elif resolution_choice == "Quarter":
-            target_width = original_video_width // 4
-            target_height = original_video_height // 4
-            
-        # Ensure even dimensions for FFmpeg compatibility
-        target_width = (target_width // 2) * 2
-        target_height = (target_height // 2) * 2
-
-        if resolution_choice != "Full": # Apply scale filter only if not full resolution
-            filters.append(f"scale={target_width}:{target_height}")
-
-        # Frame Rate
-        if target_framerate != "Original":
-            try:
-                filters.append(f"fps={int(target_framerate)}")
-            except ValueError:
-                pass # Fallback to original if invalid value
-
-        if filters:
-            command.extend(["-vf", ",".join(filters)])
+        # Scaling, cropping and frame rate (planned above)
+        command.extend(filter_plan.output_args())
         
         # Audio Options
         if remove_audio_var.get(): # remove_audio_var is the tk.BooleanVar object
@@ -135,7 +199,20 @@ class FFmpegUtils:
                 command.extend(["-b:a", audio_bitrate_choice]) # Fallback if not calculated
 
         # Output file
-        if not (not use_crf and pass_number == 1): # Don't specify output for pass 1 of 2-pass encoding
-            command.append(output_filepath)
+        if not use_crf and total_passes > 1 and pass_number == 1:
+            # Pass 1 only gathers stats, so output to null. This goes last so the filter
+            # and audio options above still apply to pass 1 instead of being trailing options.
+            command.extend(["-f", "mp4", os.devnull])
+        else:
+            stream_output = is_stream_path(output_filepath)
+            if stream_output and output_mode != "fragmented":
+                print(f"Output {output_filepath} is not seekable; writing fragmented MP4 instead of {output_mode}.")
+                output_mode = "fragmented"
+            movflags = MP4_OUTPUT_MODES.get(output_mode)
+            if movflags:
+                command.extend(["-movflags", movflags])
+            if stream_output:
+                command.extend(["-f", "mp4"]) # No file extension to infer the container from
+            command.append("pipe:1" if output_filepath == "-" else output_filepath)
 
         return command
@@ -0,0 +1,156 @@
+import os
+import re
+
+# Decoders that can decode straight to 1/2, 1/4 or 1/8 size with -lowres (skipping most of the IDCT work)
+LOWRES_DECODERS = ("mjpeg", "mpeg1video", "mpeg2video", "mpeg4", "h263", "h261", "flv1",
+                   "msmpeg4v2", "msmpeg4v3", "wmv1", "wmv2", "jpeg2000")
+MAX_LOWRES = 2
+
+CROP_RE = re.compile(r"^crop=(\d+):(\d+):(\d+):(\d+)$")
+
+
+class FilterPlan:
+    def __init__(self, global_args, input_args, filters, width, height, fps, pixel_ops):
+        """
+        global_args go right after the executable, input_args before -i and
+        filters into -vf. width/height/fps describe the output frames (0 if
+        unknown). pixel_ops estimates the decode and filter work for one second
+        of input.
+        """
+        self.global_args = global_args
+        self.input_args = input_args
+        self.filters = filters
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pixel_ops = pixel_ops
+
+    def output_args(self):
+        return ["-vf", ",".join(self.filters)] if self.filters else []
+
+
+class FilterPlanner:
+    """
+    Turns the crop / resolution / frame rate choices into the cheapest
+    equivalent FFmpeg filter graph: no-op filters are removed, frames are
+    dropped before anything touches them, downscaling is done by the
+    decoder where it can, and the scaler and filter thread count follow the
+    output size.
+    """
+
+    @staticmethod
+    def target_dimensions(width, height, resolution_choice):
+        # Same rule the command builder has always used: a fraction of the source size, rounded down to even
+        divisor = {"Half": 2, "Quarter": 4}.get(resolution_choice, 1)
+        return (width // divisor) // 2 * 2, (height // divisor) // 2 * 2
+
+    @staticmethod
+    def parse_crop(crop_params):
+        match = CROP_RE.match(crop_params or "")
+        return tuple(int(value) for value in match.groups()) if match else None
+
+    @staticmethod
+    def scaler_flags(in_width, in_height, out_width, out_height):
+        """area for strong downscales (cheap and alias free), bilinear for small outputs, else FFmpeg's bicubic."""
+        if out_width * 2 <= in_width and out_height * 2 <= in_height:
+            return "area"
+        if out_width * out_height <= 640 * 360:
+            return "bilinear"
+        return "bicubic"
+
+    @staticmethod
+    def filter_threads(out_width, out_height):
+        pixels = out_width * out_height
+        if pixels <= 640 * 360:
+            return 1 # Thread hand-off costs more than it saves on small frames
+        if pixels <= 1920 * 1080:
+            return 2
+        return max(2, min(4, (os.cpu_count() or 2) // 2))
+
+    def plan(self, source_width, source_height, source_fps, crop_params, resolution_choice, target_framerate,
+             input_codec=None, allow_decoder_scaling=True):
+        width, height = source_width, source_height
+        fps = float(source_fps or 0)
+
+        target_fps = None
+        if target_framerate != "Original":
+            try:
+                target_fps = int(target_framerate)
+            except ValueError:
+                pass # Fallback to original if invalid value
+        if target_fps and fps and abs(target_fps - fps) < 0.01:
+            target_fps = None # Already at that rate
+
+        crop = self.parse_crop(crop_params)
+        if crop and width and height and crop == (width, height, 0, 0):
+            crop = None # Covers the whole frame
+        # Any other crop expression (e.g. from a job spec) is kept verbatim; its output size is unknown
+        raw_crop = crop_params if crop_params and not self.parse_crop(crop_params) else None
+
+        target_width, target_height = self.target_dimensions(source_width, source_height, resolution_choice)
+        scale_needed = resolution_choice in ("Half", "Quarter") and target_width > 0 and target_height > 0
+
+        filters = []
+        decode_pixels = source_width * source_height * (fps or 30) # Per second of input
+        filter_pixels = 0
+        if target_fps and (not fps or target_fps < fps):
+            # Drop frames first so nothing downstream (crop, scale) works on frames that are discarded
+            filters.append(f"fps={target_fps}")
+            fps = target_fps
+            target_fps = None
+
+        # Decoder-side downscaling: pick the largest power of two that keeps the region being
+        # kept (the crop, if any) at least as big as the target, so nothing is upscaled back
+        input_args = []
+        lowres = 0
+        if scale_needed and allow_decoder_scaling and input_codec in LOWRES_DECODERS and not raw_crop:
+            region_width, region_height = (crop[0], crop[1]) if crop else (source_width, source_height)
+            while lowres < MAX_LOWRES and region_width // 2 ** (lowres + 1) >= target_width \
+                    and region_height // 2 ** (lowres + 1) >= target_height:
+                lowres += 1
+            if crop and any(value % 2 ** lowres for value in crop):
+                lowres = 0 # Crop offsets wouldn't map onto the smaller decoded frame exactly
+        if lowres:
+            input_args = ["-lowres", str(lowres)]
+            factor = 2 ** lowres
+            width, height = -(-source_width // factor), -(-source_height // factor)
+            decode_pixels /= factor * factor
+            if crop:
+                crop = tuple(value // factor for value in crop)
+
+        if crop:
+            filters.append("crop={}:{}:{}:{}".format(*crop)) # Zero-copy in FFmpeg, only moves the frame pointers
+            width, height = crop[0], crop[1]
+        elif raw_crop:
+            filters.append(raw_crop)
+            width, height = 0, 0
+
+        if scale_needed and (target_width, target_height) != (width, height):
+            flags = self.scaler_flags(width or source_width, height or source_height, target_width, target_height)
+            filters.append(f"scale={target_width}:{target_height}:flags={flags}")
+            in_pixels = width * height or source_width * source_height
+            filter_pixels += (in_pixels + target_width * target_height) * (fps or 30)
+            width, height = target_width, target_height
+
+        if target_fps:
+            filters.append(f"fps={target_fps}") # Raising the rate only duplicates frames, so do it on the smallest ones
+            fps = target_fps
+
+        global_args = []
+        if filter_pixels:
+            global_args = ["-filter_threads", str(self.filter_threads(width, height))]
+        return FilterPlan(global_args, input_args, filters, width, height, fps, decode_pixels + filter_pixels)
+
+    @staticmethod
+    def naive_pixel_ops(source_width, source_height, source_fps, crop_params, resolution_choice):
+        """Work done by the old fixed crop -> scale -> fps chain, for comparison with plan()."""
+        fps = float(source_fps or 30)
+        pixel_ops = source_width * source_height * fps
+        width, height = source_width, source_height
+        crop = FilterPlanner.parse_crop(crop_params)
+        if crop:
+            width, height = crop[0], crop[1]
+        if resolution_choice in ("Half", "Quarter"):
+            target_width, target_height = FilterPlanner.target_dimensions(source_width, source_height, resolution_choice)
+            pixel_ops += (width * height + target_width * target_height) * fps
+        return pixel_ops
@@ -0,0 +1,173 @@
+import os
+import tkinter as tk
+from tkinter import ttk
+
+from PIL import Image, ImageTk
+
+from thumbnail_cache import THUMBNAIL_WIDTH, list_videos
+
+CELL_PADDING = 8
+THUMBNAIL_HEIGHT = THUMBNAIL_WIDTH * 9 // 16
+CELL_WIDTH = THUMBNAIL_WIDTH + 2 * CELL_PADDING
+CELL_HEIGHT = THUMBNAIL_HEIGHT + 56 # Room for two lines of text under the thumbnail
+REFRESH_DELAY_MS = 80 # Scroll events are coalesced before requesting thumbnails
+
+
+def format_metadata(metadata):
+    if metadata.get("error") and not metadata.get("width"):
+        return metadata["error"][:40]
+    minutes, seconds = divmod(int(metadata.get("duration", 0)), 60)
+    parts = [f"{minutes}:{seconds:02d}", f"{metadata['width']}x{metadata['height']}"]
+    if metadata.get("fps"):
+        parts.append(f"{metadata['fps']:.0f} fps")
+    if metadata.get("codec"):
+        parts.append(metadata["codec"])
+    parts.append(f"{metadata.get('size_bytes', 0) / (1024 * 1024):.0f} MB")
+    return " · ".join(parts)
+
+
+class FolderBrowser(tk.Toplevel):
+    def __init__(self, master, folder, thumbnail_cache, on_select):
+        """
+        Scrollable grid of every video in folder with a poster frame and key
+        metadata. Only cells in view are drawn and have thumbnails requested, so
+        opening a large folder is immediate; cached thumbnails show at once.
+        on_select(filepath) is called when a video is clicked.
+        """
+        super().__init__(master)
+        self.title(f"Browse - {folder}")
+        self.geometry("920x640")
+        self.thumbnail_cache = thumbnail_cache
+        self.on_select = on_select
+        self.videos = list_videos(folder)
+        self.index_of = {path: i for i, path in enumerate(self.videos)}
+
+        self.columns = 1
+        self.drawn = set() # Indices whose placeholder items exist on the canvas
+        self.loaded = {} # Index -> metadata applied to its cell
+        self.requested = set()
+        self.photos = {} # Index -> PhotoImage; must stay referenced while shown
+        self.refresh_job = None
+
+        self.status_label = ttk.Label(self, text=f"{len(self.videos)} videos")
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=2)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = tk.Canvas(self, bg="gray15", highlightthickness=0, yscrollcommand=self.scrollbar.set)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<MouseWheel>", lambda e: self._scroll_units(-1 if e.delta > 0 else 1))
+        self.canvas.bind("<Button-4>", lambda e: self._scroll_units(-1)) # Linux wheel
+        self.canvas.bind("<Button-5>", lambda e: self._scroll_units(1))
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _on_configure(self, event):
+        columns = max(1, event.width // CELL_WIDTH)
+        if columns != self.columns:
+            self.columns = columns
+            # Reflow: cell positions depend on the column count
+            self.canvas.delete("all")
+            self.drawn.clear()
+            rows = -(-len(self.videos) // self.columns)
+            self.canvas.config(scrollregion=(0, 0, self.columns * CELL_WIDTH, rows * CELL_HEIGHT))
+        self._schedule_refresh()
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self._schedule_refresh()
+
+    def _scroll_units(self, units):
+        self.canvas.yview_scroll(units, "units")
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+        self.refresh_job = self.after(REFRESH_DELAY_MS, self._refresh_visible)
+
+    def _visible_indices(self):
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(0, int(top // CELL_HEIGHT) - 1) # One row of margin each way
+        last_row = int(bottom // CELL_HEIGHT) + 1
+        return range(first_row * self.columns, min(len(self.videos), (last_row + 1) * self.columns))
+
+    def _refresh_visible(self):
+        self.refresh_job = None
+        visible = self._visible_indices()
+        keep = {self.videos[i] for i in visible}
+        # Thumbnails that were queued for cells now out of view are dropped so the visible ones go first
+        for path in self.thumbnail_cache.cancel_pending(keep=keep):
+            self.requested.discard(self.index_of[path])
+
+        for index in visible:
+            if index not in self.drawn:
+                self._draw_cell(index)
+            if index in self.loaded or index in self.requested:
+                continue
+            metadata = self.thumbnail_cache.lookup(self.videos[index])
+            if metadata is not None:
+                self._apply(index, metadata)
+            else:
+                self.requested.add(index)
+                self.thumbnail_cache.request(self.videos[index], self._on_thumbnail_ready)
+        self.status_label.config(text=f"{len(self.videos)} videos, {len(self.loaded)} loaded")
+
+    def _cell_origin(self, index):
+        row, column = divmod(index, self.columns)
+        return column * CELL_WIDTH + CELL_PADDING, row * CELL_HEIGHT + CELL_PADDING
+
+    def _draw_cell(self, index):
+        x, y = self._cell_origin(index)
+        tag = f"cell{index}"
+        self.canvas.create_rectangle(x, y, x + THUMBNAIL_WIDTH, y + THUMBNAIL_HEIGHT, fill="gray25", outline="",
+                                     tags=(tag, f"{tag}_box"))
+        name = os.path.basename(self.videos[index])
+        self.canvas.create_text(x, y + THUMBNAIL_HEIGHT + 4, anchor="nw", text=name, fill="white",
+                                width=THUMBNAIL_WIDTH, tags=(tag,))
+        self.canvas.create_text(x, y + THUMBNAIL_HEIGHT + 22, anchor="nw", text="...", fill="gray70",
+                                width=THUMBNAIL_WIDTH, tags=(tag, f"{tag}_info"))
+        self.canvas.tag_bind(tag, "<Button-1>", lambda e, path=self.videos[index]: self._select(path))
+        self.drawn.add(index)
+        if index in self.loaded:
+            self._apply(index, self.loaded[index]) # Redrawn after a reflow
+
+    def _on_thumbnail_ready(self, filepath, metadata):
+        # Called from a pool thread; hand over to the Tk thread
+        try:
+            self.after(0, lambda: self._apply(self.index_of[filepath], metadata))
+        except (RuntimeError, tk.TclError):
+            pass # Window already closed
+
+    def _apply(self, index, metadata):
+        if not self.winfo_exists():
+            return
+        self.requested.discard(index)
+        self.loaded[index] = metadata
+        if index not in self.drawn:
+            return # Scrolled away since; drawn with this metadata when it comes back into view
+        tag = f"cell{index}"
+        self.canvas.itemconfig(f"{tag}_info", text=format_metadata(metadata))
+        thumbnail_path = self.thumbnail_cache.thumbnail_path(metadata)
+        if thumbnail_path and index not in self.photos:
+            try:
+                with Image.open(thumbnail_path) as image:
+                    image.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT))
+                    self.photos[index] = ImageTk.PhotoImage(image)
+            except OSError:
+                return
+        if index in self.photos:
+            x, y = self._cell_origin(index)
+            self.canvas.create_image(x + THUMBNAIL_WIDTH // 2, y + THUMBNAIL_HEIGHT // 2, image=self.photos[index],
+                                     tags=(tag,))
+
+    def _select(self, filepath):
+        self._on_close()
+        self.on_select(filepath)
+
+    def _on_close(self):
+        self.thumbnail_cache.cancel_pending()
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+        self.destroy()
@@ -5,7 +5,19 @@ from PIL import Image, ImageTk
 import os
 import threading
 import tempfile
+import time
 from video_processor import VideoProcessor # Import the VideoProcessor
+from job_history import codec_label, estimate_output_dimensions, format_duration
+from video_joiner import VideoJoiner
+from quality_targeter import QualityTargetCancelled
+from segmented_packager import SegmentedPackager
+from background_task import BackgroundRun
+from thumbnail_cache import ThumbnailCache
+from folder_browser import FolderBrowser
+from scene_index import SceneIndexer
+from preview_player import PreviewPlayer
+from crop_detector import CropDetector
+from proxy_media import ProxyCache
 
 # Import ctypes for Windows AppID setting
 import ctypes
@@ -70,6 +82,9 @@ class VideoEditorApp:
         self.target_size_mb = tk.StringVar(value="10")
         self.video_crf = tk.StringVar(value="23")
         self.use_crf = tk.BooleanVar(value=False)
+        self.use_quality_target = tk.BooleanVar(value=False) # Pick the CRF automatically from a quality floor
+        self.quality_metric = tk.StringVar(value="SSIM")
+        self.quality_floor = tk.StringVar(value="0.95")
         
         self.remove_audio = tk.BooleanVar(value=False)
         self.audio_bitrate_choice = tk.StringVar(value="96k")
@@ -77,9 +92,20 @@ class VideoEditorApp:
         self.ffmpeg_preset = tk.StringVar(value="medium")
         self.use_hevc = tk.BooleanVar(value=False)
         self.gpu_accel_choice = tk.StringVar(value="None")
+        self.mp4_layout = tk.StringVar(value="Standard") # Standard / Faststart / Fragmented
+        self.package_choice = tk.StringVar(value="None") # HLS/DASH segmented output instead of one MP4
 
         # Video capture object
         self.video_cap = None
+        self.preview_source_path = None # File currently open in video_cap (changes per segment when joining)
+        self.proxy_path = None # All-intra preview copy of a large input, once built; encodes still read the original
+        self.proxy_mapping = None
+
+        # Join mode: input_filepath holds an ffconcat list built by VideoJoiner
+        self.join_result = None
+        self.input_format = None
+        self.job_running = False
+        self.retired_joins = [] # Joins replaced while a job was reading them; cleaned up when it finishes
         self.video_duration_sec = 0
         self.original_video_width = 0
         self.original_video_height = 0
@@ -91,6 +117,7 @@ class VideoEditorApp:
         self.crop_end_x = -1
         self.crop_end_y = -1
         self.crop_rectangle_id = None
+        self.auto_crop = None # FFmpeg crop from black bar detection, in video pixels; replaced by a drawn crop
         self.displayed_frame_on_canvas = None
         self.current_preview_cv_frame = None
 
@@ -102,9 +129,19 @@ class VideoEditorApp:
 
         # Initialize VideoProcessor
         self.video_processor = VideoProcessor(self)
+        self.video_joiner = VideoJoiner(self.video_processor.ffmpeg_utils)
+        self.thumbnail_cache = None # Created on first Browse Folder
+        self.scene_indexer = SceneIndexer(self.video_processor.ffmpeg_utils)
+        self.crop_detector = CropDetector(self.video_processor.ffmpeg_utils)
+        self.proxy_cache = ProxyCache(self.video_processor.ffmpeg_utils)
+        self.scene_cuts = [] # Cut times (sec) of the loaded video, filled in the background
+        self.snap_to_cuts = tk.BooleanVar(value=True)
 
         # --- GUI Setup ---
         self._create_widgets()
+        self.preview_player = PreviewPlayer(self.canvas, self.video_processor.ffmpeg_utils,
+                                            on_position=self._on_playback_position,
+                                            on_finished=self._on_playback_finished)
         self._bind_events()
 
         # Handle window closing to release resources
@@ -129,6 +166,8 @@ class VideoEditorApp:
         ttk.Label(input_output_frame, text="Input Video:").grid(row=0, column=0, sticky="e", padx=5, pady=5)
         ttk.Entry(input_output_frame, textvariable=self.input_filepath, width=60).grid(row=0, column=1, padx=5, pady=5, sticky="ew")
         ttk.Button(input_output_frame, text="Browse", command=self._browse_input_file).grid(row=0, column=2, padx=5, pady=5)
+        ttk.Button(input_output_frame, text="Join Files", command=self._browse_join_files).grid(row=0, column=3, padx=5, pady=5)
+        ttk.Button(input_output_frame, text="Browse Folder", command=self._browse_folder).grid(row=0, column=4, padx=5, pady=5)
 
         self.size_crf_frame = ttk.Frame(input_output_frame)
         self.size_crf_frame.grid(row=1, column=0, columnspan=3, sticky="ew")
@@ -139,6 +178,16 @@ class VideoEditorApp:
         self.entry_crf = ttk.Entry(self.size_crf_frame, textvariable=self.video_crf, width=10)
         self.entry_crf.grid(row=0, column=1, sticky="w", padx=5, pady=2)
         
+        self.quality_frame = ttk.Frame(self.size_crf_frame)
+        self.quality_frame.grid(row=0, column=2, sticky="w", padx=5, pady=2)
+        self.check_quality = ttk.Checkbutton(self.quality_frame, text="Auto CRF for quality floor:", variable=self.use_quality_target, command=self._toggle_bitrate_crf_options)
+        self.check_quality.grid(row=0, column=0, sticky="w")
+        self.quality_metric_menu = ttk.Combobox(self.quality_frame, textvariable=self.quality_metric, values=["SSIM", "PSNR"], state="readonly", width=6)
+        self.quality_metric_menu.grid(row=0, column=1, sticky="w", padx=5)
+        self.quality_metric_menu.bind("<<ComboboxSelected>>", self._on_quality_metric_change)
+        self.entry_quality_floor = ttk.Entry(self.quality_frame, textvariable=self.quality_floor, width=8)
+        self.entry_quality_floor.grid(row=0, column=2, sticky="w")
+
         self.radio_size = ttk.Radiobutton(self.size_crf_frame, text="Target Size (MB):", variable=self.use_crf, value=False, command=self._toggle_bitrate_crf_options)
         self.radio_size.grid(row=1, column=0, sticky="e", padx=5, pady=2)
         self.entry_size = ttk.Entry(self.size_crf_frame, textvariable=self.target_size_mb, width=10)
@@ -189,6 +238,18 @@ class VideoEditorApp:
         self.gpu_accel_menu.set("None")
         self.gpu_accel_menu.bind("<<ComboboxSelected>>", lambda e: self._toggle_gpu_preset_options())
 
+        ttk.Label(options_frame, text="MP4 Layout:").grid(row=7, column=0, sticky="e", padx=5, pady=2)
+        self.mp4_layout_menu = ttk.Combobox(options_frame, textvariable=self.mp4_layout,
+                                            values=["Standard", "Faststart", "Fragmented"], state="readonly", width=12)
+        self.mp4_layout_menu.grid(row=7, column=1, sticky="w", padx=5, pady=2)
+        self.mp4_layout_menu.set("Standard")
+
+        ttk.Label(options_frame, text="Streaming Package:").grid(row=8, column=0, sticky="e", padx=5, pady=2)
+        self.package_menu = ttk.Combobox(options_frame, textvariable=self.package_choice,
+                                         values=["None", "HLS", "DASH", "HLS + DASH"], state="readonly", width=12)
+        self.package_menu.grid(row=8, column=1, sticky="w", padx=5, pady=2)
+        self.package_menu.set("None")
+
         self.canvas = tk.Canvas(self.master, width=640, height=360, bg="black", bd=2, relief="sunken")
         self.canvas.grid(row=2, column=0, columnspan=3, pady=10, padx=10, sticky="nsew")
         self.canvas.create_text(self.canvas.winfo_width()/2, self.canvas.winfo_height()/2,
@@ -213,12 +274,25 @@ class VideoEditorApp:
         self.end_time_label = ttk.Label(trim_frame, text="0 sec", width=8)
         self.end_time_label.grid(row=1, column=2, sticky="w", padx=5)
 
-        ttk.Button(trim_frame, text="Reset Crop Selection", command=self._reset_crop_selection).grid(row=2, column=1, pady=5, sticky="w")
+        self.play_button = ttk.Button(trim_frame, text="Play", width=10, command=self._toggle_playback)
+        self.play_button.grid(row=2, column=0, padx=5, pady=5)
+        crop_buttons = ttk.Frame(trim_frame)
+        crop_buttons.grid(row=2, column=1, pady=5, sticky="w")
+        ttk.Button(crop_buttons, text="Reset Crop Selection", command=self._reset_crop_selection).pack(side=tk.LEFT)
+        self.auto_crop_button = ttk.Button(crop_buttons, text="Auto Crop", command=self._start_auto_crop)
+        self.auto_crop_button.pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(trim_frame, text="Snap to cuts", variable=self.snap_to_cuts).grid(row=2, column=1, pady=5, sticky="e")
+        self.scene_label = ttk.Label(trim_frame, text="", width=14)
+        self.scene_label.grid(row=2, column=2, sticky="w", padx=5)
+        # Snap once the handle is let go, so dragging still passes smoothly over cuts
+        self.start_scale.bind("<ButtonRelease-1>", lambda e: self._snap_slider(self.start_scale))
+        self.end_scale.bind("<ButtonRelease-1>", lambda e: self._snap_slider(self.end_scale))
 
         process_frame = ttk.Frame(self.master)
         process_frame.grid(row=5, column=0, columnspan=3, pady=10, padx=10, sticky="ew")
         process_frame.grid_columnconfigure(0, weight=1)
         process_frame.grid_columnconfigure(1, weight=1)
+        process_frame.grid_columnconfigure(2, weight=1)
 
         self.process_button = ttk.Button(process_frame, text="Trim & Compress Video", command=self._start_compression_thread,
                                             style="Accent.TButton")
@@ -227,6 +301,9 @@ class VideoEditorApp:
         self.cancel_button = ttk.Button(process_frame, text="Cancel", command=self.video_processor.cancel_compression, state=tk.DISABLED)
         self.cancel_button.grid(row=0, column=1, pady=5, padx=(5,0), sticky="ew")
 
+        self.pause_button = ttk.Button(process_frame, text="Pause", command=self._toggle_pause, state=tk.DISABLED)
+        self.pause_button.grid(row=0, column=2, pady=5, padx=(5,0), sticky="ew")
+
         self.progress_bar = ttk.Progressbar(self.master, orient="horizontal", length=100, mode="determinate")
         self.progress_bar.grid(row=6, column=0, columnspan=3, pady=5, padx=10, sticky="ew")
 
@@ -247,14 +324,29 @@ class VideoEditorApp:
 
     def _toggle_bitrate_crf_options(self):
         if self.use_crf.get():
-            self.entry_crf.config(state="normal")
+            quality_target = self.use_quality_target.get()
+            self.entry_crf.config(state="disabled" if quality_target else "normal")
             self.entry_size.config(state="disabled")
-            self.status_label.config(text="Using CRF: Output size will vary based on quality setting.")
+            self.check_quality.config(state="normal")
+            self.quality_metric_menu.config(state="readonly" if quality_target else "disabled")
+            self.entry_quality_floor.config(state="normal" if quality_target else "disabled")
+            if quality_target:
+                self.status_label.config(text=f"Using Target Quality: the cheapest CRF reaching the {self.quality_metric.get()} floor is chosen from parallel sample encodes.")
+            else:
+                self.status_label.config(text="Using CRF: Output size will vary based on quality setting.")
         else:
             self.entry_crf.config(state="disabled")
             self.entry_size.config(state="normal")
+            self.check_quality.config(state="disabled")
+            self.quality_metric_menu.config(state="disabled")
+            self.entry_quality_floor.config(state="disabled")
             self.status_label.config(text="Using Target Size: FFmpeg will use two-pass encoding for accuracy.")
 
+    def _on_quality_metric_change(self, event=None):
+        # Sensible default floors: SSIM is 0-1, PSNR is in dB
+        self.quality_floor.set("0.95" if self.quality_metric.get() == "SSIM" else "40")
+        self._toggle_bitrate_crf_options()
+
     def _toggle_gpu_preset_options(self):
         gpu_selected = self.gpu_accel_choice.get() != "None"
 
@@ -268,10 +360,110 @@ class VideoEditorApp:
     def _browse_input_file(self):
         filepath = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.mov *.mkv *.avi")])
         if filepath:
-            self.input_filepath.set(filepath)
-            base_name = os.path.splitext(os.path.basename(filepath))[0]
-            self.output_filepath.set(f"{base_name}_compressed.mp4")
-            self._load_video(filepath)
+            self._open_input_file(filepath)
+
+    def _open_input_file(self, filepath):
+        self._clear_join()
+        self.input_filepath.set(filepath)
+        base_name = os.path.splitext(os.path.basename(filepath))[0]
+        self.output_filepath.set(f"{base_name}_compressed.mp4")
+        self._load_video(filepath)
+        if self.video_cap is not None and self.video_cap.isOpened():
+            self._start_scene_index(filepath)
+            self._start_proxy(filepath)
+
+    def _browse_folder(self):
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache(ffmpeg_utils=self.video_processor.ffmpeg_utils)
+        FolderBrowser(self.master, folder, self.thumbnail_cache, on_select=self._open_input_file)
+
+    def _browse_join_files(self):
+        filepaths = filedialog.askopenfilenames(filetypes=[("Video files", "*.mp4 *.mov *.mkv *.avi")])
+        if not filepaths:
+            return
+        if len(filepaths) < 2:
+            messagebox.showerror("Error", "Select at least two videos to join.")
+            return
+        self.status_label.config(text="Preparing join...")
+        join_thread = threading.Thread(target=self._join_files_task, args=(list(filepaths),))
+        join_thread.daemon = True
+        join_thread.start()
+
+    def _join_files_task(self, filepaths):
+        def report(text):
+            self.master.after(0, lambda: self.status_label.config(text=text))
+
+        try:
+            result = self.video_joiner.join(filepaths, status_callback=report)
+        except (ValueError, RuntimeError) as e:
+            print(f"Join failed: {e}")
+            self.master.after(0, lambda msg=str(e): messagebox.showerror("Join Error", msg))
+            report("Join failed.")
+            return
+        self.master.after(0, lambda: self._load_joined_video(result))
+
+    def _load_joined_video(self, result):
+        self._clear_join()
+        # Preview and crop use the first segment; every segment shares its geometry after normalizing
+        self._load_video(result.segments[0][0])
+        if self.video_cap is None or not self.video_cap.isOpened():
+            VideoJoiner.cleanup(result)
+            return
+
+        self.join_result = result
+        self.input_format = "concat"
+        self.input_filepath.set(result.list_path)
+        base_name = os.path.splitext(os.path.basename(result.segments[0][0]))[0]
+        self.output_filepath.set(f"{base_name}_joined_compressed.mp4")
+
+        self.original_video_width = result.width
+        self.original_video_height = result.height
+        if result.fps > 0:
+            self.original_video_fps = result.fps
+        self.video_duration_sec = int(result.duration)
+        self.start_scale.config(to=self.video_duration_sec)
+        self.end_scale.config(to=self.video_duration_sec)
+        self.start_scale.set(0)
+        self.end_scale.set(self.video_duration_sec)
+        self._update_slider_labels()
+
+        self._start_scene_index(result.list_path, input_format="concat")
+
+        copied = len(result.segments) - result.normalized_count
+        self.status_label.config(text=f"Joined {len(result.segments)} videos ({copied} stream copied, {result.normalized_count} normalized).")
+
+    def _clear_join(self):
+        if self.join_result is not None:
+            self._stop_playback() # Playback may be reading the list about to be deleted
+            if self.job_running:
+                self.retired_joins.append(self.join_result)
+            else:
+                VideoJoiner.cleanup(self.join_result)
+        self.join_result = None
+        self.input_format = None
+
+    def _select_preview_source(self, current_time_sec):
+        """
+        Makes sure video_cap has the file that contains current_time_sec open and
+        returns the time to seek to within that file.
+        """
+        if self.join_result is None:
+            return current_time_sec
+
+        segment_path, segment_start, _ = self.join_result.segments[-1]
+        for path, start, duration in self.join_result.segments:
+            if current_time_sec < start + duration:
+                segment_path, segment_start = path, start
+                break
+
+        if segment_path != self.preview_source_path:
+            self.video_cap.release()
+            self.video_cap = cv2.VideoCapture(segment_path)
+            self.preview_source_path = segment_path
+        return current_time_sec - segment_start
 
     def _browse_output_file(self):
         filepath = filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=[("MP4 files", "*.mp4")])
@@ -279,11 +471,16 @@ class VideoEditorApp:
             self.output_filepath.set(filepath)
 
     def _load_video(self, path):
+        self._stop_playback()
+        self.proxy_cache.cancel()
+        self.proxy_path = None
+        self.proxy_mapping = None
         if self.video_cap is not None:
             self.video_cap.release()
             self.video_cap = None
 
         self.video_cap = cv2.VideoCapture(path)
+        self.preview_source_path = path
         if not self.video_cap.isOpened():
             messagebox.showerror("Error", "Unable to open video.")
             self.input_filepath.set("")
@@ -321,8 +518,12 @@ class VideoEditorApp:
             return
 
         current_time_sec = max(0, min(current_time_sec, self.video_duration_sec))
+        seek_time_sec = self._select_preview_source(current_time_sec)
 
-        self.video_cap.set(cv2.CAP_PROP_POS_MSEC, current_time_sec * 1000)
+        if self.proxy_mapping is not None:
+            self.video_cap.set(cv2.CAP_PROP_POS_FRAMES, self.proxy_mapping.frame_for_time(seek_time_sec))
+        else:
+            self.video_cap.set(cv2.CAP_PROP_POS_MSEC, seek_time_sec * 1000)
         ret, frame = self.video_cap.read()
 
         if ret:
@@ -362,6 +563,7 @@ class VideoEditorApp:
                                             text="Failed to load frame", fill="white", font=("Arial", 16))
 
     def _on_canvas_configure(self, event):
+        self._stop_playback() # Playback frames are sized for the old canvas
         if self.video_cap and self.video_cap.isOpened():
             self._update_frame_preview(self.start_scale.get())
         else:
@@ -371,13 +573,103 @@ class VideoEditorApp:
                                             fill="white", font=("Arial", 16))
 
     def _on_slider_move(self, value):
+        self._stop_playback()
         current_time_sec = float(value)
         self._update_slider_labels()
         self._update_frame_preview(current_time_sec)
 
     def _update_slider_labels(self):
-        self.start_time_label.config(text=f"{int(self.start_scale.get())} sec")
-        self.end_time_label.config(text=f"{int(self.end_scale.get())} sec")
+        self.start_time_label.config(text=f"{self.start_scale.get():.1f} sec")
+        self.end_time_label.config(text=f"{self.end_scale.get():.1f} sec")
+
+    # --- Scene Cuts ---
+    def _start_scene_index(self, filepath, input_format=None):
+        self.scene_cuts = []
+        self.scene_label.config(text="Finding cuts...")
+
+        def on_progress(seconds_done):
+            self.master.after(0, lambda: self.scene_label.config(text=f"Cuts: {int(seconds_done)}s read"))
+
+        def on_done(path, cuts):
+            self.master.after(0, lambda: self._on_scene_index_ready(path, cuts))
+
+        self.scene_indexer.start(filepath, on_done, progress_callback=on_progress, input_format=input_format)
+
+    def _on_scene_index_ready(self, filepath, cuts):
+        if filepath != self.input_filepath.get():
+            return # Finished for a video that is no longer loaded
+        self.scene_cuts = cuts
+        self.scene_label.config(text=f"{len(cuts)} cuts")
+
+    def _snap_slider(self, scale):
+        if not self.snap_to_cuts.get() or not self.scene_cuts:
+            return
+        tolerance = max(1.0, self.video_duration_sec * 0.01)
+        cut = SceneIndexer.nearest_cut(self.scene_cuts, scale.get(), tolerance)
+        if cut is not None:
+            scale.set(cut) # Fires _on_slider_move, which updates the label and preview
+
+    # --- Preview Proxy ---
+    def _start_proxy(self, filepath):
+        def on_progress(fraction):
+            self.master.after(0, lambda: self._show_proxy_status(f"Building preview proxy: {fraction * 100:.0f}%"))
+
+        def on_ready(path, proxy_path, mapping):
+            self.master.after(0, lambda: self._on_proxy_ready(path, proxy_path, mapping))
+
+        self.proxy_cache.start(filepath, on_ready, progress_callback=on_progress)
+
+    def _show_proxy_status(self, text):
+        executor = self.video_processor.ffmpeg_executor
+        if executor.ffmpeg_process is None and executor.current_pass == 0: # Don't overwrite compression progress
+            self.status_label.config(text=text)
+
+    def _on_proxy_ready(self, filepath, proxy_path, mapping):
+        if filepath != self.input_filepath.get() or self.join_result is not None:
+            return # Another video was loaded meanwhile
+        proxy_cap = cv2.VideoCapture(proxy_path)
+        if not proxy_cap.isOpened():
+            return
+        self._stop_playback()
+        self.video_cap.release()
+        self.video_cap = proxy_cap
+        self.preview_source_path = proxy_path
+        self.proxy_path = proxy_path
+        self.proxy_mapping = mapping
+        self._update_frame_preview(self.start_scale.get())
+        self._show_proxy_status(f"Preview proxy ready ({mapping.frame_count} frames); the encode still reads the original.")
+
+    # --- Range Playback ---
+    def _toggle_playback(self):
+        if self.preview_player.playing:
+            self._stop_playback()
+            return
+        if self.video_cap is None or not self.video_cap.isOpened() or not self.canvas_img_display_width:
+            return
+        start_time_sec = self.start_scale.get()
+        end_time_sec = self.end_scale.get()
+        if end_time_sec <= start_time_sec:
+            end_time_sec = self.video_duration_sec
+        # The proxy decodes far faster than a long-GOP original and shares its timeline
+        started = self.preview_player.play(self.proxy_path or self.input_filepath.get(), start_time_sec, end_time_sec,
+                                           self.canvas_img_display_width, self.canvas_img_display_height,
+                                           self.canvas_img_offset_x, self.canvas_img_offset_y,
+                                           self.original_video_fps, input_format=self.input_format)
+        if started:
+            if self.crop_rectangle_id:
+                self.canvas.tag_raise(self.crop_rectangle_id) # Keep the crop selection visible over playback
+            self.play_button.config(text="Stop")
+
+    def _stop_playback(self):
+        if self.preview_player.playing:
+            self.preview_player.stop() # Removes the playback image; the still preview underneath shows again
+        self.play_button.config(text="Play")
+
+    def _on_playback_position(self, time_sec):
+        self.play_button.config(text=f"Stop {time_sec:.1f}s")
+
+    def _on_playback_finished(self):
+        self.play_button.config(text="Play")
 
     # --- Cropping Logic ---
     def _on_button_press(self, event):
@@ -388,6 +680,7 @@ class VideoEditorApp:
                 self.canvas_img_offset_y <= event.y <= self.canvas_img_offset_y + self.canvas_img_display_height):
             return
 
+        self.auto_crop = None # A drawn crop replaces the detected one
         self.crop_start_x = event.x
         self.crop_start_y = event.y
         self.crop_end_x = event.x
@@ -436,7 +729,17 @@ class VideoEditorApp:
             self.canvas.delete(self.crop_rectangle_id)
             self.crop_rectangle_id = None
 
-        if self.crop_start_x != -1 and self.crop_end_x != -1 and \
+        if self.auto_crop and self.original_video_width and self.canvas_img_display_width:
+            # Mapped from video pixels on every redraw, so it follows canvas resizes
+            width, height, x, y = (int(value) for value in self.auto_crop[len("crop="):].split(":"))
+            scale_x = self.canvas_img_display_width / self.original_video_width
+            scale_y = self.canvas_img_display_height / self.original_video_height
+            self.crop_rectangle_id = self.canvas.create_rectangle(
+                self.canvas_img_offset_x + x * scale_x, self.canvas_img_offset_y + y * scale_y,
+                self.canvas_img_offset_x + (x + width) * scale_x, self.canvas_img_offset_y + (y + height) * scale_y,
+                outline="lime green", width=2, dash=(5, 2)
+            )
+        elif self.crop_start_x != -1 and self.crop_end_x != -1 and \
            abs(self.crop_start_x - self.crop_end_x) >= 2 and \
            abs(self.crop_start_y - self.crop_end_y) >= 2:
             self.crop_rectangle_id = self.canvas.create_rectangle(
@@ -449,12 +752,47 @@ class VideoEditorApp:
         self.crop_start_y = -1
         self.crop_end_x = -1
         self.crop_end_y = -1
+        self.auto_crop = None
         if self.crop_rectangle_id:
             self.canvas.delete(self.crop_rectangle_id)
         self.crop_rectangle_id = None
         print("Crop selection reset.")
 
+    def _start_auto_crop(self):
+        if self.video_cap is None or not self.video_cap.isOpened():
+            messagebox.showerror("Error", "Load a video first.")
+            return
+        filepath = self.input_filepath.get()
+        start_time_sec = self.start_scale.get()
+        end_time_sec = self.end_scale.get()
+        if end_time_sec <= start_time_sec:
+            start_time_sec, end_time_sec = 0, self.video_duration_sec
+        self.auto_crop_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Detecting black bars...")
+
+        def detect():
+            crop = self.crop_detector.detect(filepath, start_time_sec, end_time_sec, self.original_video_width,
+                                             self.original_video_height, input_format=self.input_format)
+            self.master.after(0, lambda: self._on_auto_crop_ready(filepath, crop))
+
+        threading.Thread(target=detect, daemon=True).start()
+
+    def _on_auto_crop_ready(self, filepath, crop):
+        self.auto_crop_button.config(state=tk.NORMAL)
+        if filepath != self.input_filepath.get():
+            return # Another video was loaded meanwhile
+        if crop is None:
+            self.status_label.config(text="Auto crop: no black bars found.")
+            return
+        self._reset_crop_selection()
+        self.auto_crop = crop
+        self._draw_crop_rectangle()
+        width, height, x, y = crop[len("crop="):].split(":")
+        self.status_label.config(text=f"Auto crop: {width}x{height} at {x},{y}. Drag on the preview to override.")
+
     def _get_ffmpeg_crop_params(self):
+        if self.auto_crop:
+            return self.auto_crop
         if self.crop_start_x == -1 or self.crop_end_x == -1 or \
            abs(self.crop_start_x - self.crop_end_x) < 2 or \
            abs(self.crop_start_y - self.crop_end_y) < 2:
@@ -508,8 +846,11 @@ class VideoEditorApp:
             messagebox.showerror("Error", "End time must be greater than start time.")
             return
 
+        self.job_running = True
         self.process_button.config(state=tk.DISABLED)
         self.cancel_button.config(state=tk.NORMAL)
+        # Packaging runs many FFmpeg processes at once; only single encodes can be paused
+        self.pause_button.config(state=tk.NORMAL if self.package_choice.get() == "None" else tk.DISABLED, text="Pause")
         self.status_label.config(text="Initializing compression...")
         self.progress_bar.config(value=0, mode="determinate")
 
@@ -523,18 +864,34 @@ class VideoEditorApp:
         crop_params = self._get_ffmpeg_crop_params()
 
         total_passes = 2 if not self.use_crf.get() else 1
+        video_crf = self.video_crf.get()
 
         success = True
 
-        for pass_number in range(1, total_passes + 1):
-            command = self.video_processor.build_ffmpeg_command(
+        if self.use_crf.get() and self.use_quality_target.get():
+            video_crf = self._find_quality_target_crf(input_file, start_time_sec, end_time_sec, crop_params)
+            if video_crf is None:
+                self._finish_compression(False, output_file)
+                return
+
+        if self.package_choice.get() != "None":
+            self._package_video_task(input_file, output_file, start_time_sec, end_time_sec, crop_params, video_crf)
+            return
+
+        # If target size, both passes share a temporary log file for FFmpeg's rate control stats
+        log_file_path = None
+        if not self.use_crf.get():
+            log_file_path = os.path.join(tempfile.gettempdir(), "ffmpeg2pass")
+
+        def build_command(pass_number):
+            return self.video_processor.build_ffmpeg_command(
                 input_file, 
                 output_file, 
                 start_time_sec, 
                 end_time_sec, 
                 self.resolution_choice.get(), # Pass the selected resolution string
                 self.use_crf.get(), 
-                self.video_crf.get(), 
+                video_crf, 
                 self.target_size_mb.get(), 
                 self.remove_audio,
                 self.audio_bitrate_choice.get(), 
@@ -547,54 +904,211 @@ class VideoEditorApp:
                 self.original_video_fps, 
                 crop_params,
                 pass_number,
-                total_passes
+                total_passes,
+                pass_log_file=log_file_path,
+                input_format=self.input_format,
+                output_mode=self.mp4_layout.get().lower()
             )
 
+        # An identical earlier encode (same input content and final command) can be restored instantly
+        output_cache = self.video_processor.output_cache
+        final_command = build_command(total_passes)
+        if not final_command:
+            self._finish_compression(False, output_file)
+            return
+        cache_key = output_cache.make_key(input_file, final_command, output_file)
+        if output_cache.fetch(cache_key, output_file):
+            print(f"Output cache hit: {output_cache.stats()}")
+            self._finish_compression(True, output_file, from_cache=True)
+            return
+        output_cache.detach(output_file) # Never encode into a file that shares storage with the cache
+
+        output_width, output_height = estimate_output_dimensions(
+            self.original_video_width, self.original_video_height, crop_params, self.resolution_choice.get())
+        codec = codec_label(self.use_hevc.get(), self.gpu_accel_choice.get())
+        job_history = self.video_processor.job_history
+        prediction = job_history.predict(duration_of_trim, output_width, output_height, codec, self.ffmpeg_preset.get(),
+                                         self.use_crf.get(), crf=video_crf, target_size_mb=self.target_size_mb.get(),
+                                         fps=self.original_video_fps or 30)
+        if prediction:
+            basis = f"{prediction['samples']} past jobs" if prediction["samples"] else "defaults, no history yet"
+            print(f"Predicted: {format_duration(prediction['wall_time_sec'])}, ~{prediction['output_size_mb']:.1f} MB ({basis})")
+        executor = self.video_processor.ffmpeg_executor
+        encode_started = time.time()
+        executor.begin_job(eta_deadline=encode_started + prediction["wall_time_sec"] if prediction else None)
+
+        for pass_number in range(1, total_passes + 1):
+            command = final_command if pass_number == total_passes else build_command(pass_number)
+
             if not command:
                 success = False
                 break
-            
-            # If target size and it's pass 1, use a temporary log file for FFmpeg to store stats
-            log_file_path = None # Initialize log_file_path
-            if not self.use_crf.get() and pass_number == 1:
-                temp_dir = tempfile.gettempdir()
-                log_file_path = os.path.join(temp_dir, "ffmpeg2pass-0.log")
-                command.extend(["-passlogfile", log_file_path.replace("\\", "/")])
                 
             success = self.video_processor.execute_ffmpeg_command(command, duration_of_trim, pass_number, total_passes)
 
             if not success:
                 break # Stop if a pass fails or is cancelled
-            
-            if not self.use_crf.get() and pass_number == 1:
-                # Clean up the log file after pass 1
-                try:
-                    if log_file_path and os.path.exists(log_file_path):
-                        os.remove(log_file_path)
-                    # Also remove .mbtree file if created by some FFmpeg versions
-                    mbtree_file = log_file_path + ".mbtree"
-                    if os.path.exists(mbtree_file):
-                        os.remove(mbtree_file)
-                except Exception as e:
-                    print(f"Warning: Could not remove FFmpeg pass log file: {e}")
 
+        if log_file_path:
+            # Clean up the pass log files once both passes are done (FFmpeg appends "-0.log")
+            try:
+                for suffix in ("-0.log", "-0.log.mbtree"): # .mbtree is created by some FFmpeg versions
+                    if os.path.exists(log_file_path + suffix):
+                        os.remove(log_file_path + suffix)
+            except Exception as e:
+                print(f"Warning: Could not remove FFmpeg pass log file: {e}")
+
+        executor.eta_deadline = None
+        if not executor.cancel_requested: # A cancelled run says nothing about speed or size
+            output_size = os.path.getsize(output_file) if success and os.path.exists(output_file) else None
+            job_history.record("gui", input_file, duration_of_trim, output_width, output_height, codec,
+                               self.ffmpeg_preset.get(), self.resolution_choice.get(), self.use_crf.get(), video_crf,
+                               self.target_size_mb.get(), output_size / (1024 * 1024) if output_size else None,
+                               time.time() - encode_started - executor.paused_total_sec, success)
+
+        if success:
+            output_cache.store(cache_key, output_file)
+
+        self._finish_compression(success, output_file)
+
+    def _package_video_task(self, input_file, output_file, start_time_sec, end_time_sec, crop_params, video_crf):
+        # The playlists and segments go in a folder named after the chosen output file
+        output_dir = os.path.splitext(output_file)[0]
+        formats = [f.strip().lower() for f in self.package_choice.get().split("+")]
+        spec = {
+            "input_filepath": input_file,
+            "start_time_sec": start_time_sec,
+            "end_time_sec": end_time_sec,
+            "resolution_choice": self.resolution_choice.get(),
+            "use_crf": self.use_crf.get(),
+            "video_crf": video_crf,
+            "target_size_mb": self.target_size_mb.get(),
+            "remove_audio_var": self.remove_audio.get(),
+            "audio_bitrate_choice": self.audio_bitrate_choice.get(),
+            "target_framerate": self.target_framerate.get(),
+            "ffmpeg_preset": self.ffmpeg_preset.get(),
+            "use_hevc": self.use_hevc.get(),
+            "gpu_accel_choice": self.gpu_accel_choice.get(),
+            "original_video_width": self.original_video_width,
+            "original_video_height": self.original_video_height,
+            "original_video_fps": self.original_video_fps,
+            "crop_params": crop_params,
+            "input_format": self.input_format,
+        }
+
+        def report(text):
+            self.master.after(0, lambda: self.status_label.config(text=text))
+
+        run = BackgroundRun()
+        self.video_processor.package_run = run # Lets the Cancel button stop the segment encodes
+        package_started = time.time()
+        try:
+            success, message = SegmentedPackager(self.video_processor.ffmpeg_utils).package(
+                spec, output_dir, formats, status_callback=report, run=run)
+        except ValueError as e:
+            success, message = False, str(e)
+        finally:
+            self.video_processor.package_run = None
+        if not success and not run.is_cancelled():
+            print(f"Packaging failed: {message}")
+            self.master.after(0, lambda: messagebox.showerror("Packaging Error", message))
+
+        if not run.is_cancelled(): # A cancelled run says nothing about speed or size
+            output_width, output_height = estimate_output_dimensions(
+                self.original_video_width, self.original_video_height, crop_params, self.resolution_choice.get())
+            output_size = None
+            if success:
+                output_size = sum(entry.stat().st_size for entry in os.scandir(output_dir) if entry.is_file())
+            self.video_processor.job_history.record(
+                "package", input_file, end_time_sec - start_time_sec, output_width, output_height,
+                codec_label(self.use_hevc.get(), self.gpu_accel_choice.get()), self.ffmpeg_preset.get(),
+                self.resolution_choice.get(), self.use_crf.get(), video_crf, self.target_size_mb.get(),
+                output_size / (1024 * 1024) if output_size else None, time.time() - package_started, success)
+        self._finish_compression(success, output_dir)
+
+    def _find_quality_target_crf(self, input_file, start_time_sec, end_time_sec, crop_params):
+        """Runs the sampled quality search and returns the chosen CRF as a string, or None."""
+        try:
+            quality_floor = float(self.quality_floor.get())
+        except ValueError:
+            self.master.after(0, lambda: messagebox.showerror("Input Error", "Quality floor must be a number."))
+            return None
+
+        build_args = {
+            "resolution_choice": self.resolution_choice.get(),
+            "audio_bitrate_choice": self.audio_bitrate_choice.get(),
+            "target_framerate": self.target_framerate.get(),
+            "ffmpeg_preset": self.ffmpeg_preset.get(),
+            "use_hevc": self.use_hevc.get(),
+            "gpu_accel_choice": self.gpu_accel_choice.get(),
+            "original_video_width": self.original_video_width,
+            "original_video_height": self.original_video_height,
+            "original_video_fps": self.original_video_fps,
+            "crop_params": crop_params,
+            "input_format": self.input_format,
+        }
+
+        def report(text):
+            self.master.after(0, lambda: self.status_label.config(text=text))
+
+        self.master.after(0, lambda: self.progress_bar.config(mode="indeterminate"))
+        self.master.after(0, lambda: self.progress_bar.start(10))
+        try:
+            crf, score = self.video_processor.quality_targeter.find_crf(
+                input_file, start_time_sec, end_time_sec, self.quality_metric.get(), quality_floor, build_args,
+                status_callback=report
+            )
+        except QualityTargetCancelled:
+            report("Compression cancelled by user.")
+            return None
+        except (RuntimeError, ValueError) as e:
+            print(f"Quality search failed: {e}")
+            self.master.after(0, lambda msg=str(e): messagebox.showerror("Quality Search Error", msg))
+            return None
+        finally:
+            self.master.after(0, lambda: self.progress_bar.stop())
+            self.master.after(0, lambda: self.progress_bar.config(mode="determinate", value=0))
+
+        score_text = f"{score:.4f}" if score is not None else "n/a"
+        print(f"Quality search chose CRF {crf} ({self.quality_metric.get()} {score_text})")
+        self.master.after(0, lambda: self.video_crf.set(str(crf))) # Show the pick in the CRF box
+        return str(crf)
+
+    def _toggle_pause(self):
+        if self.video_processor.ffmpeg_executor.paused:
+            if self.video_processor.resume_compression():
+                self.pause_button.config(text="Pause")
+        elif self.video_processor.pause_compression():
+            self.pause_button.config(text="Resume")
+
+    def _finish_compression(self, success, output_file, from_cache=False):
+        self.master.after(0, self._release_retired_joins)
         self.master.after(0, lambda: self.process_button.config(state=tk.NORMAL))
         self.master.after(0, lambda: self.cancel_button.config(state=tk.DISABLED))
+        self.master.after(0, lambda: self.pause_button.config(state=tk.DISABLED, text="Pause"))
         
         if success:
-            self.master.after(0, lambda: self.status_label.config(text=f"Compression complete! Output saved to: {output_file}"))
+            source = "Restored identical output from cache" if from_cache else "Compression complete!"
+            self.master.after(0, lambda: self.status_label.config(text=f"{source} Output saved to: {output_file}"))
             self.master.after(0, lambda: self.progress_bar.config(value=100))
         else:
             if "Compression cancelled" not in self.status_label.cget("text"):
                 self.master.after(0, lambda: self.status_label.config(text="Compression failed or was interrupted."))
             self.master.after(0, lambda: self.progress_bar.config(value=0))
 
+    def _release_retired_joins(self):
+        self.job_running = False
+        for join_result in self.retired_joins:
+            VideoJoiner.cleanup(join_result)
+        self.retired_joins = []
+
     def _on_closing(self):
         if self.video_processor.ffmpeg_process and self.video_processor.ffmpeg_process.poll() is None:
             if messagebox.askokcancel("Quit", "A compression is in progress. Do you want to cancel and quit?"):
                 self.video_processor.cancel_compression()
                 if self.video_cap:
                     self.video_cap.release()
+                self._stop_background_work()
                 self.master.destroy()
             else:
                 # Do nothing, user decided not to quit
@@ -602,8 +1116,18 @@ class VideoEditorApp:
         else:
             if self.video_cap:
                 self.video_cap.release()
+            self._stop_background_work()
             self.master.destroy()
 
+    def _stop_background_work(self):
+        self.preview_player.stop()
+        self.proxy_cache.cancel()
+        self._clear_join()
+        self._release_retired_joins() # The app is exiting; no job outlives it
+        self.scene_indexer.cancel()
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.shutdown()
+
 # This is crucial: Set the AppID BEFORE creating the Tkinter root window
 if sys.platform.startswith('win'):
     try:
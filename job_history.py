@@ -0,0 +1,228 @@
+import argparse
+import contextlib
+import os
+import re
+import sqlite3
+import statistics
+import time
+
+# Fallback model when there is no history yet: megapixel-seconds of output per wall second, per pass
+DEFAULT_MEGAPIXEL_THROUGHPUT = 40.0
+DEFAULT_BITS_PER_PIXEL = 0.1 # Output bits per pixel per frame at CRF 23, 30 fps
+HISTORY_LIMIT = 50 # Most recent matching jobs used for a prediction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    finished_at REAL NOT NULL,
+    source TEXT,
+    input_filepath TEXT,
+    duration_sec REAL,
+    width INTEGER,
+    height INTEGER,
+    codec TEXT,
+    preset TEXT,
+    resolution_choice TEXT,
+    mode TEXT,
+    crf REAL,
+    target_size_mb REAL,
+    output_size_mb REAL,
+    wall_time_sec REAL,
+    speed REAL,
+    success INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_codec_preset ON jobs (codec, preset, mode);
+"""
+
+
+def default_history_path():
+    return os.environ.get("SHORTY_HISTORY_DB") or os.path.join(os.path.expanduser("~"), ".shorty", "history.db")
+
+
+def codec_label(use_hevc, gpu_accel_choice):
+    codec = "hevc" if use_hevc else "h264"
+    return codec if gpu_accel_choice in (None, "None") else f"{codec} ({gpu_accel_choice})"
+
+
+def estimate_output_dimensions(width, height, crop_params, resolution_choice):
+    """Output frame size the command builder will produce for these settings."""
+    divisor = {"Half": 2, "Quarter": 4}.get(resolution_choice)
+    if divisor:
+        return (width // divisor) // 2 * 2, (height // divisor) // 2 * 2
+    match = re.match(r"crop=(\d+):(\d+)", crop_params or "")
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return width, height
+
+
+class JobHistory:
+    def __init__(self, db_path=None):
+        """
+        Local SQLite log of finished encodes. Used to predict wall time and output
+        size for new jobs, and for per-preset throughput trends.
+        """
+        self.db_path = db_path or default_history_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        try:
+            with self._connect() as connection:
+                connection.executescript(SCHEMA)
+        except sqlite3.Error as e: # Encoding doesn't need the history; record() and predict() fail softly
+            print(f"Warning: Could not open job history: {e}")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps this safe to use from worker threads
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        # The connection's own with-block only commits or rolls back; closing() actually releases it
+        with contextlib.closing(connection), connection:
+            yield connection
+
+    def record(self, source, input_filepath, duration_sec, width, height, codec, preset, resolution_choice,
+               use_crf, crf, target_size_mb, output_size_mb, wall_time_sec, success):
+        speed = duration_sec / wall_time_sec if wall_time_sec and wall_time_sec > 0 else None
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT INTO jobs (finished_at, source, input_filepath, duration_sec, width, height, codec, preset, "
+                    "resolution_choice, mode, crf, target_size_mb, output_size_mb, wall_time_sec, speed, success) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), source, input_filepath, duration_sec, width, height, codec, preset, resolution_choice,
+                     "crf" if use_crf else "size", _to_float(crf), _to_float(target_size_mb), output_size_mb,
+                     wall_time_sec, speed, 1 if success else 0)
+                )
+        except sqlite3.Error as e:
+            print(f"Warning: Could not record job history: {e}")
+
+    def _matching_rows(self, connection, filters):
+        """
+        Most recent successful jobs, relaxing filters from most to least specific.
+        Packaging runs encode their segments in parallel, so their wall time says
+        nothing about a single encode and they are left out.
+        """
+        for count in range(len(filters), -1, -1):
+            active = filters[:count]
+            where = " AND ".join(["success = 1", "wall_time_sec > 0", "source IS NOT 'package'"]
+                                 + [f"{column} = ?" for column, _ in active])
+            rows = connection.execute(
+                f"SELECT * FROM jobs WHERE {where} ORDER BY finished_at DESC LIMIT {HISTORY_LIMIT}",
+                [value for _, value in active]
+            ).fetchall()
+            if rows:
+                return rows
+        return []
+
+    def predict(self, duration_sec, width, height, codec, preset, use_crf, crf=None, target_size_mb=None, fps=30):
+        """
+        Returns {"wall_time_sec", "output_size_mb", "samples"}; samples is 0 when the
+        built-in defaults were used because there is no relevant history yet.
+        Returns None if the history database can't be read.
+        """
+        try:
+            return self._predict(duration_sec, width, height, codec, preset, use_crf, crf, target_size_mb, fps)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read job history: {e}")
+            return None
+
+    def _predict(self, duration_sec, width, height, codec, preset, use_crf, crf, target_size_mb, fps):
+        megapixels = max(width * height, 1) / 1e6
+        mode = "crf" if use_crf else "size"
+        with self._connect() as connection:
+            rows = self._matching_rows(connection, [("codec", codec), ("preset", preset), ("mode", mode)])
+
+            # Per-pass throughput, since target size jobs run two passes over the same frames
+            throughputs = [row["duration_sec"] * (row["width"] * row["height"] / 1e6) / row["wall_time_sec"]
+                           * (2 if row["mode"] == "size" else 1)
+                           for row in rows if row["width"] and row["height"]]
+            throughput = statistics.median(throughputs) if throughputs else DEFAULT_MEGAPIXEL_THROUGHPUT
+            wall_time_sec = duration_sec * megapixels / throughput * (1 if use_crf else 2)
+
+            if use_crf:
+                output_size_mb = self._predict_crf_size(connection, codec, duration_sec, megapixels, _to_float(crf), fps)
+            else:
+                size_rows = self._matching_rows(connection, [("mode", "size"), ("codec", codec)])
+                ratios = [row["output_size_mb"] / row["target_size_mb"] for row in size_rows
+                          if row["mode"] == "size" and row["target_size_mb"] and row["output_size_mb"]]
+                target = _to_float(target_size_mb) or 0
+                output_size_mb = target * (statistics.median(ratios) if ratios else 1.0)
+
+        return {"wall_time_sec": wall_time_sec, "output_size_mb": output_size_mb, "samples": len(throughputs)}
+
+    def _predict_crf_size(self, connection, codec, duration_sec, megapixels, crf, fps):
+        crf = crf if crf is not None else 23
+        rows = self._matching_rows(connection, [("mode", "crf"), ("codec", codec)])
+        rates = []
+        for row in rows:
+            if row["mode"] != "crf" or not row["output_size_mb"] or not row["duration_sec"] or not row["width"]:
+                continue
+            row_megapixels = row["width"] * row["height"] / 1e6
+            rate = row["output_size_mb"] / (row["duration_sec"] * row_megapixels)
+            # x264/x265 rule of thumb: +6 CRF roughly halves the bitrate
+            rates.append(rate * 2 ** (((row["crf"] or 23) - crf) / 6))
+        if rates:
+            mb_per_megapixel_second = statistics.median(rates)
+        else:
+            mb_per_megapixel_second = DEFAULT_BITS_PER_PIXEL * 1e6 * fps / 8 / 1024 / 1024 * 2 ** ((23 - crf) / 6)
+        return duration_sec * megapixels * mb_per_megapixel_second
+
+    def trends(self, preset=None, days=90):
+        """Per preset and week: job count, mean realtime speed and megapixel throughput."""
+        query = (
+            "SELECT preset, codec, strftime('%Y-W%W', finished_at, 'unixepoch') AS week, COUNT(*) AS jobs, "
+            "AVG(speed) AS avg_speed, AVG(duration_sec * width * height / 1e6 / wall_time_sec) AS avg_mpx_throughput "
+            "FROM jobs WHERE success = 1 AND wall_time_sec > 0 AND finished_at >= ?"
+        )
+        params = [time.time() - days * 86400]
+        if preset:
+            query += " AND preset = ?"
+            params.append(preset)
+        query += " GROUP BY preset, codec, week ORDER BY preset, codec, week"
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(query, params).fetchall()]
+
+    def recent(self, limit=20):
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(
+                "SELECT * FROM jobs ORDER BY finished_at DESC LIMIT ?", (limit,)).fetchall()]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds}s"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query Shorty's job history")
+    parser.add_argument("--db", default=None, help="History database (default ~/.shorty/history.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    trends_parser = subparsers.add_parser("trends", help="Per-preset throughput by week")
+    trends_parser.add_argument("--preset", default=None)
+    trends_parser.add_argument("--days", type=int, default=90)
+    recent_parser = subparsers.add_parser("recent", help="Most recent jobs")
+    recent_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    history = JobHistory(args.db)
+    if args.command == "trends":
+        print(f"{'Preset':<10} {'Codec':<22} {'Week':<9} {'Jobs':>5} {'Speed':>8} {'MPx/s':>8}")
+        for row in history.trends(args.preset, args.days):
+            print(f"{row['preset'] or '-':<10} {row['codec'] or '-':<22} {row['week']:<9} {row['jobs']:>5} "
+                  f"{(row['avg_speed'] or 0):>7.2f}x {(row['avg_mpx_throughput'] or 0):>8.1f}")
+    else:
+        for row in history.recent(args.limit):
+            status = "ok" if row["success"] else "failed"
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(row['finished_at']))}  {row['preset'] or '-':<9} "
+                  f"{row['codec'] or '-':<8} {row['mode'] or '-':<4} {(row['duration_sec'] or 0):>7.1f}s in "
+                  f"{format_duration(row['wall_time_sec'] or 0):>7} "
+                  f"-> {(row['output_size_mb'] or 0):.1f} MB  {status}  {os.path.basename(row['input_filepath'] or '')}")
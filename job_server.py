@@ -0,0 +1,627 @@
+import argparse
+import collections
+import itertools
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from video_processor import VideoProcessor
+from ffmpeg_executor import parse_progress_time
+from job_history import codec_label, estimate_output_dimensions
+from job_spec import PRIORITIES, validate_spec
+from process_control import suspend_process, resume_process, lower_priority, terminate_process
+from utils import ConstantVar
+
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+PAUSED_STATES = ("paused", "preempted") # preempted: frozen to make room for a more urgent job
+
+
+class Job:
+    def __init__(self, job_id, spec):
+        self.id = job_id
+        self.spec = spec
+        self.status = "queued"
+        self.progress = 0.0
+        self.message = "Queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.output_size_bytes = None
+        self.process = None
+        self.cancel_requested = False
+        self.prediction = None # JobHistory.predict() result, also the scheduling cost
+        self.preempted_job = None # Job this one froze to start immediately
+        self.paused_since = None
+        self.paused_total_sec = 0.0 # Excluded from the wall time recorded in the job history
+        self.output_started = False # The output file is this run's (stale copy removed, or restored from cache)
+        self.version = 0 # Bumped on every change so event streams know when to send an update
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.spec["priority"],
+            "progress": round(self.progress, 1),
+            "message": self.message,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "output_filepath": self.spec["output_filepath"],
+            "output_size_bytes": self.output_size_bytes,
+            "predicted_wall_time_sec": round(self.prediction["wall_time_sec"], 1) if self.prediction else None,
+            "predicted_output_mb": round(self.prediction["output_size_mb"], 2) if self.prediction else None,
+            "spec": self.spec,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers=2, output_dir=None, cache_mb=2048, history_path=None):
+        """
+        Queues job specs onto a fixed pool of worker threads. Each worker drives
+        one FFmpeg process at a time, so max_workers bounds concurrent encodes.
+        Queued jobs run by priority, then shortest predicted wall time first (from
+        the job history). A job that finds every worker busy takes over the worker
+        of a paused job, or freezes the lowest priority running job below it
+        instead of waiting and resumes it afterwards.
+        """
+        # Headless: only the command builder, cache and history are used
+        self.video_processor = VideoProcessor(None, output_cache_mb=cache_mb, history_path=history_path)
+        self.output_dir = output_dir or os.path.join(tempfile.gettempdir(), "shorty_jobs")
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.history = self.video_processor.job_history
+        self.jobs = {}
+        self.max_workers = max(1, max_workers)
+        self.job_queue = queue.PriorityQueue() # (priority rank, predicted wall time, submit order, job)
+        self.submit_counter = itertools.count()
+        self.condition = threading.Condition(threading.RLock())
+
+        self.workers = []
+        for _ in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, spec):
+        spec = validate_spec(spec)
+        job_id = uuid.uuid4().hex[:12]
+        if not spec.get("output_filepath"):
+            spec["output_filepath"] = os.path.join(self.output_dir, f"{job_id}.mp4")
+
+        job = Job(job_id, spec)
+        job.prediction = self._predict(spec)
+        with self.condition:
+            self.jobs[job_id] = job
+            victim = self._find_preemption_victim(job)
+            if victim is not None:
+                if victim.status == "running":
+                    self._pause(victim, "preempted", f"Preempted by {job.id}")
+                # A job paused by the client keeps that status; only its worker slot is taken over
+                job.preempted_job = victim
+                # Counts as running right away, so the next urgent job picks another victim
+                self._update(job, status="running", message=f"Taking over the worker of {victim.id}")
+                threading.Thread(target=self._run_preempting, args=(job,), daemon=True).start()
+                return job
+        # Without a prediction the job queues behind those of its priority that have one
+        cost = job.prediction["wall_time_sec"] if job.prediction else float("inf")
+        self.job_queue.put((PRIORITIES[spec["priority"]], cost, next(self.submit_counter), job))
+        return job
+
+    def _slot_holders(self):
+        """
+        Started jobs each holding a worker slot. Paused jobs keep their worker
+        thread, so they count; a job whose slot was handed to a preempting job
+        doesn't, since the preempting job holds it now.
+        """
+        active = [j for j in self.jobs.values() if j.status == "running" or j.status in PAUSED_STATES]
+        lent = {j.preempted_job.id for j in active if j.preempted_job is not None}
+        return [j for j in active if j.id not in lent]
+
+    def _find_preemption_victim(self, job):
+        """
+        Job whose slot job takes over if every worker is busy, else None: a job
+        paused by the client (nothing is lost by it), or else the lowest priority
+        running job that ranks below job.
+        """
+        holders = self._slot_holders()
+        if len(holders) < self.max_workers:
+            return None
+        rank = PRIORITIES[job.spec["priority"]]
+        candidates = [j for j in holders if j.status == "paused" or
+                      (j.status == "running" and PRIORITIES[j.spec["priority"]] > rank)]
+        if not candidates:
+            return None
+        # Paused jobs first, then lowest priority, then the most recently started (least work to hold on to)
+        return max(candidates, key=lambda j: (j.status == "paused", PRIORITIES[j.spec["priority"]], j.started_at or 0))
+
+    def _run_preempting(self, job):
+        try:
+            self._execute(job)
+        finally:
+            with self.condition:
+                victim = job.preempted_job
+                if victim is not None and victim.status == "preempted":
+                    self._resume(victim)
+
+    def _output_dimensions(self, spec):
+        width, height = spec["original_video_width"], spec["original_video_height"]
+        if not width or not height:
+            try:
+                info = self.video_processor.ffmpeg_utils.probe_media(spec["input_filepath"])
+                stream = next(s for s in info.get("streams", []) if s.get("codec_type") == "video")
+                width, height = int(stream["width"]), int(stream["height"])
+            except (RuntimeError, StopIteration, KeyError, ValueError):
+                width, height = 1920, 1080 # Unknown source, assume 1080p
+        return estimate_output_dimensions(width, height, spec["crop_params"], spec["resolution_choice"])
+
+    def _predict(self, spec):
+        width, height = self._output_dimensions(spec)
+        return self.history.predict(
+            spec["end_time_sec"] - spec["start_time_sec"], width, height,
+            codec_label(spec["use_hevc"], spec["gpu_accel_choice"]), spec["ffmpeg_preset"], spec["use_crf"],
+            crf=spec["video_crf"], target_size_mb=spec["target_size_mb"], fps=float(spec["original_video_fps"] or 30)
+        )
+
+    def _record_history(self, job, wall_time_sec, success):
+        spec = job.spec
+        width, height = self._output_dimensions(spec)
+        output_size = os.path.getsize(spec["output_filepath"]) if success and os.path.exists(spec["output_filepath"]) else None
+        self.history.record(
+            "server", spec["input_filepath"], spec["end_time_sec"] - spec["start_time_sec"], width, height,
+            codec_label(spec["use_hevc"], spec["gpu_accel_choice"]), spec["ffmpeg_preset"], spec["resolution_choice"],
+            spec["use_crf"], spec["video_crf"], spec["target_size_mb"],
+            output_size / (1024 * 1024) if output_size else None, wall_time_sec, success
+        )
+
+    def get_job(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self.condition:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in TERMINAL_STATES:
+                return job
+            job.cancel_requested = True
+            if job.status == "queued":
+                self._update(job, status="cancelled", message="Cancelled before start", finished_at=time.time())
+            else:
+                terminate_process(job.process) # Continues a paused process so it can exit
+                self.condition.notify_all() # Wakes a job waiting between passes
+        return job
+
+    def pause(self, job_id):
+        """
+        Freezes a running job's FFmpeg process; other jobs are not affected.
+        Raises ValueError if the job isn't running.
+        """
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status not in ("running", "preempted"):
+                raise ValueError(f"Only running jobs can be paused, job is {job.status}.")
+            self._pause(job, "paused", "Paused by client")
+        return job
+
+    def resume(self, job_id):
+        """
+        Continues a paused job. If a preempting job took over its worker slot, it
+        continues only in a free slot; otherwise it goes back to waiting for that
+        job to finish, as if it had been preempted.
+        """
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status != "paused":
+                raise ValueError(f"Only paused jobs can be resumed, job is {job.status}.")
+            borrower = next((j for j in self.jobs.values()
+                             if j.preempted_job is job and j.status not in TERMINAL_STATES), None)
+            if borrower is not None:
+                if len(self._slot_holders()) >= self.max_workers:
+                    self._update(job, status="preempted", message=f"Waiting for {borrower.id} to free a worker")
+                    return job
+                borrower.preempted_job = None # Holds a slot of its own again
+            self._resume(job)
+        return job
+
+    def _pause(self, job, status, message):
+        if job.status == "running":
+            suspend_process(job.process) # No process between passes; _run_pass waits instead
+            if status == "preempted":
+                lower_priority(job.process) # Stays in the background once it continues
+        if job.paused_since is None:
+            job.paused_since = time.time()
+        self._update(job, status=status, message=message)
+
+    def _resume(self, job):
+        resume_process(job.process)
+        job.paused_total_sec += time.time() - job.paused_since
+        job.paused_since = None
+        self._update(job, status="running", message="Resumed")
+
+    def wait_for_change(self, job, last_version, timeout=None):
+        """
+        Blocks until the job changes after last_version (or timeout) and returns
+        (version, snapshot dict) taken under the lock.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: job.version != last_version, timeout)
+            return job.version, job.to_dict()
+
+    def _update(self, job, **fields):
+        with self.condition:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.version += 1
+            self.condition.notify_all()
+
+    def _worker_loop(self):
+        while True:
+            job = self.job_queue.get()[-1]
+            try:
+                self._execute(job)
+            finally:
+                self.job_queue.task_done()
+
+    def _execute(self, job):
+        try:
+            if not job.cancel_requested:
+                self._run_job(job)
+        except Exception as e:
+            print(f"Job {job.id} crashed: {e}")
+            self._update(job, status="failed", message=f"Unexpected error: {e}", finished_at=time.time())
+
+    def _run_job(self, job):
+        spec = job.spec
+        self._update(job, status="running", message="Starting FFmpeg...", started_at=time.time())
+
+        if not self.video_processor.ffmpeg_utils.ffmpeg_path:
+            self._update(job, status="failed", message="FFmpeg executable not found.", finished_at=time.time())
+            return
+
+        duration = spec["end_time_sec"] - spec["start_time_sec"]
+        total_passes = 1 if spec["use_crf"] else 2
+        pass_log_dir = tempfile.mkdtemp(prefix=f"shorty_{job.id}_")
+        pass_log_file = os.path.join(pass_log_dir, "ffmpeg2pass") if total_passes == 2 else None
+
+        def build_command(pass_number):
+            return self.video_processor.build_ffmpeg_command(
+                spec["input_filepath"],
+                spec["output_filepath"],
+                spec["start_time_sec"],
+                spec["end_time_sec"],
+                spec["resolution_choice"],
+                spec["use_crf"],
+                spec["video_crf"],
+                spec["target_size_mb"],
+                ConstantVar(bool(spec["remove_audio_var"])),
+                spec["audio_bitrate_choice"],
+                spec["target_framerate"],
+                spec["ffmpeg_preset"],
+                spec["use_hevc"],
+                spec["gpu_accel_choice"],
+                spec["original_video_width"],
+                spec["original_video_height"],
+                spec["original_video_fps"],
+                spec["crop_params"],
+                pass_number,
+                total_passes,
+                pass_log_file=pass_log_file,
+                input_format=spec["input_format"],
+                output_mode=spec["output_mode"]
+            )
+
+        try:
+            final_command = build_command(total_passes)
+            if not final_command:
+                self._update(job, status="failed", message="Could not build FFmpeg command.", finished_at=time.time())
+                return
+
+            output_cache = self.video_processor.output_cache
+            cache_key = output_cache.make_key(spec["input_filepath"], final_command, spec["output_filepath"])
+            if output_cache.fetch(cache_key, spec["output_filepath"]):
+                job.output_started = True
+                self._update(job, status="completed", progress=100.0, message="Restored identical output from cache.",
+                             output_size_bytes=os.path.getsize(spec["output_filepath"]), finished_at=time.time())
+                return
+            output_cache.detach(spec["output_filepath"])
+            if spec["output_mode"] == "fragmented" and os.path.exists(spec["output_filepath"]):
+                os.remove(spec["output_filepath"]) # Followers must never see a stale file from an earlier run
+            job.output_started = True
+
+            encode_started = time.time()
+            for pass_number in range(1, total_passes + 1):
+                command = final_command if pass_number == total_passes else build_command(pass_number)
+                if not command:
+                    self._update(job, status="failed", message="Could not build FFmpeg command.", finished_at=time.time())
+                    return
+
+                if not self._run_pass(job, command, duration, pass_number, total_passes):
+                    if job.status == "failed":
+                        self._record_history(job, time.time() - encode_started - job.paused_total_sec, False)
+                    return
+
+            self._record_history(job, time.time() - encode_started - job.paused_total_sec, True)
+            output_cache.store(cache_key, spec["output_filepath"])
+            output_size = os.path.getsize(spec["output_filepath"]) if os.path.exists(spec["output_filepath"]) else None
+            self._update(job, status="completed", progress=100.0, message="Compression complete.",
+                         output_size_bytes=output_size, finished_at=time.time())
+        finally:
+            shutil.rmtree(pass_log_dir, ignore_errors=True)
+
+    def _run_pass(self, job, command, duration, pass_number, total_passes):
+        pass_prefix = f"Pass {pass_number}/{total_passes}: "
+        print(f"Job {job.id} FFmpeg Command ({pass_prefix.strip()}):", " ".join(command))
+
+        with self.condition:
+            # A job paused between passes starts its next pass only once resumed
+            self.condition.wait_for(lambda: job.status not in PAUSED_STATES or job.cancel_requested)
+            if job.cancel_requested:
+                self._update(job, status="cancelled", message="Cancelled by client.", finished_at=time.time())
+                return False
+            try:
+                job.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                               stderr=subprocess.PIPE, text=True, bufsize=1,
+                                               encoding='utf-8', errors='replace')
+            except Exception as e:
+                self._update(job, status="failed", message=f"Failed to start FFmpeg process: {e}", finished_at=time.time())
+                return False
+            if job.spec["priority"] == "bulk":
+                lower_priority(job.process)
+
+        stderr_tail = collections.deque(maxlen=20) # Last lines, for the failure message
+        last_reported = -1
+        for line in iter(job.process.stderr.readline, ''):
+            stderr_tail.append(line.rstrip())
+            current_time = parse_progress_time(line)
+            if current_time is not None and duration > 0 and current_time != last_reported:
+                last_reported = current_time
+                pass_fraction = min(current_time / duration, 1.0)
+                progress = ((pass_number - 1) + pass_fraction) * 100 / total_passes
+                with self.condition:
+                    if job.status in PAUSED_STATES:
+                        continue # Lines still buffered from before the pause; keep the paused message
+                    self._update(job, progress=min(progress, 99.9),
+                                 message=f"{pass_prefix}Processing: {current_time} / {int(duration)} seconds")
+
+        job.process.wait()
+        job.process.stderr.close()
+        returncode = job.process.returncode
+        job.process = None
+
+        if returncode == 0:
+            return True
+        if job.cancel_requested:
+            self._update(job, status="cancelled", message="Cancelled by client.", finished_at=time.time())
+        else:
+            print(f"Job {job.id} FFmpeg ({pass_prefix.strip()}) Error Output:\n" + "\n".join(stderr_tail))
+            last_line = next((l for l in reversed(stderr_tail) if l), "FFmpeg process failed.")
+            self._update(job, status="failed", message=f"{pass_prefix}{last_line}", finished_at=time.time())
+        return False
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes:
+        POST   /jobs              submit a job spec (JSON body)
+        GET    /jobs              list jobs
+        GET    /jobs/<id>         job status
+        GET    /jobs/<id>/events  progress as Server-Sent Events until the job finishes
+        GET    /jobs/<id>/output  download the finished output (fragmented jobs stream while encoding)
+        POST   /jobs/<id>/pause   freeze a running job (its FFmpeg process is kept)
+        POST   /jobs/<id>/resume  continue a paused job
+        DELETE /jobs/<id>         cancel a job
+        GET    /cache             output cache hit/miss stats
+    """
+    server_version = "ShortyJobServer/1.0"
+    keepalive_interval = 15
+
+    def _path_parts(self):
+        return [part for part in urlparse(self.path).path.split("/") if part]
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _get_job_or_404(self, job_id):
+        job = self.server.job_manager.get_job(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"No job with id {job_id}"})
+        return job
+
+    def do_GET(self):
+        parts = self._path_parts()
+        if parts == ["jobs"]:
+            self._send_json(200, {"jobs": self.server.job_manager.list_jobs()})
+        elif parts == ["cache"]:
+            self._send_json(200, self.server.job_manager.video_processor.output_cache.stats())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._get_job_or_404(parts[1])
+            if job:
+                self._send_json(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._get_job_or_404(parts[1])
+            if job:
+                self._stream_events(job)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "output":
+            job = self._get_job_or_404(parts[1])
+            if job:
+                self._send_output(job)
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        parts = self._path_parts()
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] in ("pause", "resume"):
+            manager = self.server.job_manager
+            try:
+                job = manager.pause(parts[1]) if parts[2] == "pause" else manager.resume(parts[1])
+            except ValueError as e:
+                self._send_json(409, {"error": str(e)})
+                return
+            if job is None:
+                self._send_json(404, {"error": f"No job with id {parts[1]}"})
+            else:
+                self._send_json(200, job.to_dict())
+            return
+        if parts != ["jobs"]:
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            spec = json.loads(self.rfile.read(length) or b"{}")
+            job = self.server.job_manager.submit(spec)
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self._send_json(201, job.to_dict())
+
+    def do_DELETE(self):
+        parts = self._path_parts()
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        job = self.server.job_manager.cancel(parts[1])
+        if job is None:
+            self._send_json(404, {"error": f"No job with id {parts[1]}"})
+        else:
+            self._send_json(200, job.to_dict())
+
+    def _stream_events(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        version = -1
+        try:
+            while True:
+                new_version, snapshot = self.server.job_manager.wait_for_change(job, version, self.keepalive_interval)
+                if new_version == version:
+                    self.wfile.write(b": keepalive\n\n") # Comment line keeps idle connections open
+                else:
+                    version = new_version
+                    self.wfile.write(f"event: status\ndata: {json.dumps(snapshot)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if snapshot["status"] in TERMINAL_STATES:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Client went away; the job keeps running
+
+    def _send_output(self, job):
+        output_file = job.spec["output_filepath"]
+        if job.spec["output_mode"] == "fragmented" and job.status not in TERMINAL_STATES:
+            self._follow_output(job)
+            return
+        if job.status != "completed" or not os.path.exists(output_file):
+            self._send_json(409, {"error": f"Output not available, job is {job.status}"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(os.path.getsize(output_file)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(output_file)}"')
+        self.end_headers()
+        try:
+            with open(output_file, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, 64 * 1024)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+    def _follow_output(self, job):
+        """
+        Streams a fragmented MP4 while it is being written, like tail -f. Every fragment
+        is self-contained, so the client can start uploading or playing immediately.
+        The response has no Content-Length and ends when the job does. Paused jobs
+        keep the response open; a job that finishes (or is restored from the cache)
+        before the file is first polled is sent whole.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.end_headers()
+
+        manager = self.server.job_manager
+        version = -1
+        output = None
+        try:
+            while True:
+                version, snapshot = manager.wait_for_change(job, version, 0.25)
+                finished = snapshot["status"] in TERMINAL_STATES
+                if output is None and job.output_started and os.path.exists(job.spec["output_filepath"]):
+                    output = open(job.spec["output_filepath"], "rb")
+                if output is not None:
+                    while True:
+                        data = output.read(64 * 1024)
+                        if not data:
+                            break
+                        self.wfile.write(data)
+                    self.wfile.flush()
+                if finished:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            if output is not None:
+                output.close()
+
+
+class JobServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, job_manager):
+        super().__init__(server_address, JobRequestHandler)
+        self.job_manager = job_manager
+
+
+def start_job_server(host="127.0.0.1", port=8765, max_workers=2, output_dir=None, cache_mb=2048, history_path=None):
+    """
+    Creates a JobServer and serves it from a background thread. Pass port=0 to
+    let the OS pick a free port (read it back from server.server_address).
+    """
+    server = JobServer((host, port), JobManager(max_workers, output_dir, cache_mb, history_path))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shorty local HTTP job service")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="Number of concurrent encodes")
+    parser.add_argument("--output-dir", default=None, help="Where outputs go when a job has no output_filepath")
+    parser.add_argument("--cache-mb", type=float, default=2048, help="Disk quota for the output cache")
+    parser.add_argument("--history-db", default=None, help="Job history database (default ~/.shorty/history.db)")
+    args = parser.parse_args()
+
+    server = JobServer((args.host, args.port),
+                       JobManager(args.workers, args.output_dir, args.cache_mb, args.history_db))
+    print(f"Shorty job server listening on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,85 @@
+import os
+
+from ffmpeg_utils import MP4_OUTPUT_MODES, is_stream_path
+
+# Job specs use the same parameter names as VideoProcessor.build_ffmpeg_command.
+# input_filepath is required; output_filepath defaults to a file in the server's output directory.
+JOB_SPEC_DEFAULTS = {
+    "start_time_sec": 0,
+    "end_time_sec": 0,
+    "resolution_choice": "Full",
+    "use_crf": False,
+    "video_crf": "23",
+    "target_size_mb": "10",
+    "remove_audio_var": False,
+    "audio_bitrate_choice": "96k",
+    "target_framerate": "Original",
+    "ffmpeg_preset": "medium",
+    "use_hevc": False,
+    "gpu_accel_choice": "None",
+    "original_video_width": 0,
+    "original_video_height": 0,
+    "original_video_fps": 0,
+    "crop_params": None,
+    "input_format": None,
+    "output_mode": "standard",
+    "priority": "normal",
+}
+
+# Lower rank runs first; a job preempts running jobs of a higher rank when no worker is free
+PRIORITIES = {"urgent": 0, "normal": 1, "bulk": 2}
+
+
+def validate_spec(spec):
+    """
+    Checks a job spec and returns it merged over JOB_SPEC_DEFAULTS, with times as
+    floats and CRF / target size as strings. Raises ValueError naming the problem.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Job spec must be a JSON object.")
+
+    unknown = set(spec) - set(JOB_SPEC_DEFAULTS) - {"input_filepath", "output_filepath"}
+    if unknown:
+        raise ValueError(f"Unknown job parameters: {', '.join(sorted(unknown))}")
+
+    merged = dict(JOB_SPEC_DEFAULTS)
+    merged.update(spec)
+
+    input_file = merged.get("input_filepath")
+    if not input_file or not os.path.exists(input_file):
+        raise ValueError("input_filepath must point to an existing video file.")
+
+    try:
+        merged["start_time_sec"] = float(merged["start_time_sec"])
+        merged["end_time_sec"] = float(merged["end_time_sec"])
+    except (TypeError, ValueError):
+        raise ValueError("start_time_sec and end_time_sec must be numbers.")
+    if merged["end_time_sec"] <= merged["start_time_sec"]:
+        raise ValueError("End time must be greater than start time.")
+
+    if not merged["use_crf"]:
+        try:
+            if float(merged["target_size_mb"]) <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError("target_size_mb must be a positive number.")
+
+    if merged["resolution_choice"] not in ("Full", "Half", "Quarter"):
+        raise ValueError("resolution_choice must be one of Full, Half or Quarter.")
+    if merged["resolution_choice"] != "Full" and \
+       (not merged["original_video_width"] or not merged["original_video_height"]):
+        raise ValueError("original_video_width and original_video_height are required when scaling.")
+
+    if merged["input_format"] not in (None, "concat"):
+        raise ValueError("input_format must be null or \"concat\" (an ffconcat list from VideoJoiner).")
+
+    if merged.get("output_filepath") and is_stream_path(merged["output_filepath"]):
+        raise ValueError("output_filepath must be a file; use output_mode \"fragmented\" and GET /jobs/<id>/output to stream.")
+    if merged["output_mode"] not in MP4_OUTPUT_MODES:
+        raise ValueError(f"output_mode must be one of {', '.join(MP4_OUTPUT_MODES)}.")
+    if merged["priority"] not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}.")
+
+    merged["video_crf"] = str(merged["video_crf"])
+    merged["target_size_mb"] = str(merged["target_size_mb"])
+    return merged
@@ -1,3 +1,4 @@
+import multiprocessing
 import tkinter as tk
 from gui import VideoEditorApp
 
@@ -7,4 +8,5 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Thumbnail worker processes in the PyInstaller build
     main()
\ No newline at end of file
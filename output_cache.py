@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from cache_index import CacheIndex, evict_lru
+from utils import get_cache_dir
+
+FINGERPRINT_BLOCK_SIZE = 64 * 1024 # Bytes hashed from each sampled position
+FINGERPRINT_SAMPLES = 8 # Evenly spaced blocks between the head and the tail
+
+def fingerprint_file(path, block_size=FINGERPRINT_BLOCK_SIZE, samples=FINGERPRINT_SAMPLES):
+    """
+    Fast content fingerprint: size, mtime and a hash of the head, the tail and a few
+    evenly spaced blocks. Reads at most (samples + 2) blocks regardless of file size.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{size}:{stat.st_mtime_ns}".encode("utf-8"))
+
+    if size <= block_size * (samples + 2):
+        offsets = [0] # Small file: just hash all of it in one go
+        block_size = size
+    else:
+        step = (size - block_size) // (samples + 1)
+        offsets = [0] + [step * i for i in range(1, samples + 1)] + [size - block_size]
+
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+def normalize_command(command, input_filepath, output_filepath):
+    """
+    Strips the parts of an FFmpeg command that don't affect the encoded result
+    (executable location, -y, pass log paths, input and output paths).
+    """
+    normalized = []
+    skip_next = False
+    for i, arg in enumerate(command):
+        if skip_next:
+            skip_next = False
+            continue
+        if i == 0:
+            normalized.append("ffmpeg")
+        elif arg == "-y":
+            continue
+        elif arg == "-passlogfile":
+            skip_next = True
+        elif arg == input_filepath:
+            normalized.append("{input}")
+        elif arg == output_filepath:
+            normalized.append("{output}")
+        else:
+            normalized.append(arg)
+    return normalized
+
+
+class OutputCache:
+    def __init__(self, cache_dir=None, max_size_mb=2048):
+        """
+        Content-addressed store of finished outputs. Entries are evicted least
+        recently used first once the cache grows past max_size_mb. The index is
+        shared with other processes using the same directory (GUI and job server).
+        """
+        self.cache_dir = cache_dir or get_cache_dir("outputs")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.index = CacheIndex(self.cache_dir)
+
+    def make_key(self, input_filepath, command, output_filepath):
+        """
+        Returns the cache key for running command on input_filepath, or None if
+        the input can't be fingerprinted. Pass the final (pass 2) command for
+        two-pass encodes since it carries the bitrate.
+        """
+        try:
+            fingerprint = fingerprint_file(input_filepath)
+        except OSError as e:
+            print(f"Warning: Could not fingerprint input for output cache: {e}")
+            return None
+        normalized = normalize_command(command, input_filepath, output_filepath)
+        extension = os.path.splitext(output_filepath)[1].lower() # Same args can mux differently per container
+        payload = json.dumps([fingerprint, extension, normalized])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def detach(output_filepath):
+        """
+        Removes output_filepath if it's a hardlink, e.g. into the cache from an
+        older version that linked instead of copying. FFmpeg truncates and
+        rewrites its output in place, which would otherwise corrupt the entry.
+        """
+        try:
+            if os.stat(output_filepath).st_nlink > 1:
+                os.remove(output_filepath)
+        except OSError:
+            pass
+
+    def fetch(self, key, output_filepath):
+        """
+        Copies a cached output to output_filepath. Returns True on a hit. Always a
+        copy, never a link, so editing the output in place can't change the entry.
+        """
+        if key is None:
+            return False
+        with self.index.transaction() as data:
+            entry = data["entries"].get(key)
+            cached_file = os.path.join(self.cache_dir, entry["file"]) if entry else None
+            if not entry or not os.path.exists(cached_file) or os.path.getsize(cached_file) != entry["size"]:
+                if entry: # Missing or modified on disk; drop it
+                    self._remove_entry(data, key)
+                data["misses"] = data.get("misses", 0) + 1
+                return False
+            entry["last_used"] = time.time() # Most recently used, so a store() racing the copy evicts others first
+            size = entry["size"]
+
+        # Copied outside the index lock (it can take a while). If another process
+        # evicts the entry meanwhile, the copy either fails or comes up short and
+        # counts as a miss.
+        restored = True
+        if os.path.abspath(cached_file) != os.path.abspath(output_filepath):
+            temp_file = output_filepath + f".{os.getpid()}.tmp"
+            try:
+                shutil.copy2(cached_file, temp_file) # Copy-on-write filesystems may share the blocks
+                restored = os.path.getsize(temp_file) == size
+                if restored:
+                    os.replace(temp_file, output_filepath)
+            except OSError as e:
+                print(f"Warning: Could not restore cached output: {e}")
+                restored = False
+            if not restored:
+                try:
+                    os.remove(temp_file)
+                except OSError:
+                    pass
+
+        with self.index.transaction() as data:
+            counter = "hits" if restored else "misses"
+            data[counter] = data.get(counter, 0) + 1
+        return restored
+
+    def store(self, key, output_filepath):
+        """Copies a finished output into the cache and evicts down to the quota."""
+        if key is None or not os.path.exists(output_filepath):
+            return
+        size = os.path.getsize(output_filepath)
+        if size > self.max_size_bytes:
+            return # Would evict everything and still not fit
+
+        file_name = key + os.path.splitext(output_filepath)[1].lower()
+        cached_file = os.path.join(self.cache_dir, file_name)
+        temp_file = cached_file + f".{os.getpid()}.tmp"
+        try:
+            # Copied outside the index lock (it can take a while), then moved in under it
+            shutil.copy2(output_filepath, temp_file)
+        except OSError as e:
+            print(f"Warning: Could not store output in cache: {e}")
+            return
+        with self.index.transaction() as data:
+            os.replace(temp_file, cached_file)
+            data["entries"][key] = {"file": file_name, "size": size, "last_used": time.time()}
+            for entry in evict_lru(data["entries"], self.max_size_bytes, keep=key):
+                self._remove_file(entry)
+
+    def _remove_file(self, entry):
+        try:
+            os.remove(os.path.join(self.cache_dir, entry["file"]))
+        except OSError:
+            pass
+
+    def _remove_entry(self, data, key):
+        entry = data["entries"].pop(key, None)
+        if entry:
+            self._remove_file(entry)
+
+    def stats(self):
+        data = self.index.load()
+        hits, misses = data.get("hits", 0), data.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(data["entries"]),
+            "size_bytes": sum(entry["size"] for entry in data["entries"].values()),
+            "max_size_bytes": self.max_size_bytes,
+        }
+
+    def clear(self):
+        with self.index.transaction() as data:
+            for key in list(data["entries"]):
+                self._remove_entry(data, key)
+            data["hits"] = 0
+            data["misses"] = 0
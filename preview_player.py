@@ -0,0 +1,176 @@
+import queue
+import subprocess
+import threading
+import time
+
+from PIL import Image, ImageTk
+
+MAX_PLAYBACK_FPS = 30
+RING_SLOTS = 8 # Decoded frames buffered ahead of the display
+
+
+class FrameRing:
+    def __init__(self, slot_count, frame_bytes):
+        """
+        Fixed set of reusable frame buffers passed between the decoder thread and
+        the Tk thread. The decoder blocks when every slot is in use, so memory
+        never grows past slot_count frames.
+        """
+        self.slots = [bytearray(frame_bytes) for _ in range(slot_count)]
+        self.free = queue.Queue()
+        self.filled = queue.Queue() # (slot, frame index); (None, None) marks the end of the stream
+        for slot in range(slot_count):
+            self.free.put(slot)
+
+    def release(self, slot):
+        self.free.put(slot)
+
+
+class PreviewPlayer:
+    def __init__(self, canvas, ffmpeg_utils, on_position=None, on_finished=None):
+        """
+        Plays a time range on a Tk canvas at preview resolution. FFmpeg decodes
+        and scales in a background thread into a FrameRing; a scheduler on the Tk
+        loop shows whichever frame is due by the wall clock and drops the ones it
+        is too late for, so playback stays in sync without blocking the UI.
+        """
+        self.canvas = canvas
+        self.ffmpeg_utils = ffmpeg_utils
+        self.on_position = on_position
+        self.on_finished = on_finished
+        self.playing = False
+        self.process = None
+        self.ring = None
+        self.photo = None
+        self.image_item = None
+        self.tick_job = None
+        self.pending = None
+        self.stop_event = threading.Event()
+        self.presented = 0
+        self.dropped = 0
+
+    def play(self, filepath, start_time_sec, end_time_sec, width, height, x, y, source_fps, input_format=None):
+        """Shows frames of width x height at canvas position (x, y)."""
+        self.stop()
+        if not self.ffmpeg_utils.ffmpeg_path or width < 2 or height < 2 or end_time_sec <= start_time_sec:
+            return False
+        width, height = width // 2 * 2, height // 2 * 2
+        self.width, self.height = width, height
+        self.fps = min(source_fps or MAX_PLAYBACK_FPS, MAX_PLAYBACK_FPS)
+        self.start_time_sec = start_time_sec
+        self.ring = FrameRing(RING_SLOTS, width * height * 3)
+        self.pending = None
+        self.presented = self.dropped = 0
+
+        command = [self.ffmpeg_utils.ffmpeg_path, "-v", "error", "-nostdin", "-ss", str(start_time_sec)]
+        if input_format == "concat":
+            command.extend(["-f", "concat", "-safe", "0"])
+        command.extend(["-i", filepath, "-t", str(end_time_sec - start_time_sec), "-an", "-sn",
+                        "-vf", f"fps={self.fps},scale={width}:{height}:flags=fast_bilinear",
+                        "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"])
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL, bufsize=0)
+        except OSError as e:
+            print(f"Preview playback failed to start: {e}")
+            return False
+
+        # One PhotoImage for the whole playback; each frame is pasted into it
+        self.photo = ImageTk.PhotoImage("RGB", (width, height))
+        self.image_item = self.canvas.create_image(x, y, anchor="nw", image=self.photo, tags=("playback",))
+        self.stop_event = threading.Event()
+        threading.Thread(target=self._decode, args=(self.process, self.ring, self.stop_event), daemon=True).start()
+
+        self.playing = True
+        self.clock_start = time.perf_counter()
+        self.tick_job = self.canvas.after(1, self._tick)
+        return True
+
+    @staticmethod
+    def _decode(process, ring, stop_event):
+        frame_bytes = len(ring.slots[0])
+        index = 0
+        try:
+            while not stop_event.is_set():
+                try:
+                    slot = ring.free.get(timeout=0.2)
+                except queue.Empty:
+                    continue # Display is behind or paused; check for stop and wait again
+                view = memoryview(ring.slots[slot])
+                filled = 0
+                while filled < frame_bytes:
+                    read = process.stdout.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+                if filled < frame_bytes:
+                    break
+                ring.filled.put((slot, index))
+                index += 1
+        finally:
+            ring.filled.put((None, None))
+            process.stdout.close()
+
+    def _tick(self):
+        self.tick_job = None
+        if not self.playing:
+            return
+        elapsed = time.perf_counter() - self.clock_start
+        due = int(elapsed * self.fps)
+
+        frame = None
+        ended = False
+        while True:
+            if self.pending is None:
+                try:
+                    self.pending = self.ring.filled.get_nowait()
+                except queue.Empty:
+                    break
+            slot, index = self.pending
+            if slot is None:
+                ended = True
+                break
+            if index > due:
+                break # Not its time yet; keep it for a later tick
+            if frame is not None:
+                self.ring.release(frame[0]) # Superseded before it was shown
+                self.dropped += 1
+            frame = self.pending
+            self.pending = None
+
+        if frame is not None:
+            slot, index = frame
+            # frombuffer wraps the slot without copying; the paste is done before the slot is handed back
+            self.photo.paste(Image.frombuffer("RGB", (self.width, self.height), self.ring.slots[slot], "raw", "RGB", 0, 1))
+            self.ring.release(slot)
+            self.presented += 1
+            if self.on_position:
+                self.on_position(self.start_time_sec + index / self.fps)
+
+        if ended and frame is None:
+            self.stop()
+            if self.on_finished:
+                self.on_finished()
+            return
+        next_due = (due + 1) / self.fps
+        self.tick_job = self.canvas.after(max(1, int((next_due - elapsed) * 1000)), self._tick)
+
+    def stop(self):
+        if not self.playing and self.process is None:
+            return
+        self.playing = False
+        self.stop_event.set()
+        if self.tick_job is not None:
+            self.canvas.after_cancel(self.tick_job)
+            self.tick_job = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.terminate()
+            self.process = None
+        if self.image_item is not None:
+            self.canvas.delete(self.image_item)
+            self.image_item = None
+        if self.presented or self.dropped:
+            print(f"Preview playback: {self.presented} frames shown, {self.dropped} dropped")
+        self.photo = None
+        self.ring = None
@@ -0,0 +1,94 @@
+import os
+import shutil
+import signal
+import subprocess
+import sys
+
+BACKGROUND_NICENESS = 19
+
+if sys.platform == "win32":
+    import ctypes
+
+    PROCESS_SUSPEND_RESUME = 0x0800
+    PROCESS_SET_INFORMATION = 0x0200
+    IDLE_PRIORITY_CLASS = 0x00000040
+
+
+def _is_alive(process):
+    return process is not None and process.poll() is None
+
+
+def _windows_call(pid, access, action):
+    """Opens the process with the given access rights and runs action(handle)."""
+    handle = ctypes.windll.kernel32.OpenProcess(access, False, pid)
+    if not handle:
+        return False
+    try:
+        return action(handle)
+    finally:
+        ctypes.windll.kernel32.CloseHandle(handle)
+
+
+def suspend_process(process):
+    """
+    Freezes a running subprocess without losing its work (SIGSTOP, or
+    NtSuspendProcess on Windows). Returns False if it already exited or
+    the OS refused.
+    """
+    if not _is_alive(process):
+        return False
+    try:
+        if sys.platform == "win32":
+            return _windows_call(process.pid, PROCESS_SUSPEND_RESUME,
+                                 lambda handle: ctypes.windll.ntdll.NtSuspendProcess(handle) == 0)
+        os.kill(process.pid, signal.SIGSTOP)
+        return True
+    except OSError as e:
+        print(f"Warning: Could not pause process {process.pid}: {e}")
+        return False
+
+
+def resume_process(process):
+    """Continues a process frozen by suspend_process (SIGCONT / NtResumeProcess)."""
+    if not _is_alive(process):
+        return False
+    try:
+        if sys.platform == "win32":
+            return _windows_call(process.pid, PROCESS_SUSPEND_RESUME,
+                                 lambda handle: ctypes.windll.ntdll.NtResumeProcess(handle) == 0)
+        os.kill(process.pid, signal.SIGCONT)
+        return True
+    except OSError as e:
+        print(f"Warning: Could not resume process {process.pid}: {e}")
+        return False
+
+
+def lower_priority(process):
+    """
+    Moves a subprocess to the background: lowest CPU priority and, where the
+    ionice tool exists, idle I/O class. This is one way only, since raising
+    priority back usually needs administrator rights.
+    """
+    if not _is_alive(process):
+        return False
+    try:
+        if sys.platform == "win32":
+            return _windows_call(process.pid, PROCESS_SET_INFORMATION,
+                                 lambda handle: bool(ctypes.windll.kernel32.SetPriorityClass(handle, IDLE_PRIORITY_CLASS)))
+        os.setpriority(os.PRIO_PROCESS, process.pid, BACKGROUND_NICENESS)
+    except OSError as e:
+        print(f"Warning: Could not lower priority of process {process.pid}: {e}")
+        return False
+
+    ionice = shutil.which("ionice")
+    if ionice:
+        subprocess.run([ionice, "-c", "3", "-p", str(process.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return True
+
+
+def terminate_process(process):
+    """Terminates a subprocess, continuing it first so a paused process actually handles the signal."""
+    if not _is_alive(process):
+        return
+    process.terminate()
+    resume_process(process)
@@ -0,0 +1,178 @@
+import os
+import subprocess
+import time
+
+from background_task import BackgroundRun, BackgroundTask
+from cache_index import CacheIndex, evict_lru
+from output_cache import fingerprint_file
+from utils import get_cache_dir
+
+PROXY_VERSION = 1
+LONG_GOP_CODECS = ("h264", "hevc", "av1", "vp9", "mpeg2video") # Seeking decodes from the previous keyframe
+PROXY_HEIGHT = 360
+PROXY_MAX_FPS = 30
+
+
+class ProxyMapping:
+    def __init__(self, fps, frame_count, duration):
+        """
+        Timestamp mapping between a proxy and its source. The proxy is made with
+        FFmpeg's fps filter, which picks source frames on a constant grid from the
+        first frame, so proxy frame i shows source time i / fps (relative to the
+        first frame, as cv2 positions are) even for variable frame rate sources.
+        """
+        self.fps = fps
+        self.frame_count = frame_count
+        self.duration = duration
+
+    def frame_for_time(self, time_sec):
+        """Proxy frame showing what the source shows at time_sec."""
+        return max(0, min(self.frame_count - 1, int(time_sec * self.fps + 1e-6)))
+
+    def time_for_frame(self, frame_index):
+        return frame_index / self.fps
+
+    def to_dict(self):
+        return {"fps": self.fps, "frames": self.frame_count, "duration": self.duration}
+
+
+class ProxyCache:
+    def __init__(self, ffmpeg_utils, cache_dir=None, max_size_mb=4096, min_source_mb=256, height=PROXY_HEIGHT):
+        """
+        Low resolution all-intra (MJPEG) copies of large long-GOP sources, so
+        preview seeks decode one small frame instead of a whole GOP. Proxies are
+        only for preview; encodes keep reading the original. Built in the
+        background, keyed by source content, evicted least recently used first
+        past max_size_mb.
+        """
+        self.ffmpeg_utils = ffmpeg_utils
+        self.cache_dir = cache_dir or get_cache_dir("proxies")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.min_source_bytes = int(min_source_mb * 1024 * 1024)
+        self.height = height
+        self.index = CacheIndex(self.cache_dir, version=PROXY_VERSION)
+        self.task = BackgroundTask()
+
+    def needs_proxy(self, filepath):
+        """True for files big enough, in a long-GOP codec, for seeking in them to be slow."""
+        try:
+            if os.path.getsize(filepath) < self.min_source_bytes:
+                return False
+        except OSError:
+            return False
+        return self.ffmpeg_utils.probe_video_codec(filepath) in LONG_GOP_CODECS
+
+    def lookup(self, filepath):
+        """(proxy path, ProxyMapping) for the current version of filepath, or None."""
+        try:
+            key = fingerprint_file(filepath)
+        except OSError:
+            return None
+        if key not in self.index.load()["entries"]:
+            return None # Common case; skips the locked write
+        with self.index.transaction() as data:
+            entry = data["entries"].get(key)
+            if entry is None:
+                return None
+            proxy_path = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.exists(proxy_path):
+                data["entries"].pop(key)
+                return None
+            entry["last_used"] = time.time()
+            return proxy_path, ProxyMapping(entry["fps"], entry["frames"], entry["duration"])
+
+    def _source_timing(self, filepath):
+        info = self.ffmpeg_utils.probe_media(filepath)
+        stream = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), {})
+        numerator, _, denominator = (stream.get("avg_frame_rate") or stream.get("r_frame_rate") or "0/1").partition("/")
+        source_fps = float(numerator) / float(denominator) if float(denominator or 0) else 0.0
+        duration = float(info.get("format", {}).get("duration") or stream.get("duration") or 0)
+        return source_fps, duration
+
+    def build(self, filepath, progress_callback=None, run=None):
+        """
+        Makes the proxy for filepath. Returns (proxy path, ProxyMapping), or None
+        if run (a BackgroundRun) was cancelled or FFmpeg failed.
+        progress_callback(fraction) is called as the encode advances.
+        """
+        run = run or BackgroundRun()
+        if not self.ffmpeg_utils.ffmpeg_path:
+            return None
+        try:
+            key = fingerprint_file(filepath)
+            source_fps, duration = self._source_timing(filepath)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Proxy: could not probe {filepath}: {e}")
+            return None
+        fps = round(min(source_fps or PROXY_MAX_FPS, PROXY_MAX_FPS), 3)
+        proxy_name = key + ".avi"
+        proxy_path = os.path.join(self.cache_dir, proxy_name)
+        temp_path = os.path.join(self.cache_dir, key + ".tmp.avi")
+
+        # Every frame a keyframe; a small quality-5 JPEG is plenty at preview size
+        command = [self.ffmpeg_utils.ffmpeg_path, "-v", "error", "-nostdin", "-y", "-i", filepath,
+                   "-an", "-sn", "-dn", "-vf", f"fps={fps},scale=-2:{self.height}:flags=fast_bilinear",
+                   "-c:v", "mjpeg", "-q:v", "5", "-pix_fmt", "yuvj420p",
+                   "-progress", "pipe:1", "-nostats", temp_path]
+        frame_count = 0
+        process = run.popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True, encoding='utf-8', errors='replace')
+        if process is None:
+            return None
+        try:
+            for line in process.stdout:
+                name, _, value = line.strip().partition("=")
+                if name == "frame":
+                    frame_count = int(value)
+                elif name == "out_time_us" and progress_callback and duration > 0 and value.isdigit():
+                    progress_callback(min(1.0, int(value) / 1e6 / duration))
+            process.wait()
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+
+        if run.is_cancelled() or process.returncode != 0 or frame_count == 0:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return None
+
+        mapping = ProxyMapping(fps, frame_count, duration)
+        with self.index.transaction() as data:
+            os.replace(temp_path, proxy_path)
+            data["entries"][key] = dict(mapping.to_dict(), file=proxy_name, size=os.path.getsize(proxy_path),
+                                        last_used=time.time(), source=os.path.abspath(filepath))
+            for entry in evict_lru(data["entries"], self.max_size_bytes, keep=key):
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry["file"]))
+                except OSError:
+                    pass # Still open somewhere (Windows); it's no longer indexed either way
+        return proxy_path, mapping
+
+    def start(self, filepath, on_ready, progress_callback=None):
+        """
+        Calls on_ready(filepath, proxy_path, mapping) from a background thread
+        once a proxy exists, building it first if needed (cancelling any previous
+        build). Does nothing for files that don't need a proxy.
+        """
+        self.cancel()
+        cached = self.lookup(filepath)
+        if cached is not None:
+            on_ready(filepath, *cached)
+            return
+
+        def work(run):
+            if not self.needs_proxy(filepath):
+                return
+            result = self.build(filepath, progress_callback, run)
+            if result is not None and not run.is_cancelled():
+                on_ready(filepath, *result)
+
+        self.task.start(work)
+
+    def cancel(self):
+        self.task.cancel()
@@ -0,0 +1,160 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import ConstantVar
+
+METRIC_PATTERNS = {
+    "ssim": re.compile(r"All:([\d.]+)"), # e.g. "SSIM Y:0.98 U:0.99 V:0.99 All:0.985 (18.2)"
+    "psnr": re.compile(r"average:([\d.]+|inf)"), # e.g. "PSNR y:42.1 u:45.0 v:45.3 average:42.9 min:39.8 max:46.0"
+}
+
+
+class QualityTargetCancelled(Exception):
+    pass
+
+
+class QualityTargeter:
+    def __init__(self, ffmpeg_utils, max_workers=None, sample_count=4, sample_duration_sec=2.0, crf_range=(16, 40)):
+        """
+        Picks the highest (cheapest) CRF whose output still meets a quality floor by
+        encoding short samples of the trim range in parallel and scoring them against
+        the source with FFmpeg's ssim/psnr filters.
+        """
+        self.ffmpeg_utils = ffmpeg_utils
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.sample_count = sample_count
+        self.sample_duration_sec = sample_duration_sec
+        self.crf_range = crf_range
+        self.lock = threading.Lock()
+        self.processes = set()
+        self.cancelled = False
+
+    def sample_windows(self, start_time_sec, end_time_sec):
+        """Evenly spaced (start, end) windows, one in the middle of each slice of the range."""
+        duration = end_time_sec - start_time_sec
+        if duration <= self.sample_count * self.sample_duration_sec:
+            return [(start_time_sec, end_time_sec)]
+        slice_length = duration / self.sample_count
+        windows = []
+        for i in range(self.sample_count):
+            sample_start = start_time_sec + i * slice_length + (slice_length - self.sample_duration_sec) / 2
+            windows.append((sample_start, sample_start + self.sample_duration_sec))
+        return windows
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            for process in list(self.processes):
+                if process.poll() is None:
+                    process.terminate()
+
+    def _run(self, command):
+        with self.lock:
+            if self.cancelled:
+                raise QualityTargetCancelled()
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                       text=True, encoding='utf-8', errors='replace')
+            self.processes.add(process)
+        try:
+            _, stderr_output = process.communicate()
+        finally:
+            with self.lock:
+                self.processes.discard(process)
+        if self.cancelled:
+            raise QualityTargetCancelled()
+        if process.returncode != 0:
+            raise RuntimeError(f"FFmpeg failed during quality search:\n{stderr_output[-2000:]}")
+        return stderr_output
+
+    def _encode_and_score(self, crf, window, sample_path, input_filepath, metric, build_args):
+        sample_start, sample_end = window
+        command = self.ffmpeg_utils.build_ffmpeg_command(
+            input_filepath, sample_path, sample_start, sample_end,
+            build_args["resolution_choice"], True, str(crf), None,
+            ConstantVar(True), # Audio doesn't affect the video score
+            build_args["audio_bitrate_choice"], build_args["target_framerate"],
+            build_args["ffmpeg_preset"], build_args["use_hevc"], build_args["gpu_accel_choice"],
+            build_args["original_video_width"], build_args["original_video_height"],
+            build_args["original_video_fps"], build_args["crop_params"],
+            input_format=build_args.get("input_format")
+        )
+        if not command:
+            raise RuntimeError("Could not build FFmpeg command for quality sample.")
+        self._run(command)
+
+        # Put the source through the same plan (decoder -lowres included) so both sides line up frame for frame
+        filter_plan = self.ffmpeg_utils.plan_filters(
+            input_filepath, build_args["original_video_width"], build_args["original_video_height"],
+            build_args["original_video_fps"], build_args["crop_params"], build_args["resolution_choice"],
+            build_args["target_framerate"], build_args["gpu_accel_choice"], build_args.get("input_format")
+        )
+        source_filters = "".join(f"{f}," for f in filter_plan.filters)
+        graph = (f"[1:v]{source_filters}settb=AVTB,setpts=PTS-STARTPTS[ref];"
+                 f"[0:v]settb=AVTB,setpts=PTS-STARTPTS[dist];[dist][ref]{metric}")
+        score_command = [self.ffmpeg_utils.ffmpeg_path, "-i", sample_path, "-ss", str(sample_start)]
+        if build_args.get("input_format") == "concat":
+            score_command.extend(["-f", "concat", "-safe", "0"])
+        score_command.extend(filter_plan.input_args)
+        score_command.extend(["-t", str(sample_end - sample_start), "-i", input_filepath,
+                              "-lavfi", graph, "-f", "null", "-"])
+        stderr_output = self._run(score_command)
+
+        matches = METRIC_PATTERNS[metric].findall(stderr_output)
+        if not matches:
+            raise RuntimeError(f"Could not read {metric.upper()} score from FFmpeg output.")
+        return float(matches[-1]) # float("inf") for identical PSNR
+
+    def score_crf(self, crf, windows, input_filepath, metric, build_args, work_dir):
+        """Worst sample score at this CRF, so hard sections aren't averaged away."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [
+                pool.submit(self._encode_and_score, crf, window,
+                            os.path.join(work_dir, f"crf{crf}_sample{i}.mp4"), input_filepath, metric, build_args)
+                for i, window in enumerate(windows)
+            ]
+            return min(future.result() for future in futures)
+
+    def find_crf(self, input_filepath, start_time_sec, end_time_sec, metric, quality_floor, build_args,
+                 status_callback=None):
+        """
+        Binary searches crf_range for the highest CRF scoring at least quality_floor.
+        build_args holds the remaining build_ffmpeg_command parameters (resolution_choice,
+        crop_params, ...). Returns (crf, score); falls back to the lowest CRF if the floor
+        is unreachable. Raises QualityTargetCancelled if cancel() is called.
+        """
+        metric = metric.lower()
+        if metric not in METRIC_PATTERNS:
+            raise ValueError(f"Unknown quality metric: {metric}")
+        with self.lock:
+            self.cancelled = False
+
+        windows = self.sample_windows(start_time_sec, end_time_sec)
+        work_dir = tempfile.mkdtemp(prefix="shorty_quality_")
+        scores = {}
+        low, high = self.crf_range
+        best = None
+        try:
+            while low <= high:
+                crf = (low + high) // 2
+                if status_callback:
+                    status_callback(f"Quality search: trying CRF {crf} on {len(windows)} samples...")
+                scores[crf] = self.score_crf(crf, windows, input_filepath, metric, build_args, work_dir)
+                print(f"Quality search: CRF {crf} -> {metric.upper()} {scores[crf]:.4f} (floor {quality_floor})")
+                if scores[crf] >= quality_floor:
+                    best = (crf, scores[crf])
+                    low = crf + 1 # Meets the floor; try spending fewer bits
+                else:
+                    high = crf - 1
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        if best is None:
+            lowest_crf = self.crf_range[0]
+            print(f"Quality floor {quality_floor} not reached by any CRF; using CRF {lowest_crf}.")
+            return lowest_crf, scores.get(lowest_crf)
+        return best
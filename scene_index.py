@@ -0,0 +1,193 @@
+import json
+import os
+import subprocess
+
+import numpy as np
+
+from background_task import BackgroundRun, BackgroundTask
+from filter_planner import LOWRES_DECODERS
+from output_cache import fingerprint_file
+from utils import get_cache_dir
+
+SCENE_INDEX_VERSION = 1
+HISTOGRAM_BINS = 16
+
+
+def frame_metrics(frames, previous=None):
+    """
+    Vectorized change metrics for a batch of flattened grayscale frames
+    (n, pixels) uint8. Each frame is compared with the one before it;
+    previous is the last frame of the prior batch. Returns (mean absolute
+    difference / 255, histogram distance), both in 0..1 and of length n,
+    with 0 for the very first frame of the video.
+    """
+    count, pixels = frames.shape
+    if previous is not None:
+        reference = np.vstack((previous[None, :], frames[:-1]))
+    else:
+        reference = np.vstack((frames[:1], frames[:-1])) # First frame compares to itself
+    diffs = np.abs(frames.astype(np.int16) - reference).mean(axis=1) / 255.0
+
+    # One bincount for the whole batch: offset each frame's bins into its own range
+    bins = (frames >> 4).astype(np.int64) + (np.arange(count) * HISTOGRAM_BINS)[:, None]
+    histograms = np.bincount(bins.ravel(), minlength=count * HISTOGRAM_BINS).reshape(count, HISTOGRAM_BINS) / pixels
+    if previous is not None:
+        previous_histogram = np.bincount(previous >> 4, minlength=HISTOGRAM_BINS) / pixels
+        reference_histograms = np.vstack((previous_histogram[None, :], histograms[:-1]))
+    else:
+        reference_histograms = np.vstack((histograms[:1], histograms[:-1]))
+    histogram_diffs = 0.5 * np.abs(histograms - reference_histograms).sum(axis=1)
+    return diffs, histogram_diffs
+
+
+class SceneIndexer:
+    def __init__(self, ffmpeg_utils, cache_dir=None, sample_fps=10, frame_size=(64, 36), batch_frames=256,
+                 threshold=0.3, min_scene_sec=0.5):
+        """
+        Finds hard cuts from tiny grayscale frames streamed out of FFmpeg. Frames
+        are read into one preallocated batch buffer, so memory stays at
+        batch_frames * width * height bytes whatever the video length. Results are
+        cached per file content.
+        """
+        self.ffmpeg_utils = ffmpeg_utils
+        self.cache_dir = cache_dir or get_cache_dir("scenes")
+        self.sample_fps = sample_fps
+        self.frame_width, self.frame_height = frame_size
+        self.batch_frames = batch_frames
+        self.threshold = threshold
+        self.min_scene_sec = min_scene_sec
+        self.task = BackgroundTask()
+
+    def _cache_path(self, filepath):
+        fingerprint = fingerprint_file(filepath)
+        params = f"{self.sample_fps}_{self.frame_width}x{self.frame_height}_{self.threshold}_{self.min_scene_sec}"
+        return os.path.join(self.cache_dir, f"{fingerprint}_{params}.json")
+
+    def load_cached(self, filepath):
+        """Cut times (seconds) from the cache, or None if this file hasn't been indexed."""
+        try:
+            with open(self._cache_path(filepath), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != SCENE_INDEX_VERSION:
+            return None
+        return [cut for cut, _ in data["cuts"]]
+
+    def _command(self, filepath, input_format):
+        command = [self.ffmpeg_utils.ffmpeg_path, "-v", "error", "-nostdin",
+                   "-skip_loop_filter", "all"] # Deblocking is invisible at this size
+        if input_format == "concat":
+            command.extend(["-f", "concat", "-safe", "0"])
+        elif self.ffmpeg_utils.probe_video_codec(filepath) in LOWRES_DECODERS:
+            command.extend(["-lowres", "2"])
+        command.extend(["-i", filepath, "-an", "-sn",
+                        "-vf", f"fps={self.sample_fps},scale={self.frame_width}:{self.frame_height}:flags=area,format=gray",
+                        "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1"])
+        return command
+
+    def build(self, filepath, progress_callback=None, input_format=None, run=None):
+        """
+        Indexes filepath and caches the result. Returns the cut times, or None if
+        run (a BackgroundRun) was cancelled or FFmpeg failed.
+        progress_callback(seconds_done) is called once per batch.
+        """
+        run = run or BackgroundRun()
+        if not self.ffmpeg_utils.ffmpeg_path:
+            return None
+        frame_bytes = self.frame_width * self.frame_height
+        buffer = np.empty((self.batch_frames, frame_bytes), dtype=np.uint8)
+        view = memoryview(buffer).cast("B")
+        previous = None
+        scores_seen = 0
+        cuts = []
+
+        process = run.popen(self._command(filepath, input_format), stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        if process is None:
+            return None
+        try:
+            while not run.is_cancelled():
+                filled = 0
+                while filled < len(view):
+                    read = process.stdout.readinto(view[filled:])
+                    if not read:
+                        break
+                    filled += read
+                count = filled // frame_bytes
+                if count == 0:
+                    break
+                frames = buffer[:count]
+
+                diffs, histogram_diffs = frame_metrics(frames, previous)
+                scores = 0.5 * np.minimum(diffs * 4, 1.0) + 0.5 * histogram_diffs
+                # A cut has to stand out from the batch's ordinary motion, not just pass the threshold
+                baseline = float(np.median(scores))
+                for offset in np.flatnonzero(scores >= max(self.threshold, 3 * baseline)):
+                    index = scores_seen + int(offset)
+                    if index == 0:
+                        continue
+                    time_sec = index / self.sample_fps
+                    if cuts and time_sec - cuts[-1][0] < self.min_scene_sec:
+                        if scores[offset] > cuts[-1][1]: # Keep the stronger of two cuts too close together
+                            cuts[-1] = (time_sec, float(scores[offset]))
+                        continue
+                    cuts.append((time_sec, float(scores[offset])))
+
+                previous = frames[-1].copy()
+                scores_seen += count
+                if progress_callback:
+                    progress_callback(scores_seen / self.sample_fps)
+                if count < self.batch_frames:
+                    break
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.terminate()
+            process.wait()
+
+        if run.is_cancelled() or scores_seen == 0:
+            return None
+        self._save(filepath, cuts)
+        return [cut for cut, _ in cuts]
+
+    def _save(self, filepath, cuts):
+        try:
+            cache_path = self._cache_path(filepath)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": SCENE_INDEX_VERSION, "cuts": [[round(t, 2), round(s, 3)] for t, s in cuts]}, f)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            print(f"Warning: Could not cache scene index: {e}")
+
+    def start(self, filepath, on_done, progress_callback=None, input_format=None):
+        """
+        Indexes in a background thread (cancelling any previous run) and calls
+        on_done(filepath, cuts) from that thread. Cached results return at once.
+        """
+        self.cancel()
+        cached = self.load_cached(filepath) if input_format is None else None
+        if cached is not None:
+            on_done(filepath, cached)
+            return
+
+        def work(run):
+            cuts = self.build(filepath, progress_callback, input_format, run)
+            if cuts is not None and not run.is_cancelled():
+                on_done(filepath, cuts)
+
+        self.task.start(work)
+
+    def cancel(self):
+        self.task.cancel()
+
+    @staticmethod
+    def nearest_cut(cuts, time_sec, tolerance_sec):
+        """Closest cut to time_sec within tolerance_sec, else None."""
+        if not cuts:
+            return None
+        index = int(np.searchsorted(cuts, time_sec))
+        candidates = [cuts[i] for i in (index - 1, index) if 0 <= i < len(cuts)]
+        best = min(candidates, key=lambda cut: abs(cut - time_sec))
+        return best if abs(best - time_sec) <= tolerance_sec else None
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from background_task import BackgroundRun
+from ffmpeg_utils import FFmpegUtils
+from bitrate_calculator import BitrateCalculator
+from chunk_encoder import ChunkEncoder
+from job_spec import validate_spec
+
+PACKAGE_FORMATS = ("hls", "dash")
+
+
+class SegmentedPackager:
+    def __init__(self, ffmpeg_utils=None, max_workers=None, segment_duration_sec=6):
+        """
+        Writes HLS and/or DASH straight from the trim range. The range is cut
+        every segment_duration_sec (a short tail joins the last segment), and each
+        segment is encoded by its own FFmpeg process in parallel. Seeking before
+        the input of a re-encode is frame accurate, and keyframes are forced at
+        every segment_duration_sec mark, so the playlists can then be produced by
+        stream copy only.
+        """
+        self.ffmpeg_utils = ffmpeg_utils or FFmpegUtils()
+        self.chunk_encoder = ChunkEncoder(self.ffmpeg_utils)
+        self.bitrate_calculator = BitrateCalculator()
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.segment_duration_sec = segment_duration_sec
+
+    def package(self, spec, output_dir, formats=("hls",), status_callback=None, run=None):
+        """
+        spec uses the job server's parameter names. Writes index.m3u8 and/or
+        manifest.mpd (plus segments) into output_dir. Cancelling run (a
+        BackgroundRun) stops every FFmpeg process involved. Returns (success, message).
+        """
+        run = run or BackgroundRun()
+        def report(text):
+            print(text)
+            if status_callback:
+                status_callback(text)
+
+        formats = [f for f in formats if f in PACKAGE_FORMATS]
+        if not formats:
+            return False, f"Choose at least one of {', '.join(PACKAGE_FORMATS)}."
+        if not self.ffmpeg_utils.ffmpeg_path:
+            return False, "FFmpeg executable not found."
+
+        try:
+            spec = validate_spec(spec)
+        except ValueError as e:
+            return False, str(e)
+        start_time_sec = spec["start_time_sec"]
+        end_time_sec = spec["end_time_sec"]
+        duration = end_time_sec - start_time_sec
+
+        extra_output_args = []
+        audio_bitrate_kbps = None
+        if not spec["use_crf"]:
+            spec["video_bitrate_kbps"], audio_bitrate_kbps = self.bitrate_calculator.calculate_bitrate(
+                float(spec["target_size_mb"]), duration, spec["audio_bitrate_choice"], bool(spec["remove_audio_var"])
+            )
+            # Cap peaks so each segment stays close to the advertised bandwidth
+            extra_output_args = ["-maxrate", f"{int(spec['video_bitrate_kbps'] * 1.5)}k",
+                                 "-bufsize", f"{spec['video_bitrate_kbps'] * 2}k"]
+
+        # Every segment starts on a keyframe at a fixed multiple of the segment length, so the muxers cut there
+        extra_output_args += ["-force_key_frames", f"expr:gte(t,n_forced*{self.segment_duration_sec})",
+                              "-sc_threshold", "0"]
+        segments = self.chunk_encoder.plan_chunks(start_time_sec, end_time_sec, self.segment_duration_sec)
+        work_dir = tempfile.mkdtemp(prefix="shorty_segments_")
+        os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            report(f"Encoding {len(segments)} segments with {self.max_workers} workers...")
+            threads_per_job = max(1, (os.cpu_count() or 2) // self.max_workers)
+            segment_paths = [os.path.join(work_dir, f"segment_{i:05d}.mp4") for i in range(len(segments))]
+            completed = 0
+            segment_run = run.child() # Cancelled on its own when a segment fails, to stop the others
+            with ThreadPoolExecutor(max_workers=self.max_workers + 1) as pool:
+                audio_future = None
+                audio_filepath = None
+                if not spec["remove_audio_var"]:
+                    # Audio is one continuous encode so segment boundaries don't get AAC priming gaps
+                    audio_filepath = os.path.join(work_dir, "audio.m4a")
+                    audio_future = pool.submit(self.chunk_encoder.encode_audio, spec, audio_filepath,
+                                               audio_bitrate_kbps, segment_run)
+
+                futures = {
+                    pool.submit(self._encode_segment, spec, segment, path, threads_per_job, extra_output_args,
+                                segment_run): index
+                    for index, (segment, path) in enumerate(zip(segments, segment_paths))
+                }
+                for future in as_completed(futures):
+                    ok, error = future.result()
+                    if run.is_cancelled():
+                        return False, "Packaging cancelled."
+                    if not ok:
+                        segment_run.cancel()
+                        for pending in futures:
+                            pending.cancel()
+                        return False, f"Segment {futures[future]} failed: {error}"
+                    completed += 1
+                    report(f"Encoded {completed}/{len(segments)} segments")
+
+                if audio_future is not None:
+                    audio_ok, audio_error = audio_future.result()
+                    if run.is_cancelled():
+                        return False, "Packaging cancelled."
+                    if not audio_ok:
+                        print(f"Warning: Audio encode failed, packaging video only: {audio_error}")
+                        audio_filepath = None
+
+            list_path = os.path.join(work_dir, "segments.ffconcat")
+            self.chunk_encoder.write_concat_list(list_path, segment_paths)
+            outputs = []
+            for package_format in formats:
+                report(f"Writing {package_format.upper()} playlist...")
+                ok, result = self._write_package(package_format, list_path, audio_filepath, output_dir, run)
+                if run.is_cancelled():
+                    return False, "Packaging cancelled."
+                if not ok:
+                    return False, result
+                outputs.append(result)
+            return True, ", ".join(outputs)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _encode_segment(self, spec, segment, output_filepath, threads, extra_output_args, run):
+        segment_start, segment_end = segment
+        # Segments are short, so single-pass ABR (or CRF) is close enough and halves the work
+        return self.chunk_encoder.encode_chunk(spec, segment_start, segment_end, output_filepath, threads=threads,
+                                               extra_output_args=extra_output_args, single_pass=True, run=run)
+
+    def _write_package(self, package_format, list_path, audio_filepath, output_dir, run):
+        """Stream copies the encoded segments into HLS or DASH; nothing is re-encoded."""
+        command = [self.ffmpeg_utils.ffmpeg_path, "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_filepath:
+            command.extend(["-i", audio_filepath, "-map", "0:v:0", "-map", "1:a:0"])
+        command.extend(["-c", "copy"])
+
+        if package_format == "hls":
+            playlist = os.path.join(output_dir, "index.m3u8")
+            command.extend(["-f", "hls", "-hls_time", str(self.segment_duration_sec), "-hls_playlist_type", "vod",
+                            "-hls_segment_filename", os.path.join(output_dir, "segment_%05d.ts"), playlist])
+        else:
+            playlist = os.path.join(output_dir, "manifest.mpd")
+            command.extend(["-f", "dash", "-seg_duration", str(self.segment_duration_sec),
+                            "-use_template", "1", "-use_timeline", "1", playlist])
+
+        print(f"FFmpeg Command ({package_format.upper()} package):", " ".join(command))
+        result = self.chunk_encoder.run_command(command, run)
+        if result is None:
+            return False, "Cancelled."
+        if result.returncode != 0:
+            return False, f"{package_format.upper()} packaging failed:\n{result.stderr[-2000:]}"
+        return True, playlist
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encode a trim range straight to HLS and/or DASH")
+    parser.add_argument("--spec", required=True, help="Job spec JSON or path to one (job server parameter names)")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--formats", default="hls", help="Comma separated: hls, dash")
+    parser.add_argument("--segment-sec", type=float, default=6)
+    parser.add_argument("--workers", type=int, default=None, help="Parallel segment encodes")
+    args = parser.parse_args()
+
+    if os.path.exists(args.spec):
+        with open(args.spec, "r", encoding="utf-8") as f:
+            job_spec = json.load(f)
+    else:
+        job_spec = json.loads(args.spec)
+
+    packager = SegmentedPackager(max_workers=args.workers, segment_duration_sec=args.segment_sec)
+    success, message = packager.package(job_spec, args.output_dir, [f.strip().lower() for f in args.formats.split(",")])
+    print(message)
+    sys.exit(0 if success else 1)
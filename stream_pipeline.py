@@ -0,0 +1,116 @@
+import argparse
+import contextlib
+import subprocess
+import sys
+
+from video_processor import VideoProcessor
+from ffmpeg_executor import parse_progress_time
+from ffmpeg_utils import MP4_OUTPUT_MODES, is_stream_path
+from utils import ConstantVar
+
+
+class StreamPipeline:
+    def __init__(self):
+        """
+        Runs a trim/compress job whose input and/or output is a pipe or socket.
+        FFmpeg inherits this process's stdin/stdout directly, so nothing is staged
+        through temp files or copied through Python.
+        """
+        self.video_processor = VideoProcessor(None)
+
+    def run(self, spec, log_stream=sys.stderr):
+        input_filepath = spec["input_filepath"]
+        output_filepath = spec["output_filepath"]
+        start_time_sec = spec.get("start_time_sec", 0)
+        end_time_sec = spec.get("end_time_sec", 0)
+        duration = end_time_sec - start_time_sec
+
+        use_crf = spec.get("use_crf", True)
+        if not use_crf and duration <= 0:
+            log_stream.write("Target size needs --end so the bitrate can be calculated.\n")
+            return 2
+        # A pipe can only be read once, so target size falls back to single-pass ABR
+        total_passes = 1 if use_crf or is_stream_path(input_filepath) else 2
+
+        # The builder and bitrate calculator print diagnostics; keep them off a stdout that carries video
+        diagnostics = contextlib.redirect_stdout(log_stream) if output_filepath == "-" else contextlib.nullcontext()
+        for pass_number in range(1, total_passes + 1):
+            with diagnostics:
+                command = self.video_processor.build_ffmpeg_command(
+                    input_filepath, output_filepath, start_time_sec, end_time_sec,
+                    spec.get("resolution_choice", "Full"), use_crf, str(spec.get("video_crf", "23")),
+                    str(spec.get("target_size_mb", "10")), ConstantVar(spec.get("remove_audio_var", False)),
+                    spec.get("audio_bitrate_choice", "96k"), spec.get("target_framerate", "Original"),
+                    spec.get("ffmpeg_preset", "medium"), spec.get("use_hevc", False), spec.get("gpu_accel_choice", "None"),
+                    spec.get("original_video_width", 0), spec.get("original_video_height", 0),
+                    spec.get("original_video_fps", 0), spec.get("crop_params"), pass_number, total_passes,
+                    output_mode=spec.get("output_mode", "fragmented")
+                )
+            if not command:
+                return 1
+
+            log_stream.write("FFmpeg Command: " + " ".join(command) + "\n")
+            process = subprocess.Popen(
+                command,
+                stdin=None if input_filepath == "-" else subprocess.DEVNULL, # Inherit our stdin for "-"
+                stdout=None if output_filepath == "-" else subprocess.DEVNULL, # Inherit our stdout for "-"
+                stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace'
+            )
+            last_reported = -1
+            for line in iter(process.stderr.readline, ''):
+                current_time = parse_progress_time(line)
+                if current_time is not None and current_time != last_reported:
+                    last_reported = current_time
+                    total = f" / {int(duration)}" if duration > 0 else ""
+                    log_stream.write(f"\rPass {pass_number}/{total_passes}: {current_time}{total} seconds")
+                    log_stream.flush()
+            process.wait()
+            process.stderr.close()
+            log_stream.write("\n")
+            if process.returncode != 0:
+                log_stream.write(f"FFmpeg exited with code {process.returncode}\n")
+                return process.returncode
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Trim and compress between pipes, sockets and files. "
+                    "Use - for stdin/stdout, or an FFmpeg URL such as tcp://host:port?listen=1.")
+    parser.add_argument("--input", default="-", help="Input file, - for stdin, or a URL")
+    parser.add_argument("--output", default="-", help="Output file, - for stdout, or a URL")
+    parser.add_argument("--start", type=float, default=0, help="Start time (sec)")
+    parser.add_argument("--end", type=float, default=0, help="End time (sec); 0 means until the input ends")
+    parser.add_argument("--crf", default=None, help="CRF value (default mode, 23)")
+    parser.add_argument("--target-size-mb", default=None, help="Target size instead of CRF (requires --end)")
+    parser.add_argument("--mode", choices=list(MP4_OUTPUT_MODES), default="fragmented",
+                        help="MP4 layout; pipes and sockets always get fragmented")
+    parser.add_argument("--resolution", choices=["Full", "Half", "Quarter"], default="Full")
+    parser.add_argument("--width", type=int, default=0, help="Source width (needed for Half/Quarter)")
+    parser.add_argument("--height", type=int, default=0, help="Source height (needed for Half/Quarter)")
+    parser.add_argument("--fps", default="Original")
+    parser.add_argument("--preset", default="medium")
+    parser.add_argument("--hevc", action="store_true")
+    parser.add_argument("--no-audio", action="store_true")
+    parser.add_argument("--audio-bitrate", default="96k")
+    args = parser.parse_args()
+
+    job_spec = {
+        "input_filepath": args.input,
+        "output_filepath": args.output,
+        "start_time_sec": args.start,
+        "end_time_sec": args.end,
+        "use_crf": args.target_size_mb is None,
+        "video_crf": args.crf or "23",
+        "target_size_mb": args.target_size_mb or "10",
+        "output_mode": args.mode,
+        "resolution_choice": args.resolution,
+        "original_video_width": args.width,
+        "original_video_height": args.height,
+        "target_framerate": args.fps,
+        "ffmpeg_preset": args.preset,
+        "use_hevc": args.hevc,
+        "remove_audio_var": args.no_audio,
+        "audio_bitrate_choice": args.audio_bitrate,
+    }
+    sys.exit(StreamPipeline().run(job_spec))
@@ -0,0 +1,77 @@
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import distributed_encoder
+from chunk_encoder import ChunkEncoder
+from ffmpeg_utils import FFmpegUtils
+
+# Stand-in ffmpeg: writes a one byte file at its output path (the last argument)
+FAKE_FFMPEG = """#!{python}
+import sys
+open(sys.argv[-1], "wb").write(b"x")
+"""
+
+
+@unittest.skipIf(sys.platform == "win32", "the fake ffmpeg is a shebang script")
+class CoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="shorty_test_")
+        ffmpeg_path = os.path.join(self.temp_dir, "ffmpeg")
+        with open(ffmpeg_path, "w", encoding="utf-8") as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(ffmpeg_path, 0o755)
+        self.ffmpeg_utils = FFmpegUtils()
+        self.ffmpeg_utils.ffmpeg_path = ffmpeg_path
+        self.ffmpeg_utils.ffprobe_path = None # No keyframes: fixed chunk boundaries
+
+        self.input_path = os.path.join(self.temp_dir, "input.mp4")
+        open(self.input_path, "wb").close()
+        self.spec = {"input_filepath": self.input_path, "start_time_sec": 0, "end_time_sec": 30,
+                     "use_crf": True, "remove_audio_var": True}
+        self.coordinator = distributed_encoder.DistributedCoordinator(
+            self.ffmpeg_utils, port=0, work_dir=self.temp_dir, chunk_duration_sec=10)
+        self.host, self.port = self.coordinator.start()
+
+    def tearDown(self):
+        self.coordinator.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _start_worker(self, result):
+        worker = distributed_encoder.DistributedWorker(self.host, self.port, name="early")
+        worker.chunk_encoder = ChunkEncoder(self.ffmpeg_utils)
+        thread = threading.Thread(target=lambda: result.update(encoded=worker.run_session()), daemon=True)
+        thread.start()
+        return thread
+
+    def test_worker_connected_before_run_waits_for_the_job(self):
+        result = {}
+        thread = self._start_worker(result)
+        time.sleep(0.5) # Connected and asking for work before any job is loaded
+        self.assertTrue(thread.is_alive(), "worker was told the job is done before it started")
+
+        success, message = self.coordinator.run(self.spec, os.path.join(self.temp_dir, "out.mp4"))
+        thread.join(timeout=10)
+        self.assertTrue(success, message)
+        self.assertEqual(result.get("encoded"), 3)
+
+    def test_waiting_worker_is_released_when_the_job_cannot_start(self):
+        with socket.create_connection((self.host, self.port)) as connection:
+            stream = connection.makefile("rwb")
+            distributed_encoder._send_message(stream, {"type": "request"})
+            success, _ = self.coordinator.run({"input_filepath": os.path.join(self.temp_dir, "missing.mp4")},
+                                              os.path.join(self.temp_dir, "out.mp4"))
+            connection.settimeout(5)
+            self.assertFalse(success)
+            self.assertEqual(stream.readline(), b'{"type": "done"}\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from cache_index import CacheIndex
+from ffmpeg_utils import FFmpegUtils
+from utils import get_cache_dir
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm", ".m4v", ".ts", ".flv", ".wmv", ".mpg")
+THUMBNAIL_WIDTH = 192
+POSTER_POSITION = 0.1 # Fraction of the duration; skips black lead-ins and title fades
+
+
+def list_videos(folder):
+    """Video files directly in folder, sorted by name."""
+    try:
+        names = sorted(os.listdir(folder), key=str.lower)
+    except OSError:
+        return []
+    return [os.path.join(folder, name) for name in names
+            if name.lower().endswith(VIDEO_EXTENSIONS) and os.path.isfile(os.path.join(folder, name))]
+
+
+def generate_thumbnail(ffmpeg_path, ffprobe_path, filepath, thumbnail_path, width=THUMBNAIL_WIDTH):
+    """
+    Probes filepath and writes a small JPEG poster frame to thumbnail_path.
+    Runs in a worker process, so it only takes and returns plain values.
+    Returns the metadata dict ("error" is set if nothing could be read).
+    """
+    metadata = {"duration": 0.0, "width": 0, "height": 0, "fps": 0.0, "codec": None,
+                "size_bytes": os.path.getsize(filepath), "thumbnail": None, "error": None}
+    try:
+        result = subprocess.run(
+            [ffprobe_path, "-v", "error", "-print_format", "json", "-show_format", "-show_streams",
+             "-select_streams", "v:0", filepath],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace', timeout=30
+        )
+        info = json.loads(result.stdout or "{}")
+        stream = (info.get("streams") or [{}])[0]
+        metadata["duration"] = float(info.get("format", {}).get("duration") or 0)
+        metadata["width"] = int(stream.get("width") or 0)
+        metadata["height"] = int(stream.get("height") or 0)
+        metadata["codec"] = stream.get("codec_name")
+        numerator, _, denominator = (stream.get("avg_frame_rate") or "0/1").partition("/")
+        metadata["fps"] = float(numerator) / float(denominator) if float(denominator or 0) else 0.0
+    except (subprocess.SubprocessError, ValueError, OSError) as e:
+        metadata["error"] = f"Could not probe: {e}"
+        return metadata
+    if not metadata["width"]:
+        metadata["error"] = "No video stream"
+        return metadata
+
+    # Input seek plus keyframes-only decoding: one keyframe is decoded, however long the file is
+    command = [ffmpeg_path, "-v", "error", "-y", "-skip_frame", "nokey",
+               "-ss", f"{metadata['duration'] * POSTER_POSITION:.3f}", "-i", filepath,
+               "-frames:v", "1", "-an", "-vf", f"scale={width}:-2:flags=fast_bilinear", "-q:v", "5", thumbnail_path]
+    try:
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, encoding='utf-8', errors='replace', timeout=60)
+        if result.returncode == 0 and os.path.exists(thumbnail_path):
+            metadata["thumbnail"] = os.path.basename(thumbnail_path)
+        else:
+            metadata["error"] = result.stderr.strip()[-200:] or "No frame decoded"
+    except subprocess.SubprocessError as e:
+        metadata["error"] = str(e)
+    return metadata
+
+
+class ThumbnailCache:
+    SAVE_EVERY = 25 # Index writes are batched while a folder is being filled in
+
+    def __init__(self, cache_dir=None, max_workers=None, ffmpeg_utils=None):
+        """
+        Persistent poster frames and metadata for the folder browser, keyed by
+        path, size and mtime so edited files are regenerated. Missing entries are
+        generated in a process pool, one FFmpeg seek per file.
+        """
+        self.cache_dir = cache_dir or get_cache_dir("thumbnails")
+        self.ffmpeg_utils = ffmpeg_utils or FFmpegUtils()
+        self.max_workers = max_workers or max(1, min(8, (os.cpu_count() or 2) - 1))
+        self.lock = threading.RLock() # Future callbacks can run synchronously while it is held
+        self.index = CacheIndex(self.cache_dir)
+        self.entries = self.index.load()["entries"]
+        self.pending = {} # key -> Future
+        self.pending_paths = {} # key -> filepath
+        self.unsaved = 0
+        self.pool = None
+
+    def _save_index(self):
+        # Merged into what's on disk, so entries another process added meanwhile are kept (and picked up)
+        with self.index.transaction() as data:
+            data["entries"].update(self.entries)
+            self.entries = data["entries"]
+        self.unsaved = 0
+
+    @staticmethod
+    def make_key(filepath):
+        stat = os.stat(filepath)
+        payload = f"{os.path.abspath(filepath)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def thumbnail_path(self, metadata):
+        return os.path.join(self.cache_dir, metadata["thumbnail"]) if metadata.get("thumbnail") else None
+
+    def lookup(self, filepath):
+        """Cached metadata for the current version of filepath, or None. Never runs FFmpeg."""
+        try:
+            key = self.make_key(filepath)
+        except OSError:
+            return None
+        with self.lock:
+            return self.entries.get(key)
+
+    def request(self, filepath, callback):
+        """
+        Calls callback(filepath, metadata) once the entry exists: right away on a
+        hit, otherwise from a pool thread when the worker process finishes. Not
+        called for requests dropped by cancel_pending.
+        """
+        try:
+            key = self.make_key(filepath)
+        except OSError as e:
+            callback(filepath, {"error": str(e)})
+            return
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                future = self.pending.get(key)
+                if future is None:
+                    if not self.ffmpeg_utils.ffmpeg_path or not self.ffmpeg_utils.ffprobe_path:
+                        entry = {"error": "FFmpeg/FFprobe not found"}
+                    else:
+                        if self.pool is None:
+                            # spawn: forking a process that runs Tk and worker threads isn't safe
+                            self.pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                            mp_context=multiprocessing.get_context("spawn"))
+                        future = self.pool.submit(generate_thumbnail, self.ffmpeg_utils.ffmpeg_path,
+                                                  self.ffmpeg_utils.ffprobe_path, filepath,
+                                                  os.path.join(self.cache_dir, key + ".jpg"))
+                        self.pending[key] = future
+                        self.pending_paths[key] = filepath
+                        future.add_done_callback(lambda f, k=key: self._store(k, f))
+                if future is not None:
+                    future.add_done_callback(
+                        lambda f: f.cancelled() or callback(filepath, self.entries.get(key) or {"error": "Failed"}))
+                    return
+        callback(filepath, entry)
+
+    def _store(self, key, future):
+        try:
+            metadata = future.result()
+        except Exception as e: # Worker process died or the pool was shut down
+            metadata = {"error": str(e)}
+        with self.lock:
+            self.pending.pop(key, None)
+            self.pending_paths.pop(key, None)
+            if "size_bytes" in metadata: # Only cache real results, not crashes
+                self.entries[key] = metadata
+                self.unsaved += 1
+                if self.unsaved >= self.SAVE_EVERY or not self.pending:
+                    self._save_index()
+
+    def cancel_pending(self, keep=()):
+        """
+        Drops queued (not yet started) requests for files not in keep, e.g. when
+        the grid scrolls past them. Returns the filepaths that were dropped.
+        """
+        cancelled = []
+        with self.lock:
+            for key, future in list(self.pending.items()):
+                filepath = self.pending_paths.get(key)
+                if filepath not in keep and future.cancel(): # Runs _store, which clears the pending entry
+                    cancelled.append(filepath)
+        return cancelled
+
+    def shutdown(self):
+        self.cancel_pending()
+        with self.lock:
+            if self.unsaved:
+                self._save_index()
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -25,4 +25,28 @@ def get_ffmpeg_path():
         except (subprocess.CalledProcessError, FileNotFoundError):
             return None
             
-    return ffmpeg_path
\ No newline at end of file
+    return ffmpeg_path
+
+
+class ConstantVar:
+    """
+    Minimal stand-in for a tk variable so headless callers (job server,
+    workers) can pass plain values where the command builder expects
+    something with a .get() method.
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def get_cache_dir(name):
+    """
+    Returns (and creates) a per-feature cache directory. Set SHORTY_CACHE_DIR to
+    move all caches somewhere else, e.g. a bigger or shared disk.
+    """
+    base_dir = os.environ.get("SHORTY_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".shorty", "cache")
+    cache_dir = os.path.join(base_dir, name)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,192 @@
+import collections
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Encoders used to re-encode an incompatible input so it matches the reference input's codec
+NORMALIZE_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "mpeg4": "mpeg4",
+    "vp9": "libvpx-vp9",
+}
+
+
+class JoinResult:
+    def __init__(self, list_path, work_dir, segments, width, height, fps, normalized_count):
+        self.list_path = list_path # ffconcat list to pass as input_filepath with input_format="concat"
+        self.work_dir = work_dir
+        self.segments = segments # [(source path, start offset sec, duration sec)] in join order
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.normalized_count = normalized_count
+
+    @property
+    def duration(self):
+        return sum(duration for _, _, duration in self.segments)
+
+
+class VideoJoiner:
+    def __init__(self, ffmpeg_utils, max_workers=None):
+        """
+        Joins several inputs into one virtual input for the normal trim/crop/compress
+        pipeline. Inputs are only ever referenced from an ffconcat list, so the joined
+        result is never written to disk; only incompatible inputs get re-encoded.
+        """
+        self.ffmpeg_utils = ffmpeg_utils
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+
+    def probe_inputs(self, filepaths):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(self.ffmpeg_utils.probe_media, filepaths))
+
+    @staticmethod
+    def _first_stream(info, codec_type):
+        return next((s for s in info.get("streams", []) if s.get("codec_type") == codec_type), None)
+
+    def stream_signature(self, info):
+        """
+        Parameters that must match for the concat demuxer to stream copy inputs
+        back to back.
+        """
+        video = self._first_stream(info, "video")
+        if video is None:
+            raise ValueError("Input has no video stream.")
+        audio = self._first_stream(info, "audio")
+        video_signature = (video.get("codec_name"), video.get("profile"), video.get("width"), video.get("height"),
+                           video.get("pix_fmt"), video.get("r_frame_rate"), video.get("sample_aspect_ratio", "1:1"),
+                           video.get("time_base"))
+        audio_signature = None
+        if audio is not None:
+            audio_signature = (audio.get("codec_name"), audio.get("sample_rate"), audio.get("channels"))
+        return video_signature, audio_signature
+
+    def _pick_reference(self, signatures):
+        """Most common encodable signature wins, ties going to the earliest input."""
+        encodable = [sig for sig in signatures if sig[0][0] in NORMALIZE_ENCODERS]
+        if not encodable:
+            return None
+        counts = collections.Counter(encodable)
+        return max(encodable, key=lambda sig: (counts[sig], -signatures.index(sig)))
+
+    def join(self, filepaths, status_callback=None):
+        """
+        Probes filepaths, normalizes only the incompatible ones (in parallel) and
+        returns a JoinResult. Raises ValueError/RuntimeError on failure.
+        """
+        if len(filepaths) < 2:
+            raise ValueError("Select at least two videos to join.")
+        if not self.ffmpeg_utils.ffmpeg_path:
+            raise RuntimeError("FFmpeg executable not found. Please ensure it's in your PATH or in the same directory as the script.")
+
+        def report(text):
+            if status_callback:
+                status_callback(text)
+
+        report(f"Probing {len(filepaths)} inputs...")
+        infos = self.probe_inputs(filepaths)
+        signatures = [self.stream_signature(info) for info in infos]
+
+        reference = self._pick_reference(signatures)
+        if reference is None:
+            # Nothing we can match by stream copy; normalize everything to H.264 at the first input's geometry
+            first_video = signatures[0][0]
+            reference = (("h264", None, first_video[2], first_video[3], "yuv420p", first_video[5], "1:1", "1/90000"),
+                         signatures[0][1] and ("aac",) + tuple(signatures[0][1][1:]))
+
+        to_normalize = [i for i, sig in enumerate(signatures) if sig != reference]
+        work_dir = tempfile.mkdtemp(prefix="shorty_join_")
+        sources = list(filepaths)
+
+        try:
+            if to_normalize:
+                report(f"Normalizing {len(to_normalize)} of {len(filepaths)} inputs to match...")
+                threads_per_job = max(1, (os.cpu_count() or 2) // min(self.max_workers, len(to_normalize)))
+                with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                    futures = {
+                        i: pool.submit(self._normalize, filepaths[i], infos[i],
+                                       os.path.join(work_dir, f"normalized_{i}.mp4"), reference, threads_per_job)
+                        for i in to_normalize
+                    }
+                    for i, future in futures.items():
+                        sources[i] = future.result()
+            else:
+                report("All inputs match; joining by stream copy...")
+
+            segments = []
+            offset = 0.0
+            for source, info in zip(sources, infos):
+                duration = float(info.get("format", {}).get("duration", 0) or 0)
+                segments.append((source, offset, duration))
+                offset += duration
+
+            list_path = os.path.join(work_dir, "join.ffconcat")
+            self._write_concat_list(list_path, segments)
+        except Exception:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        reference_video = reference[0]
+        fps = self._parse_rate(reference_video[5])
+        return JoinResult(list_path, work_dir, segments, reference_video[2], reference_video[3], fps, len(to_normalize))
+
+    def _normalize(self, input_filepath, info, output_filepath, reference, threads):
+        (codec, _profile, width, height, pix_fmt, frame_rate, _sar, time_base), audio_reference = reference
+        command = [self.ffmpeg_utils.ffmpeg_path, "-y", "-i", input_filepath]
+
+        input_has_audio = self._first_stream(info, "audio") is not None
+        if audio_reference and not input_has_audio:
+            # Keep the stream layout identical by adding silence
+            layout = "stereo" if audio_reference[2] == 2 else "mono"
+            command.extend(["-f", "lavfi", "-i", f"anullsrc=r={audio_reference[1]}:cl={layout}", "-shortest"])
+
+        # Letterbox into the reference frame so aspect ratio is preserved
+        video_filter = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={frame_rate},format={pix_fmt}")
+        command.extend(["-map", "0:v:0", "-vf", video_filter, "-c:v", NORMALIZE_ENCODERS[codec], "-threads", str(threads)])
+        if codec in ("h264", "hevc"):
+            command.extend(["-preset", "veryfast", "-crf", "16"]) # Near-transparent; it gets compressed again later
+        timescale = time_base.split("/")[-1] if time_base else None
+        if timescale and timescale.isdigit():
+            command.extend(["-video_track_timescale", timescale])
+
+        if audio_reference:
+            command.extend(["-map", "1:a:0" if not input_has_audio else "0:a:0",
+                            "-c:a", "aac" if audio_reference[0] == "aac" else audio_reference[0],
+                            "-ar", str(audio_reference[1]), "-ac", str(audio_reference[2])])
+        else:
+            command.append("-an")
+        command.append(output_filepath)
+
+        print("FFmpeg Command (Join normalize):", " ".join(command))
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, encoding='utf-8', errors='replace')
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to normalize {os.path.basename(input_filepath)}:\n{result.stderr[-2000:]}")
+        return output_filepath
+
+    @staticmethod
+    def _write_concat_list(list_path, segments):
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.write("ffconcat version 1.0\n")
+            for source, _, duration in segments:
+                escaped = os.path.abspath(source).replace("\\", "/").replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if duration > 0:
+                    f.write(f"duration {duration:.6f}\n") # Lets the demuxer seek without opening every file
+
+    @staticmethod
+    def _parse_rate(rate):
+        try:
+            numerator, denominator = rate.split("/")
+            return float(numerator) / float(denominator) if float(denominator) else 0.0
+        except (AttributeError, ValueError):
+            return 0.0
+
+    @staticmethod
+    def cleanup(result):
+        if result is not None:
+            shutil.rmtree(result.work_dir, ignore_errors=True)
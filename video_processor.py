@@ -6,12 +6,17 @@ from tkinter import messagebox # Import messagebox for showing errors in a GUI c
 from ffmpeg_utils import FFmpegUtils
 from bitrate_calculator import BitrateCalculator
 from ffmpeg_executor import FFmpegExecutor
+from output_cache import OutputCache
+from quality_targeter import QualityTargeter
+from job_history import JobHistory
 
 class VideoProcessor:
-    def __init__(self, app_instance):
+    def __init__(self, app_instance, output_cache_mb=2048, history_path=None):
         """
         Initializes the VideoProcessor with a reference to the main application
-        instance to allow for UI updates (status, progress bar).
+        instance to allow for UI updates (status, progress bar). output_cache_mb
+        is the disk quota for reusing outputs of identical earlier jobs.
+        history_path overrides the job history database used for ETAs.
         """
         self.app = app_instance
         
@@ -19,6 +24,10 @@ class VideoProcessor:
         self.ffmpeg_utils = FFmpegUtils(app_instance) # Pass app_instance to ffmpeg_utils
         self.bitrate_calculator = BitrateCalculator()
         self.ffmpeg_executor = FFmpegExecutor(app_instance) # Pass app_instance to executor
+        self.output_cache = OutputCache(max_size_mb=output_cache_mb)
+        self.quality_targeter = QualityTargeter(self.ffmpeg_utils)
+        self.job_history = JobHistory(history_path)
+        self.package_run = None # BackgroundRun of the HLS/DASH packaging in progress, if any
 
         # Expose ffmpeg_process and current_pass from FFmpegExecutor
         self.ffmpeg_process = self.ffmpeg_executor.ffmpeg_process # Will be updated by executor
@@ -28,7 +37,8 @@ class VideoProcessor:
                              resolution_choice, use_crf, video_crf, target_size_mb, # Changed half_res_enabled to resolution_choice
                              remove_audio_var, audio_bitrate_choice, target_framerate, 
                              ffmpeg_preset, use_hevc, gpu_accel_choice, original_video_width, 
-                             original_video_height, original_video_fps, crop_params, pass_number=1, total_passes=1):
+                             original_video_height, original_video_fps, crop_params, pass_number=1, total_passes=1,
+                             pass_log_file=None, input_format=None, output_mode="standard"):
         
         video_bitrate_kbps = None
         audio_bitrate_kbps = None
@@ -50,7 +60,8 @@ class VideoProcessor:
             remove_audio_var, audio_bitrate_choice, target_framerate, 
             ffmpeg_preset, use_hevc, gpu_accel_choice, original_video_width, 
             original_video_height, original_video_fps, crop_params, 
-            pass_number, total_passes, video_bitrate_kbps, audio_bitrate_kbps
+            pass_number, total_passes, video_bitrate_kbps, audio_bitrate_kbps,
+            pass_log_file=pass_log_file, input_format=input_format, output_mode=output_mode
         )
 
     def execute_ffmpeg_command(self, command, duration_in_seconds, pass_number, total_passes):
@@ -60,7 +71,17 @@ class VideoProcessor:
         self.current_pass = self.ffmpeg_executor.current_pass
         return success
 
+    def pause_compression(self):
+        return self.ffmpeg_executor.pause_compression()
+
+    def resume_compression(self):
+        return self.ffmpeg_executor.resume_compression()
+
     def cancel_compression(self):
+        self.quality_targeter.cancel() # Stops a target quality search if one is running
+        if self.package_run is not None:
+            self.package_run.cancel() # Stops every segment encode of a packaging job
+            self.app.master.after(0, lambda: self.app.status_label.config(text="Compression cancelled by user."))
         self.ffmpeg_executor.cancel_compression()
         self.ffmpeg_process = self.ffmpeg_executor.ffmpeg_process # Update after cancellation
         self.current_pass = self.ffmpeg_executor.current_pass # Update after cancellation